@@ -0,0 +1,263 @@
+#
+# A suite of micro benchmarks covering parsing, dispatch and construction.
+# The results are written to a JSON file so runs from different commits can
+# be compared.
+#
+# Run with: python benchmarks/benchmark_suite.py [--output results.json]
+#               [--compare baseline.json] [--threshold 10] [--filter text] [--quick]
+#
+# Each benchmark is run in rounds of enough iterations to take at least
+# --min-time seconds and the per iteration time of every round is recorded.
+# The minimum is the figure to compare (the others are affected by whatever
+# else the machine is doing). With --compare the change from the baseline is
+# printed and the exit status is 1 if any benchmark is more than --threshold
+# percent slower.
+#
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import lark
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+from context import HandlerMap
+from context import ParserCache
+
+SUBSYSTEMS = ["ABORt","ARM","CALCulate","CALibration","CONFigure","CONTrol","DIAGnostic","DISPlay",
+    "FETCh","FORMat","HCOPy","INITiate","INPut","INSTrument","MEASure","MEMory","MMEMory","OUTPut",
+    "PROGram","READ","ROUTe","SENSe","SOURce","STATus","SYSTem","TEST","TRACe","TRIGger","UNIT"]
+FUNCTIONS = ["VOLTage","CURRent","FREQuency","POWer","RESistance","TEMPerature","PHASe","FUNCtion",
+    "LIST","SWEep","MARKer","LIMit"]
+SETTINGS = ["LEVel","RANGe","AUTO","MODE","STATe","DELay","COUNt","SLOPe","SOURce","TIMer","OFFSet"]
+QUALIFIERS = ["IMMediate","TRIGgered"]
+
+LINES = {
+    'simple_command': "VOLT 1.5",
+    'simple_query': "VOLT?",
+    'compound_command': "SOURce:VOLTage:LEVel 1.5",
+    'compound_query': "MEAS:VOLT?",
+    'common_query': "*IDN?",
+    'multi_unit': "SOUR:VOLT 1.5;CURR 0.1;:MEAS:VOLT?;*IDN?",
+    'multi_unit_10': ";".join(["SOUR:VOLT 1.5","MEAS:VOLT?"] * 5),
+}
+
+PROGRAM_DATA = {
+    'decimal': "SOUR:VOLT 1.5",
+    'decimal_exponent': "SOUR:VOLT -1.5 E-3",
+    'decimal_suffix': "SOUR:VOLT 1.5 MV",
+    'character': "SOUR:VOLT MAX",
+    'hex': "SOUR:VOLT #H1F2E",
+    'octal': "SOUR:VOLT #Q1777",
+    'binary': "SOUR:VOLT #B10101010",
+    'string_single': "SOUR:VOLT 'it''s'",
+    'string_double': "SOUR:VOLT \"a \"\"b\"\"\"",
+    'block_str': "SOUR:VOLT #15abcde",
+    'block_bytes': b"SOUR:VOLT #15abcde",
+    'multiple_arguments': "SOUR:VOLT 1,2,3",
+}
+
+SYNTAX_ERRORS = {
+    'bad_header': "This is crap",
+    'bad_data': "SOUR:VOLT 1,,",
+    'long_line': "SOUR:VOLT " + ",".join(["1.5"] * 100) + ",,",
+    'binary_junk': "\x00\x01\xfe\xff" * 16,
+    'undefined_header': "SOUR:FREQ 1",
+}
+
+class NullHandler(QueryHandler,CommandHandler):
+    def query(self,program_header):
+        return "1.5"
+    def set(self,program_header,program_data):
+        return ""
+
+def header_names():
+    names = []
+    for subsystem in SUBSYSTEMS:
+        for function in FUNCTIONS:
+            names.append(subsystem+":"+function)
+            for setting in SETTINGS:
+                names.append(subsystem+":"+function+":"+setting)
+                for qualifier in QUALIFIERS:
+                    names.append(subsystem+":"+function+":"+setting+":"+qualifier)
+    return names
+
+def make_interpreter(parser_mode,fast_path=True,error_queue_size=0):
+    interpreter = CommandInterpreter(parser_mode=parser_mode,fast_path=fast_path,error_queue_size=error_queue_size)
+    handler = NullHandler()
+    for key in ["VOLTage","SOURce:VOLTage","SOURce:VOLTage:LEVel","SOURce:CURRent","MEASure:VOLTage"]:
+        interpreter.register_command_handler(key,handler)
+        interpreter.register_query_handler(key,handler)
+    return interpreter
+
+#
+# Each benchmark is a (name,function) pair. The function is called with no
+# arguments once per iteration.
+#
+def process_line_benchmarks():
+    benchmarks = []
+    for parser_mode in CommandInterpreter.PARSER_MODES:
+        for fast_path in (True,False):
+            interpreter = make_interpreter(parser_mode,fast_path)
+            variant = parser_mode + ("" if fast_path else "_no_fast_path")
+            for name,line in LINES.items():
+                benchmarks.append(("process_line/"+variant+"/"+name,lambda i=interpreter,l=line: i.process_line(l)))
+    return benchmarks
+
+def program_data_benchmarks():
+    benchmarks = []
+    for fast_path in (True,False):
+        interpreter = make_interpreter(CommandInterpreter.PARSER_MODE_LALR,fast_path)
+        variant = "lalr" if fast_path else "lalr_no_fast_path"
+        for name,line in PROGRAM_DATA.items():
+            benchmarks.append(("program_data/"+variant+"/"+name,lambda i=interpreter,l=line: i.process_line(l)))
+    return benchmarks
+
+def syntax_error_benchmarks():
+    benchmarks = []
+    for parser_mode in CommandInterpreter.PARSER_MODES:
+        for error_queue_size in (0,20):
+            interpreter = make_interpreter(parser_mode,error_queue_size=error_queue_size)
+            variant = parser_mode + ("_error_queue" if error_queue_size else "")
+            for name,line in SYNTAX_ERRORS.items():
+                benchmarks.append(("syntax_error/"+variant+"/"+name,lambda i=interpreter,l=line: i.process_line(l)))
+    return benchmarks
+
+def handler_map_benchmarks():
+    names = header_names()
+    lookups = []
+    for index in range(0,len(names),97):
+        name = names[index]
+        lookups.append(name.upper())
+        lookups.append(":".join("".join(c for c in part if not c.islower()) for part in name.split(":")).lower())
+    lookups.append("NOT:A:HEADER")
+
+    def register():
+        handler_map = HandlerMap()
+        for name in names:
+            handler_map.register_handler(name,name)
+        return handler_map
+
+    tree = register()
+    frozen = register()
+    frozen.freeze()
+    prefix = "handler_map/%d_headers/" % len(names)
+    return [
+        (prefix+"register_all",register),
+        (prefix+"find_handler_tree_x%d" % len(lookups),lambda: [tree.find_handler(name) for name in lookups]),
+        (prefix+"find_handler_frozen_x%d" % len(lookups),lambda: [frozen.find_handler(name) for name in lookups]),
+        (prefix+"freeze",frozen.freeze),
+    ]
+
+def construction_benchmarks():
+    benchmarks = []
+    for parser_mode in CommandInterpreter.PARSER_MODES:
+        benchmarks.append(("construction/"+parser_mode+"/warm",lambda m=parser_mode: CommandInterpreter(parser_mode=m)))
+        def cold(parser_mode=parser_mode):
+            ParserCache.clear()
+            CommandInterpreter(parser_mode=parser_mode)
+        benchmarks.append(("construction/"+parser_mode+"/cold",cold))
+    return benchmarks
+
+SUITES = [process_line_benchmarks,program_data_benchmarks,syntax_error_benchmarks,
+    handler_map_benchmarks,construction_benchmarks]
+
+def run_benchmark(function,min_time,rounds):
+    # Find the number of iterations taking at least min_time
+    iterations = 1
+    while True:
+        elapsed = time_iterations(function,iterations)
+        if elapsed >= min_time:
+            break
+        iterations = max(iterations * 2,int(iterations * min_time / max(elapsed,1e-9) * 1.2))
+    times = [time_iterations(function,iterations) / iterations for _ in range(rounds)]
+    return {
+        'min_ns': min(times) * 1e9,
+        'median_ns': statistics.median(times) * 1e9,
+        'mean_ns': statistics.mean(times) * 1e9,
+        'stdev_ns': statistics.stdev(times) * 1e9 if len(times) > 1 else 0.0,
+        'rounds': rounds,
+        'iterations': iterations,
+    }
+
+def time_iterations(function,iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return time.perf_counter() - start
+
+def git_commit():
+    try:
+        return subprocess.run(["git","rev-parse","HEAD"],capture_output=True,text=True,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+def compare(results,baseline,threshold):
+    regressions = []
+    for name,result in results.items():
+        previous = baseline.get('results',{}).get(name)
+        if previous is None:
+            print("%-60s %12s" % (name,"new"))
+            continue
+        change = (result['min_ns'] / previous['min_ns'] - 1) * 100
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("%-60s %+11.1f%%%s" % (name,change,flag))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the benchmark suite")
+    parser.add_argument("--output",default="benchmark_results.json",help="file the results are written to")
+    parser.add_argument("--compare",help="results file from an earlier run to compare against")
+    parser.add_argument("--threshold",type=float,default=10.0,help="percentage slow down counted as a regression")
+    parser.add_argument("--filter",default="",help="only run benchmarks with this in their name")
+    parser.add_argument("--min-time",type=float,default=0.05,help="minimum time for each round in seconds")
+    parser.add_argument("--rounds",type=int,default=7,help="number of rounds")
+    parser.add_argument("--quick",action="store_true",help="a quick run (one short round each)")
+    args = parser.parse_args()
+    if args.quick:
+        args.min_time = 0.005
+        args.rounds = 1
+
+    results = {}
+    for suite in SUITES:
+        for name,function in suite():
+            if args.filter not in name:
+                continue
+            result = run_benchmark(function,args.min_time,args.rounds)
+            results[name] = result
+            print("%-60s %12.3f us  (%d x %d)" % (name,result['min_ns']/1000,result['rounds'],result['iterations']))
+
+    output = {
+        'metadata': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': sys.version,
+            'platform': platform.platform(),
+            'lark': lark.__version__,
+            'min_time': args.min_time,
+            'rounds': args.rounds,
+        },
+        'results': results,
+    }
+    with open(args.output,"w") as output_file:
+        json.dump(output,output_file,indent=2)
+    print("Results written to "+args.output)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        print("Change from "+args.compare+" (minimum time)")
+        if compare(results,baseline,args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
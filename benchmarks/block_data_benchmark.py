@@ -0,0 +1,47 @@
+#
+# Time to upload multi-megabyte blocks as arbitrary block program data
+# (passed to the handler as a memoryview) compared with hex encoding the
+# same data as #H non-decimal numeric data.
+#
+# Run with: python benchmarks/block_data_benchmark.py
+#
+import os
+import time
+import tracemalloc
+
+from context import CommandInterpreter
+from context import CommandHandler
+
+SIZES = [1 << 20, 16 << 20, 64 << 20]
+HEX_LIMIT = 16 << 20
+
+class UploadHandler(CommandHandler):
+    def set(self,program_header,program_data):
+        self.data = program_data
+        return "Ok"
+
+def measure(interpreter,line):
+    tracemalloc.start()
+    start = time.perf_counter()
+    interpreter.process_line(line)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed,peak
+
+def main():
+    interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+    interpreter.register_command_handler("TRACe:DATA",UploadHandler())
+    for size in SIZES:
+        payload = os.urandom(size)
+        length = str(size)
+        block_line = b"TRAC:DATA #" + str(len(length)).encode() + length.encode() + payload + b"\n"
+        elapsed,peak = measure(interpreter,block_line)
+        print("%4d MB block  %8.3f ms  %8.1f MB/s  peak alloc %10d bytes" % (size >> 20,elapsed*1000,size/elapsed/1e6,peak))
+        if size <= HEX_LIMIT:
+            hex_line = "TRAC:DATA #H" + payload.hex()
+            elapsed,peak = measure(interpreter,hex_line)
+            print("%4d MB #H hex %8.3f ms  %8.1f MB/s  peak alloc %10d bytes" % (size >> 20,elapsed*1000,size/elapsed/1e6,peak))
+
+if __name__ == '__main__':
+    main()
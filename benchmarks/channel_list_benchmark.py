@@ -0,0 +1,60 @@
+#
+# Memory and time for channel lists of growing size. A ChannelList keeps the
+# ranges rather than the channels so the memory used stays the same however
+# many channels the list covers. An expanded Python list is shown for the
+# sizes where building one is practical. The times include the overhead of
+# tracing the allocations.
+#
+# Run with: python benchmarks/channel_list_benchmark.py
+#
+import itertools
+import time
+import tracemalloc
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import ChannelList
+
+SIZES = [10**3,10**4,10**5,10**6,10**7,10**9]
+MAX_EXPANDED = 10**6
+
+class RouteHandler(CommandHandler):
+    argument_types = (ChannelList,)
+
+    def set(self,program_header,program_data):
+        channels = program_data[0]
+        # What a scan would do first: check the size and a channel and start
+        # iterating
+        self.count = len(channels)
+        self.found = 12345 in channels
+        self.first = list(itertools.islice(channels,16))
+        return ""
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak,elapsed
+
+def main():
+    interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+    handler = RouteHandler()
+    interpreter.register_command_handler("ROUTe:SCAN",handler)
+    interpreter.process_line("ROUT:SCAN (@1:2)")
+    for size in SIZES:
+        # Two ranges, like two cards of a mainframe
+        line = "ROUT:SCAN (@1:%d,%d:%d)" % (size // 2,10**10,10**10 + size // 2 - 1)
+        peak,elapsed = measure(lambda: interpreter.process_line(line))
+        assert handler.count == size
+        text = "%12d channels  ChannelList peak %8.1f KiB %8.1f us" % (size,peak/1024,elapsed*1e6)
+        if size <= MAX_EXPANDED:
+            channels = ChannelList.from_string(line[10:])
+            peak,elapsed = measure(lambda: list(channels))
+            text += "   expanded list peak %10.1f KiB %10.1f us" % (peak/1024,elapsed*1e6)
+        print(text)
+
+if __name__ == '__main__':
+    main()
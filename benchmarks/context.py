@@ -0,0 +1,19 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/scpiparser')))
+
+from CommandInterpreter import CommandInterpreter
+from CommandHandler import CommandHandler
+from QueryHandler import QueryHandler
+from HandlerMap import HandlerMap
+from ParserCache import ParserCache
+from SCPIServer import SCPIServer
+from DataFormat import DataFormat
+from PlanCache import PlanCache
+from ArgumentConverter import ArgumentConverter
+from SuffixTable import SuffixTable
+from ChannelList import ChannelList
+from InterpreterSpec import InterpreterSpec
+from ShardedInterpreter import ShardedInterpreter
+from TraceBuffer import TraceBuffer
+from TraceBuffer import TraceHandler
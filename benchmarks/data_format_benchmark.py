@@ -0,0 +1,47 @@
+#
+# Time and peak memory to respond to a query returning a large NumPy array
+# as an ASCii list compared with REAL and INTeger blocks.
+#
+# Run with: python benchmarks/data_format_benchmark.py
+#
+import time
+import tracemalloc
+
+import numpy
+
+from context import CommandInterpreter
+from context import QueryHandler
+
+SIZES = [10000, 100000, 1000000]
+FORMATS = [('ASC',None),('REAL',32),('REAL',64),('INT',16)]
+
+class TraceHandler(QueryHandler):
+    def __init__(self,values):
+        self.values = values
+    def query(self,program_header):
+        return self.values
+
+def response_length(response):
+    if isinstance(response,str):
+        return len(response)
+    return sum(len(memoryview(buffer).cast('B')) for buffer in response)
+
+def main():
+    for size in SIZES:
+        handler = TraceHandler(numpy.random.default_rng(1).standard_normal(size))
+        interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        interpreter.register_query_handler("TRACe:DATA",handler)
+        data_format = interpreter.get_data_format()
+        for format_type,length in FORMATS:
+            data_format.set_format(format_type,length)
+            tracemalloc.start()
+            start = time.perf_counter()
+            response = interpreter.process_line("TRAC:DATA?")
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("%8d points %-8s %10.3f ms  %10d bytes  peak alloc %10d bytes" % (
+                size,format_type+("" if length is None else ","+str(length)),elapsed*1000,response_length(response),peak))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#
+# The cost of lines with errors when they are reported as messages (the
+# default) and when they go to the SCPI error queue, for a client flooding
+# the interpreter with bad lines. The cost of a good line is shown for
+# comparison.
+#
+# Run with: python benchmarks/error_flood_benchmark.py
+#
+import random
+import time
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+
+LINE_COUNT = 5000
+
+GOOD_LINES = ["SOUR:VOLT 1.5","SOUR:VOLT?","MEAS:VOLT?"]
+
+BAD_LINES = {
+    'syntax errors': lambda rng: "SOUR:VOLT " + str(rng.randint(0,1000)) + ",,",
+    'garbage text': lambda rng: " ".join(rng.choice(["This","is","not","SCPI","@","%%"]) for _ in range(6)),
+    'binary junk': lambda rng: bytes(rng.randrange(256) for _ in range(64)).decode('latin-1'),
+    'undefined headers': lambda rng: "SOUR:FREQ " + str(rng.randint(0,1000)),
+    'repeated line': lambda rng: "This is crap",
+}
+
+class NullHandler(QueryHandler,CommandHandler):
+    def query(self,program_header):
+        return "1.5"
+    def set(self,program_header,program_data):
+        return ""
+
+def make_interpreter(parser_mode,error_queue_size,plan_cache_size):
+    interpreter = CommandInterpreter(parser_mode=parser_mode,error_queue_size=error_queue_size,plan_cache_size=plan_cache_size)
+    handler = NullHandler()
+    for key in ["SOURce:VOLTage","MEASure:VOLTage"]:
+        interpreter.register_command_handler(key,handler)
+        interpreter.register_query_handler(key,handler)
+    interpreter.freeze()
+    return interpreter
+
+def us_per_line(interpreter,lines):
+    start = time.perf_counter()
+    for line in lines:
+        interpreter.process_line(line)
+    return (time.perf_counter() - start) / len(lines) * 1e6
+
+def main():
+    rng = random.Random(1)
+    workloads = { name:[make(rng) for _ in range(LINE_COUNT)] for name,make in BAD_LINES.items() }
+    workloads['good lines'] = [GOOD_LINES[index % len(GOOD_LINES)] for index in range(LINE_COUNT)]
+    modes = [
+        ("messages",0,0),
+        ("error queue",20,0),
+        ("error queue + plan cache",20,1024),
+    ]
+    for parser_mode in CommandInterpreter.PARSER_MODES:
+        lines = LINE_COUNT if parser_mode == CommandInterpreter.PARSER_MODE_LALR else LINE_COUNT // 5
+        print(parser_mode + " (us per line)")
+        print("  %-20s" % "" + "".join("%28s" % name for name,_,_ in modes))
+        for workload,workload_lines in workloads.items():
+            times = []
+            for name,error_queue_size,plan_cache_size in modes:
+                interpreter = make_interpreter(parser_mode,error_queue_size,plan_cache_size)
+                times.append(us_per_line(interpreter,workload_lines[:lines]))
+            print("  %-20s" % workload + "".join("%28.1f" % elapsed for elapsed in times))
+
+if __name__ == '__main__':
+    main()
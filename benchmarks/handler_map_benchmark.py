@@ -0,0 +1,68 @@
+#
+# Compares HandlerMap.find_handler on the mutable tree against the flattened
+# table built by freeze() using a tree of a few thousand SCPI-99 style headers.
+#
+# Run with: python benchmarks/handler_map_benchmark.py
+#
+import random
+import timeit
+import tracemalloc
+
+from context import HandlerMap
+
+SUBSYSTEMS = ["ABORt","ARM","CALCulate","CALibration","CONFigure","CONTrol","DIAGnostic","DISPlay",
+    "FETCh","FORMat","HCOPy","INITiate","INPut","INSTrument","MEASure","MEMory","MMEMory","OUTPut",
+    "PROGram","READ","ROUTe","SENSe","SOURce","STATus","SYSTem","TEST","TRACe","TRIGger","UNIT"]
+FUNCTIONS = ["VOLTage","CURRent","FREQuency","POWer","RESistance","TEMPerature","PHASe","FUNCtion",
+    "LIST","SWEep","MARKer","LIMit"]
+SETTINGS = ["LEVel","RANGe","AUTO","MODE","STATe","DELay","COUNt","SLOPe","SOURce","TIMer","OFFSet"]
+
+LOOKUPS = 10000
+
+def header_names():
+    names = []
+    for subsystem in SUBSYSTEMS:
+        for function in FUNCTIONS:
+            names.append(subsystem+":"+function)
+            for setting in SETTINGS:
+                names.append(subsystem+":"+function+":"+setting)
+    return names
+
+def spellings(name):
+    long_name = name.upper()
+    short_name = ":".join(map(lambda part: "".join(c for c in part if c.isupper()),name.split(":")))
+    return [long_name,short_name,long_name.lower(),short_name.lower()]
+
+def build_map(names):
+    handler_map = HandlerMap()
+    for name in names:
+        handler_map.register_handler(name,name)
+    return handler_map
+
+def measure_memory(function):
+    tracemalloc.start()
+    result = function()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result,size
+
+def main():
+    names = header_names()
+    rand = random.Random(1)
+    queries = [rand.choice(spellings(rand.choice(names))) for _ in range(LOOKUPS)]
+    queries += ["NOT:A:HEADER"] * (LOOKUPS // 10)
+
+    handler_map,tree_size = measure_memory(lambda: build_map(names))
+    tree_time = min(timeit.repeat(lambda: [handler_map.find_handler(q) for q in queries],number=1,repeat=5))
+
+    _,frozen_size = measure_memory(handler_map.freeze)
+    frozen_time = min(timeit.repeat(lambda: [handler_map.find_handler(q) for q in queries],number=1,repeat=5))
+
+    freeze_time = min(timeit.repeat(handler_map.freeze,number=1,repeat=5))
+
+    print("%d headers, %d lookups" % (len(names),len(queries)))
+    print("tree    %8.3f us/lookup  %8d bytes" % (tree_time/len(queries)*1e6,tree_size))
+    print("frozen  %8.3f us/lookup  %8d bytes (extra)  freeze %.3f ms" % (frozen_time/len(queries)*1e6,frozen_size,freeze_time*1000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#
+# The cost of the metrics. Times the same lines with metrics disabled (the
+# default) and enabled and prints a snapshot of what was collected.
+#
+# Run with: python benchmarks/metrics_benchmark.py
+#
+import time
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+
+REPEATS = 5
+COUNT = 50000
+LINES = ["MEAS:VOLT?","SOUR:VOLT 1.5","SOUR:VOLT 1.5;CURR 0.1;:MEAS:VOLT?"]
+
+class ValueHandler(QueryHandler,CommandHandler):
+    def query(self,program_header):
+        return "1.2345E+00"
+    def set(self,program_header,program_data):
+        return ""
+
+def make_interpreter():
+    interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+    for key in ["MEASure:VOLTage","SOURce:VOLTage","SOURce:CURRent"]:
+        interpreter.register_command_handler(key,ValueHandler())
+        interpreter.register_query_handler(key,ValueHandler())
+    interpreter.freeze()
+    return interpreter
+
+def run(interpreter,line):
+    start = time.perf_counter()
+    for _ in range(COUNT):
+        interpreter.process_line(line)
+    return (time.perf_counter() - start) / COUNT
+
+def main():
+    disabled = make_interpreter()
+    enabled = make_interpreter()
+    metrics = enabled.enable_metrics()
+    for line in LINES:
+        # Alternate the runs so both see the same machine load
+        off = min(run(disabled,line) for _ in range(REPEATS))
+        on = min(run(enabled,line) for _ in range(REPEATS))
+        for _ in range(REPEATS):
+            off = min(off,run(disabled,line))
+            on = min(on,run(enabled,line))
+        print("%-40s disabled %7.3f us  enabled %7.3f us  (+%.1f%%)" % (line,off*1e6,on*1e6,(on/off-1)*100))
+    print(metrics.to_json())
+
+if __name__ == '__main__':
+    main()
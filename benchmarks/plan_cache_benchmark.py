@@ -0,0 +1,73 @@
+#
+# Lines per second for a test rack like workload (a few hundred distinct
+# lines sent over and over with a skewed distribution) with and without the
+# plan cache.
+#
+# Run with: python benchmarks/plan_cache_benchmark.py
+#
+import random
+import time
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+
+LINE_COUNT = 100000
+CACHE_SIZE = 1024
+
+SUBSYSTEMS = ["MEASure:VOLTage:DC","MEASure:VOLTage:AC","MEASure:CURRent:DC","SOURce:VOLTage","SOURce:CURRent",
+    "SOURce:FREQuency","TRIGger:SOURce","TRIGger:DELay","SENSe:AVERage:COUNt","OUTPut:STATe"]
+
+class ValueHandler(QueryHandler,CommandHandler):
+    def query(self,program_header):
+        return "1.2345E+00"
+    def set(self,program_header,program_data):
+        return ""
+
+def make_lines():
+    lines = []
+    for channel in range(1,21):
+        for subsystem in SUBSYSTEMS:
+            lines.append(subsystem.replace(":","%d:" % channel,1)+"?")
+            lines.append(subsystem.replace(":","%d:" % channel,1)+" %g" % (channel * 0.25))
+    lines.append("TRIG:SOUR BUS;*IDN?")
+    lines.append("SOUR1:VOLT 1.5;CURR 0.1;:OUTP1:STAT 1")
+    return lines
+
+def make_workload(lines):
+    rng = random.Random(1)
+    weights = [1.0 / (rank + 1) for rank in range(len(lines))]
+    return rng.choices(lines,weights,k=LINE_COUNT)
+
+def make_interpreter(parser_mode,fast_path,plan_cache_size):
+    interpreter = CommandInterpreter(parser_mode=parser_mode,fast_path=fast_path,plan_cache_size=plan_cache_size)
+    handler = ValueHandler()
+    for subsystem in SUBSYSTEMS:
+        parts = subsystem.split(":")
+        for channel in range(1,21):
+            key = ":".join([parts[0]+str(channel)] + parts[1:])
+            interpreter.register_command_handler(key,handler)
+            interpreter.register_query_handler(key,handler)
+    interpreter.freeze()
+    return interpreter
+
+def main():
+    lines = make_lines()
+    workload = make_workload(lines)
+    print("%d lines, %d distinct" % (len(workload),len(set(workload))))
+    for parser_mode in CommandInterpreter.PARSER_MODES:
+        for fast_path in (False,True):
+            for plan_cache_size in (0,CACHE_SIZE):
+                interpreter = make_interpreter(parser_mode,fast_path,plan_cache_size)
+                count = len(workload) if parser_mode == CommandInterpreter.PARSER_MODE_LALR or fast_path else len(workload) // 10
+                start = time.perf_counter()
+                for line in workload[:count]:
+                    interpreter.process_line(line)
+                elapsed = time.perf_counter() - start
+                cache = interpreter.get_plan_cache()
+                stats = "hits %d misses %d" % (cache.get_hits(),cache.get_misses()) if cache else ""
+                print("%-6s fast_path=%-5s plan_cache=%-5d %10.0f lines/s  %6.2f us/line  %s" % (
+                    parser_mode,fast_path,plan_cache_size,count/elapsed,elapsed/count*1e6,stats))
+
+if __name__ == '__main__':
+    main()
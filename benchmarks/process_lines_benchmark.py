@@ -0,0 +1,72 @@
+#
+# Time to run a scripted sequence of 100k lines with a loop over process_line
+# compared with process_lines (with and without preparse and the plan cache).
+#
+# Run with: python benchmarks/process_lines_benchmark.py
+#
+import random
+import time
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+
+LINE_COUNT = 100000
+
+class ValueHandler(QueryHandler,CommandHandler):
+    def query(self,program_header):
+        return "1.2345E+00"
+    def set(self,program_header,program_data):
+        return ""
+
+def make_script():
+    rng = random.Random(1)
+    lines = []
+    for index in range(LINE_COUNT):
+        choice = rng.random()
+        if choice < 0.4:
+            lines.append("SOUR%d:VOLT %.3f" % (rng.randrange(1,9),rng.uniform(0,10)))
+        elif choice < 0.8:
+            lines.append("MEAS%d:VOLT?" % rng.randrange(1,9))
+        elif choice < 0.95:
+            lines.append("SOUR%d:VOLT 1.5;CURR 0.1;:MEAS%d:CURR?" % (rng.randrange(1,9),rng.randrange(1,9)))
+        else:
+            lines.append("*IDN?")
+    return lines
+
+def make_interpreter(plan_cache_size):
+    interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,plan_cache_size=plan_cache_size)
+    handler = ValueHandler()
+    for channel in range(1,9):
+        for key in ["SOURce%d:VOLTage","SOURce%d:CURRent","MEASure%d:VOLTage","MEASure%d:CURRent"]:
+            interpreter.register_command_handler(key % channel,handler)
+            interpreter.register_query_handler(key % channel,handler)
+    interpreter.freeze()
+    return interpreter
+
+def loop(interpreter,lines):
+    return [interpreter.process_line(line) for line in lines]
+
+def batch(interpreter,lines):
+    return list(interpreter.process_lines(lines))
+
+def batch_preparse(interpreter,lines):
+    return list(interpreter.process_lines(lines,preparse=True))
+
+def main():
+    lines = make_script()
+    print("%d lines, %d distinct" % (len(lines),len(set(lines))))
+    expected = None
+    for plan_cache_size in (0,4096):
+        for name,run in [("process_line loop",loop),("process_lines",batch),("process_lines preparse",batch_preparse)]:
+            interpreter = make_interpreter(plan_cache_size)
+            start = time.perf_counter()
+            responses = run(interpreter,lines)
+            elapsed = time.perf_counter() - start
+            if expected is None:
+                expected = responses
+            assert responses == expected
+            print("%-24s plan_cache=%-5d %8.3f s  %10.0f lines/s" % (name,plan_cache_size,elapsed,len(lines)/elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#
+# Lines per second for a polling workload (mostly queries of settings with
+# the occasional command changing one) where each query is a hardware
+# readback taking READBACK_TIME seconds, with and without the response
+# cache. Also shows what caching costs a command that has to invalidate.
+#
+# Run with: python benchmarks/response_cache_benchmark.py
+#
+import random
+import time
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+
+LINE_COUNT = 20000
+READBACK_TIME = 0.0001
+SET_FRACTION = 0.05
+
+HEADERS = ["SOURce:VOLTage","SOURce:CURRent","SOURce:VOLTage:PROTection","OUTPut:STATe",
+    "SENSe:VOLTage:RANGe","SENSe:CURRent:RANGe","TRIGger:SOURce","TRIGger:DELay"]
+
+class ReadbackHandler(QueryHandler,CommandHandler):
+    def __init__(self):
+        self.value = "0"
+        self.reads = 0
+
+    def set(self,program_header,program_data):
+        self.value = str(program_data)
+        return ""
+
+    def query(self,program_header):
+        self.reads += 1
+        # Stands in for the round trip to the hardware
+        end = time.perf_counter() + READBACK_TIME
+        while time.perf_counter() < end:
+            pass
+        return self.value
+
+class CachedReadbackHandler(ReadbackHandler):
+    cache_responses = True
+
+def make_interpreter(handler_class):
+    interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,plan_cache_size=1024)
+    handlers = []
+    for header in HEADERS:
+        handler = handler_class()
+        handlers.append(handler)
+        interpreter.register_command_handler(header,handler)
+        interpreter.register_query_handler(header,handler)
+    interpreter.freeze()
+    return interpreter,handlers
+
+def make_workload():
+    rng = random.Random(1)
+    lines = []
+    for _ in range(LINE_COUNT):
+        header = rng.choice(HEADERS)
+        if rng.random() < SET_FRACTION:
+            lines.append(header + " %d" % rng.randint(0,10))
+        else:
+            lines.append(header + "?")
+    return lines
+
+def run(interpreter,lines):
+    start = time.perf_counter()
+    for line in lines:
+        interpreter.process_line(line)
+    return time.perf_counter() - start
+
+def main():
+    workload = make_workload()
+    for name,handler_class in [("no cache",ReadbackHandler),("response cache",CachedReadbackHandler)]:
+        interpreter,handlers = make_interpreter(handler_class)
+        elapsed = run(interpreter,workload)
+        reads = sum(handler.reads for handler in handlers)
+        text = "%-16s %8.0f lines/s  %6d readbacks" % (name,len(workload)/elapsed,reads)
+        cache = interpreter.get_response_cache()
+        if cache is not None:
+            text += "  hits %d misses %d invalidations %d" % (cache.get_hits(),cache.get_misses(),cache.get_invalidations())
+        print(text)
+
+    # The cost to a command of invalidating cached responses
+    commands = ["SOUR:VOLT %d" % value for value in range(10)] * 2000
+    for name,handler_class in [("no cache",ReadbackHandler),("response cache",CachedReadbackHandler)]:
+        interpreter,handlers = make_interpreter(handler_class)
+        # Fill the cache with the responses for the other headers
+        interpreter.process_line("SOUR:CURR?;VOLT:PROT?;:OUTP:STAT?;:SENS:VOLT:RANG?;:TRIG:SOUR?")
+        elapsed = run(interpreter,commands)
+        print("%-16s %8.2f us/command" % (name,elapsed/len(commands)*1e6))
+
+if __name__ == '__main__':
+    main()
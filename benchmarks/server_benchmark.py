@@ -0,0 +1,57 @@
+#
+# Throughput and latency of SCPIServer with a number of concurrent simulated
+# clients each sending queries over loopback and waiting for each response.
+#
+# Run with: python benchmarks/server_benchmark.py [clients] [requests per client]
+#
+import asyncio
+import statistics
+import sys
+import time
+
+from context import CommandInterpreter
+from context import QueryHandler
+from context import SCPIServer
+
+class VoltageHandler(QueryHandler):
+    def query(self,program_header,call_context=None):
+        return "12.4"
+
+async def client(port,requests,latencies):
+    reader,writer = await asyncio.open_connection('127.0.0.1',port)
+    for _ in range(requests):
+        start = time.perf_counter()
+        writer.write(b"SOUR:VOLT?\n")
+        await reader.readline()
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+    await writer.wait_closed()
+
+async def run(clients,requests):
+    interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+    interpreter.register_query_handler("SOURce:VOLTage",VoltageHandler())
+    interpreter.freeze()
+    server = SCPIServer(interpreter,host='127.0.0.1',port=0)
+    await server.start()
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(server.port,requests,latencies) for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+
+    latencies.sort()
+    print("%d clients x %d requests: %.0f requests/s, latency p50 %.3f ms p99 %.3f ms max %.3f ms" % (
+        clients,requests,len(latencies)/elapsed,
+        statistics.median(latencies)*1000,
+        latencies[int(len(latencies)*0.99)]*1000,
+        latencies[-1]*1000))
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    for count in [clients] if clients else [1,10,100,500]:
+        asyncio.run(run(count,requests if clients else 20000 // count))
+
+if __name__ == '__main__':
+    main()
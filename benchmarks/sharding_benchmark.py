@@ -0,0 +1,107 @@
+#
+# Lines per second for a workload spread over many instrument channels run
+# on one interpreter, on a thread_safe interpreter shared by several threads
+# and on a ShardedInterpreter with a growing number of worker processes. The
+# threads share the GIL so only the processes should scale with the number
+# of cores.
+#
+# Run with: python benchmarks/sharding_benchmark.py [max processes]
+#
+import os
+import sys
+import threading
+import time
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+from context import InterpreterSpec
+from context import ShardedInterpreter
+
+CHANNELS = 64
+LINES_PER_CHANNEL = 500
+
+#
+# Stands in for a handler doing some real work (such as scaling a reading)
+#
+class MeasureHandler(QueryHandler,CommandHandler):
+    def __init__(self):
+        self.level = 1.0
+
+    def set(self,program_header,program_data,call_context=None):
+        self.level = program_data
+        return ""
+
+    def query(self,program_header,call_context=None):
+        total = 0.0
+        for index in range(200):
+            total += self.level * index
+        return "%.6E" % total
+
+def make_spec():
+    # No plan cache so every line is parsed
+    spec = InterpreterSpec(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+    handler = MeasureHandler()
+    spec.register_command_handler("SOURce:VOLTage:LEVel",handler)
+    spec.register_query_handler("MEASure:VOLTage",handler)
+    return spec
+
+def make_workload():
+    return { channel:["SOUR:VOLT:LEV %d.%03d;:MEAS:VOLT?" % (channel,index) for index in range(LINES_PER_CHANNEL)]
+        for channel in range(CHANNELS) }
+
+def run_single(workload):
+    interpreter = make_spec().build()
+    start = time.perf_counter()
+    for channel,lines in workload.items():
+        for line in lines:
+            interpreter.process_line(line,channel)
+    return time.perf_counter() - start
+
+def run_threads(workload,thread_count):
+    spec = make_spec()
+    spec.interpreter_options['thread_safe'] = True
+    interpreter = spec.build()
+    channels = list(workload)
+
+    def run(thread_index):
+        for channel in channels[thread_index::thread_count]:
+            for line in workload[channel]:
+                interpreter.process_line(line,channel)
+
+    threads = [threading.Thread(target=run,args=(index,)) for index in range(thread_count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+def run_sharded(workload,processes):
+    with ShardedInterpreter(make_spec(),processes=processes) as sharded:
+        # Wait for the processes to start
+        sharded.process_sharded({ shard:["*IDN?"] for shard in range(processes) })
+        start = time.perf_counter()
+        sharded.process_sharded(workload)
+        return time.perf_counter() - start
+
+def main():
+    cpus = os.cpu_count() or 1
+    max_processes = int(sys.argv[1]) if len(sys.argv) > 1 else max(cpus,4)
+    workload = make_workload()
+    count = CHANNELS * LINES_PER_CHANNEL
+    print("%d CPUs, %d channels x %d lines" % (cpus,CHANNELS,LINES_PER_CHANNEL))
+    elapsed = run_single(workload)
+    single = count / elapsed
+    print("%-24s %10.0f lines/s" % ("one interpreter",single))
+    for thread_count in (2,4):
+        rate = count / run_threads(workload,thread_count)
+        print("%-24s %10.0f lines/s  %5.2fx" % ("%d threads, shared" % thread_count,rate,rate/single))
+    processes = 1
+    while processes <= max_processes:
+        rate = count / run_sharded(workload,processes)
+        print("%-24s %10.0f lines/s  %5.2fx" % ("%d processes" % processes,rate,rate/single))
+        processes *= 2
+
+if __name__ == '__main__':
+    main()
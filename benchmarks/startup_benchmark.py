@@ -0,0 +1,45 @@
+#
+# Measures how long it takes to construct a CommandInterpreter
+#
+#   cold        - nothing cached, the grammar is compiled from scratch
+#   warm disk   - a new process loading the compiled LALR parser from cache_dir
+#   warm memory - another interpreter in a process that already has the parser
+#
+# Run with: python benchmarks/startup_benchmark.py
+#
+import shutil
+import statistics
+import tempfile
+import time
+
+from context import CommandInterpreter
+from context import ParserCache
+
+REPEATS = 20
+
+def time_construction(parser_mode,cache_dir,before_each):
+    times = []
+    for _ in range(REPEATS):
+        before_each()
+        start = time.perf_counter()
+        CommandInterpreter(parser_mode=parser_mode,cache_dir=cache_dir)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000.0
+
+def main():
+    for parser_mode in CommandInterpreter.PARSER_MODES:
+        cache_dir = tempfile.mkdtemp()
+        try:
+            def cold():
+                ParserCache.clear()
+                shutil.rmtree(cache_dir,ignore_errors=True)
+            cold_ms = time_construction(parser_mode,cache_dir,cold)
+            warm_disk_ms = time_construction(parser_mode,cache_dir,ParserCache.clear)
+            warm_memory_ms = time_construction(parser_mode,cache_dir,lambda: None)
+        finally:
+            shutil.rmtree(cache_dir,ignore_errors=True)
+        print("%-8s cold %8.3f ms   warm disk %8.3f ms   warm memory %8.3f ms"
+            % (parser_mode,cold_ms,warm_disk_ms,warm_memory_ms))
+
+if __name__ == '__main__':
+    main()
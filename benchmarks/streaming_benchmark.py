@@ -0,0 +1,80 @@
+#
+# Time to first byte, total time and peak memory for process_line (which
+# builds the whole response) and iter_process_line (which yields it in chunks)
+# for lines with many units and for a query with a very large response.
+#
+# Run with: python benchmarks/streaming_benchmark.py
+#
+import time
+import tracemalloc
+
+from context import CommandInterpreter
+from context import QueryHandler
+
+UNITS = [10, 1000, 10000]
+RESPONSE_SIZES = [1 << 20, 64 << 20]
+CHUNK_SIZE = 64 << 10
+
+class ValueHandler(QueryHandler):
+    def query(self,program_header):
+        return "1.2345678E+00"
+
+class ChunkedHandler(QueryHandler):
+    def __init__(self,size):
+        self.size = size
+    def query(self,program_header):
+        chunk = "1" * CHUNK_SIZE
+        return (chunk for _ in range(self.size // CHUNK_SIZE))
+
+class JoinedHandler(ChunkedHandler):
+    def query(self,program_header):
+        return "".join(super().query(program_header))
+
+def run_whole(interpreter,line):
+    start = time.perf_counter()
+    interpreter.process_line(line)
+    elapsed = time.perf_counter() - start
+    return elapsed,elapsed
+
+def run_streamed(interpreter,line):
+    start = time.perf_counter()
+    first = None
+    for chunk in interpreter.iter_process_line(line):
+        if first is None:
+            first = time.perf_counter() - start
+    return first,time.perf_counter() - start
+
+#
+# The times are measured without tracemalloc (which slows allocation down)
+# and the peak memory with it
+#
+def measure(run,interpreter,line):
+    first,elapsed = run(interpreter,line)
+    tracemalloc.start()
+    run(interpreter,line)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first,elapsed,peak
+
+def report(name,result):
+    first,elapsed,peak = result
+    print("%-40s first byte %10.3f ms  total %10.3f ms  peak alloc %12d bytes" % (name,first*1000,elapsed*1000,peak))
+
+def main():
+    interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+    interpreter.register_query_handler("MEASure:VOLTage",ValueHandler())
+    for units in UNITS:
+        line = ";".join(["MEAS:VOLT?"] * units)
+        report("%6d units process_line" % units,measure(run_whole,interpreter,line))
+        report("%6d units iter_process_line" % units,measure(run_streamed,interpreter,line))
+
+    for size in RESPONSE_SIZES:
+        interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        interpreter.register_query_handler("TRACe:DATA",JoinedHandler(size))
+        report("%3d MB response process_line" % (size >> 20),measure(run_whole,interpreter,"TRAC:DATA?"))
+        interpreter = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        interpreter.register_query_handler("TRACe:DATA",ChunkedHandler(size))
+        report("%3d MB response iter_process_line" % (size >> 20),measure(run_streamed,interpreter,"TRAC:DATA?"))
+
+if __name__ == '__main__':
+    main()
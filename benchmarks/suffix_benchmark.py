@@ -0,0 +1,87 @@
+#
+# The cost of suffixed decimal data (10.0MHz). Compares a handler parsing
+# the units out of the raw text itself with the interpreter scaling them at
+# parse time, and converting a long list of suffixed values one at a time
+# with converting it in one go.
+#
+# Run with: python benchmarks/suffix_benchmark.py
+#
+import re
+import time
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import ArgumentConverter
+
+ITERATIONS = 20000
+LIST_LENGTH = 1000
+
+SUFFIXES = ["MHZ","KHZ","HZ","MV","V","UA","MA","A"]
+
+#
+# What a handler had to do before: split the number from the suffix and look
+# up the multiplier (without any checks for ambiguous suffixes)
+#
+class HandlerParsedHandler(CommandHandler):
+    argument_types = (str,)
+    NUMBER = re.compile(r'([-+0-9.Ee]+)\s*([A-Za-z]*)')
+    MULTIPLIERS = { 'MA':1e6, 'K':1e3, 'M':1e-3, 'U':1e-6, '':1.0 }
+    UNITS = ("HZ","V","A")
+
+    def __init__(self,line_text):
+        self.line_text = line_text
+
+    def set(self,program_header,program_data):
+        number,suffix = self.NUMBER.match(self.line_text).groups()
+        suffix = suffix.upper()
+        for unit in self.UNITS:
+            if suffix.endswith(unit):
+                return float(number) * self.MULTIPLIERS.get(suffix[:-len(unit)],1.0)
+        return float(number)
+
+class ScaledHandler(CommandHandler):
+    argument_types = (float,)
+    def set(self,program_header,program_data):
+        return ""
+
+def time_lines(interpreter,lines,handler=None):
+    start = time.perf_counter()
+    for index in range(ITERATIONS):
+        line = lines[index % len(lines)]
+        if handler is not None:
+            handler.line_text = line[5:]
+        interpreter.process_line(line)
+    return (time.perf_counter() - start) / ITERATIONS
+
+def main():
+    lines = ["FREQ %d.5 %s" % (index,suffix) for index in range(50) for suffix in SUFFIXES]
+    for plan_cache_size in (0,1024):
+        raw = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,plan_cache_size=plan_cache_size)
+        handler = HandlerParsedHandler("")
+        raw.register_command_handler("FREQuency",handler)
+        scaled = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,plan_cache_size=plan_cache_size)
+        scaled.register_command_handler("FREQuency",ScaledHandler())
+        # Warm the caches
+        time_lines(raw,lines,handler)
+        time_lines(scaled,lines)
+        raw_time = time_lines(raw,lines,handler)
+        scaled_time = time_lines(scaled,lines)
+        print("plan_cache=%-5d handler parses units %6.2f us/line  parse time scaling %6.2f us/line" % (
+            plan_cache_size,raw_time*1e6,scaled_time*1e6))
+
+    converter = ArgumentConverter()
+    program_data = [(ArgumentConverter.DECIMAL,"%d.25" % index,SUFFIXES[index % 3]) for index in range(LIST_LENGTH)]
+    repeats = 200
+    start = time.perf_counter()
+    for _ in range(repeats):
+        tuple(converter.convert_to(arg,float) for arg in program_data)
+    one_at_a_time = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        converter.convert_floats(program_data)
+    in_one_go = (time.perf_counter() - start) / repeats
+    print("%d suffixed values: one at a time %8.1f us  convert_floats %8.1f us  (%.1fx)" % (
+        LIST_LENGTH,one_at_a_time*1e6,in_one_go*1e6,one_at_a_time/in_one_go))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#
+# Sustained throughput (millions of samples a second) of acquisition data
+# fetched with FETCh? from a TraceBuffer, against a handler that keeps the
+# samples in a Python list and formats them itself. Each round appends
+# CHUNK_SIZE samples and fetches them. The last case has a separate process
+# writing into a memory mapped TraceBuffer as fast as it can while this one
+# fetches.
+#
+# The time is for producing the response (as it would be handed to the
+# transport) so a zero copy response costs the same however big it is.
+#
+# Run with: python benchmarks/trace_benchmark.py
+#
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy
+
+from context import CommandInterpreter
+from context import QueryHandler
+from context import TraceBuffer
+from context import TraceHandler
+
+CHUNK_SIZE = 100000
+BUFFER_SIZE = 1 << 22
+DURATION = 1.0
+
+#
+# What each application used to write
+#
+class ListHandler(QueryHandler):
+    def __init__(self):
+        self.samples = []
+
+    def append(self,samples):
+        self.samples.extend(samples.tolist())
+
+    def query(self,program_header):
+        samples = self.samples
+        self.samples = []
+        return ",".join(map(str,samples))
+
+def make_interpreter():
+    return CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,plan_cache_size=16)
+
+def run(interpreter,append):
+    chunk = numpy.random.default_rng(1).standard_normal(CHUNK_SIZE).astype(numpy.float32)
+    samples = 0
+    response_bytes = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        append(chunk)
+        response = interpreter.process_line("FETC?")
+        samples += CHUNK_SIZE
+        response_bytes += len(response) if isinstance(response,str) else sum(len(part) for part in response)
+    elapsed = time.perf_counter() - start
+    return samples / elapsed / 1e6,response_bytes / samples
+
+def list_handler():
+    interpreter = make_interpreter()
+    handler = ListHandler()
+    interpreter.register_query_handler("FETCh",handler)
+    return run(interpreter,handler.append)
+
+def trace_handler(data_format,byte_order):
+    interpreter = make_interpreter()
+    trace = TraceBuffer(BUFFER_SIZE,numpy.float32)
+    TraceHandler(trace).register(interpreter)
+    interpreter.process_line("FORM "+data_format+";:FORM:BORD "+byte_order)
+    return run(interpreter,trace.append)
+
+def write_forever(path,stop):
+    trace = TraceBuffer(dtype=numpy.float32,path=path)
+    chunk = numpy.arange(CHUNK_SIZE,dtype=numpy.float32)
+    while not stop.is_set():
+        trace.append(chunk)
+
+def mapped_writer():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory,"trace")
+        trace = TraceBuffer(BUFFER_SIZE,numpy.float32,path=path)
+        interpreter = make_interpreter()
+        TraceHandler(trace).register(interpreter)
+        interpreter.process_line("FORM REAL,32;:FORM:BORD SWAP")
+        context = multiprocessing.get_context()
+        stop = context.Event()
+        writer = context.Process(target=write_forever,args=(path,stop))
+        writer.start()
+        samples = 0
+        fetches = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < DURATION:
+            response = interpreter.process_line("FETC?")
+            samples += sum(len(part) for part in response[1:-1]) // 4
+            fetches += 1
+        elapsed = time.perf_counter() - start
+        stop.set()
+        writer.join()
+        return samples / elapsed / 1e6,fetches,trace.get_written(),trace.get_lost()
+
+def main():
+    print("%-34s %10s %14s" % ("","MSa/s","bytes/sample"))
+    print("%-34s %10.2f %14.1f" % ("list handler (ASCII)",*list_handler()))
+    for data_format,byte_order,name in [("ASC","NORM","TraceHandler ASCII"),
+            ("REAL,32","NORM","TraceHandler REAL,32 NORM (copy)"),
+            ("REAL,32","SWAP","TraceHandler REAL,32 SWAP (views)")]:
+        print("%-34s %10.2f %14.1f" % (name,*trace_handler(data_format,byte_order)))
+    rate,fetches,written,lost = mapped_writer()
+    print("%-34s %10.2f   (%d fetches, %d written, %d lost)" % ("mapped, writer process",rate,fetches,written,lost))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+if __package__:
+    from .SuffixTable import SuffixTable
+    from .SuffixTable import Quantity
+    from .ChannelList import ChannelList
+    from .ChannelList import ChannelListException
+    from .ErrorQueue import ErrorQueue
+else:
+    from SuffixTable import SuffixTable
+    from SuffixTable import Quantity
+    from ChannelList import ChannelList
+    from ChannelList import ChannelListException
+    from ErrorQueue import ErrorQueue
+
+#
+# The code is the SCPI error (see ErrorQueue) reported for the argument
+#
+class ArgumentException(ValueError):
+    def __init__(self,message,code=ErrorQueue.DATA_TYPE_ERROR):
+        super().__init__(message)
+        self.code = code
+    def get_code(self):
+        return self.code
+
+#
+# Converts program data (the (type,value,suffix) tuples from a
+# ProgramMessageUnit) into Python values for the handlers.
+#
+# Without any declared types decimal numeric data becomes a float (or, if it
+# has a suffix, a Quantity scaled by the suffix multiplier and tagged with the
+# unit, see SuffixTable), non-decimal numeric data (#H, #Q and #B) an int, string data the string without its
+# quotes, character data the mnemonic, block data the payload and channel
+# lists a ChannelList.
+#
+# Handlers can instead declare the types of their arguments by setting
+# argument_types to a tuple with an entry for each argument (see
+# CommandHandler). The entries can be:
+#
+#   float       decimal or non-decimal numeric data
+#   int         non-decimal numeric data or decimal data with an integer value
+#   bool        ON, OFF or numeric data (non-zero is True)
+#   str         string data (unquoted) or the text of any other data
+#   bytes       block or string data as bytes
+#   memoryview  block data without copying it (for bytes lines)
+#   None        any data converted as above
+#   Unit("V")   decimal data with no suffix or a suffix in the given unit
+#   ChannelList a channel list
+#   a callable  called with the value converted as above
+#
+# A trailing ... (Ellipsis) means the type before it is repeated for any number
+# of further arguments. The first required_arguments (by default all of them)
+# must be given.
+#
+class ArgumentConverter:
+
+    DECIMAL = 'DECIMAL_NUMERIC_PROGRAM_DATA'
+    NON_DECIMAL = 'NON_DECIMAL_NUMERIC_DATA'
+    STRING = 'STRING_PROGRAM_DATA'
+    BLOCK = 'ARBITRARY_BLOCK_PROGRAM_DATA'
+    CHARACTER = 'PROGRAM_MNEMONIC'
+    CHANNEL_LIST = 'CHANNEL_LIST_PROGRAM_DATA'
+
+    BOOLEAN_VALUES = { "ON":True, "OFF":False }
+
+    def __init__(self):
+        self.suffix_table = SuffixTable()
+
+    def get_suffix_table(self):
+        return self.suffix_table
+
+    def convert(self,program_data):
+        arg_type,arg_value,suffix = program_data
+        if arg_type == self.DECIMAL:
+            # The grammar allows white space before the exponent (1.0 E 3)
+            value = float("".join(arg_value.split()))
+            if suffix is None:
+                return value
+            quantity = self.suffix_table.scale(value,suffix)
+            if quantity is None:
+                raise ArgumentException("Invalid suffix "+suffix,ErrorQueue.INVALID_SUFFIX)
+            return quantity
+        elif arg_type == self.NON_DECIMAL:
+            return self._parse_non_decimal(arg_value)
+        elif arg_type == self.STRING:
+            string_body = arg_value[1:len(arg_value)-1]
+            if arg_value[0] == '\'':
+                string_body = string_body.replace('\'\'','\'')
+            else:
+                string_body = string_body.replace('\"\"','\"')
+            return string_body
+        elif arg_type == self.CHANNEL_LIST:
+            try:
+                return ChannelList.from_string(arg_value)
+            except ChannelListException as err:
+                raise ArgumentException(str(err),ErrorQueue.ILLEGAL_PARAMETER_VALUE) from err
+        else:
+            return arg_value
+
+    def convert_all(self,program_data):
+        return tuple(map(self.convert,program_data))
+
+    #
+    # Raises ValueError if argument_types isn't a valid declaration (so that
+    # a mistake is found when the handler is registered rather than when a
+    # line for it is run)
+    #
+    @staticmethod
+    def check_types(argument_types,required_arguments=None):
+        repeated = len(argument_types) > 0 and argument_types[-1] is Ellipsis
+        types = argument_types[:-1] if repeated else argument_types
+        if repeated and not types:
+            raise ValueError("... must follow the type to repeat")
+        for arg_type in types:
+            if arg_type is Ellipsis:
+                raise ValueError("... can only be the last argument type")
+            if arg_type is not None and not callable(arg_type):
+                raise ValueError("Invalid argument type "+repr(arg_type))
+        if required_arguments is not None:
+            if not isinstance(required_arguments,int) or required_arguments < 0 or \
+                    (required_arguments > len(types) and not repeated):
+                raise ValueError("Invalid required arguments "+repr(required_arguments))
+
+    #
+    # Converts the list of program data using the declared argument_types.
+    # Raises ArgumentException if there are too few or too many arguments or
+    # one can't be converted.
+    #
+    def convert_typed(self,program_data,argument_types,required_arguments=None):
+        repeated = len(argument_types) > 0 and argument_types[-1] is Ellipsis
+        if repeated:
+            argument_types = argument_types[:-1]
+        if required_arguments is None:
+            required_arguments = len(argument_types)
+        if len(program_data) < required_arguments:
+            raise ArgumentException("Missing argument",ErrorQueue.MISSING_PARAMETER)
+        if len(program_data) > len(argument_types) and not repeated:
+            raise ArgumentException("Too many arguments",ErrorQueue.PARAMETER_NOT_ALLOWED)
+        if repeated and len(program_data) > len(argument_types) and argument_types[-1] is float:
+            # A long list of numbers (such as a waveform) is converted in one go
+            return (self.convert_typed(program_data[:len(argument_types)-1],argument_types[:-1])
+                + self.convert_floats(program_data[len(argument_types)-1:]))
+        values = []
+        for index,arg in enumerate(program_data):
+            arg_type = argument_types[min(index,len(argument_types)-1)]
+            values.append(self.convert_to(arg,arg_type))
+        return tuple(values)
+
+    #
+    # Converts a list of numeric program data to a tuple of floats. The
+    # suffixes are looked up once for each different suffix in the list rather
+    # than once per value. Raises ArgumentException if any of it isn't numeric.
+    #
+    def convert_floats(self,program_data):
+        decimal = self.DECIMAL
+        try:
+            values = [float(arg_value) for arg_type,arg_value,suffix in program_data if arg_type == decimal]
+        except ValueError:
+            values = None
+        if values is None or len(values) != len(program_data):
+            return tuple(self.convert_to(arg,float) for arg in program_data)
+        suffixes = { suffix for arg_type,arg_value,suffix in program_data }
+        if suffixes == {None}:
+            return tuple(values)
+        scales = {}
+        for suffix in suffixes:
+            if suffix is not None:
+                scale = self.suffix_table.lookup(suffix)
+                if scale is None:
+                    raise ArgumentException("Invalid suffix "+suffix,ErrorQueue.INVALID_SUFFIX)
+                scales[suffix] = scale
+        result = []
+        for value,(arg_type,arg_value,suffix) in zip(values,program_data):
+            if suffix is None:
+                result.append(value)
+            else:
+                multiplier,divisor,unit = scales[suffix]
+                result.append(Quantity(value * multiplier / divisor,unit))
+        return tuple(result)
+
+    def convert_to(self,program_data,to_type):
+        arg_type,arg_value,suffix = program_data
+        if to_type is None:
+            return self.convert(program_data)
+        if to_type is float:
+            if arg_type == self.DECIMAL:
+                return self.convert(program_data)
+            if arg_type == self.NON_DECIMAL:
+                return float(self.convert(program_data))
+        elif to_type is int:
+            if arg_type == self.NON_DECIMAL:
+                return self.convert(program_data)
+            if arg_type == self.DECIMAL:
+                value = self.convert(program_data)
+                if value.is_integer():
+                    return int(value)
+        elif to_type is bool:
+            if arg_type == self.CHARACTER and arg_value.upper() in self.BOOLEAN_VALUES:
+                return self.BOOLEAN_VALUES[arg_value.upper()]
+            if arg_type == self.DECIMAL or arg_type == self.NON_DECIMAL:
+                return round(self.convert(program_data)) != 0
+        elif to_type is str:
+            if arg_type == self.STRING:
+                return self.convert(program_data)
+            if arg_type != self.BLOCK:
+                return arg_value
+        elif to_type is ChannelList:
+            if arg_type == self.CHANNEL_LIST:
+                return self.convert(program_data)
+        elif to_type is bytes or to_type is memoryview:
+            if arg_type == self.BLOCK or arg_type == self.STRING:
+                value = self.convert(program_data)
+                if isinstance(value,str):
+                    value = value.encode('latin-1')
+                return to_type(value)
+        else:
+            value = self.convert(program_data)
+            try:
+                return to_type(value)
+            except (ValueError,TypeError) as err:
+                raise ArgumentException("Invalid argument "+self._describe(arg_value,suffix)) from err
+        raise ArgumentException("Invalid argument "+self._describe(arg_value,suffix))
+
+    def _parse_non_decimal(self,arg_value):
+        value_body = arg_value[2:len(arg_value)]
+        type_char = arg_value[1].upper()
+        if  type_char == 'H':
+            as_hex_string = "0x"+value_body
+            return int(as_hex_string,16)
+        elif type_char == 'B':
+            as_binary_string = "0b"+value_body
+            return int(as_binary_string,2)
+        elif type_char == 'Q':
+            as_octal_string = "0o"+value_body
+            return int(as_octal_string,8)
+
+    def _describe(self,arg_value,suffix=None):
+        if not isinstance(arg_value,str):
+            return "(block)"
+        if suffix is not None:
+            arg_value += suffix
+        return arg_value if len(arg_value) <= 40 else arg_value[:40]+"..."
@@ -0,0 +1,85 @@
+import re
+
+class BlockDataError(ValueError):
+    pass
+
+#
+# Pulls arbitrary block program data (#<n><length><bytes> and #0<bytes>) out
+# of a line before it is parsed. Blocks can contain anything (including
+# newlines, quotes and semicolons) so they can't be handled by the grammar.
+#
+# Each block is replaced in the text by a placeholder #<index># which the
+# grammar parses as ARBITRARY_BLOCK_PROGRAM_DATA and the payloads are
+# returned separately. When scanning bytes the payloads are memoryviews over
+# the original buffer so the data is never copied.
+#
+class BlockScanner:
+
+    PLACEHOLDER = "#%d#"
+
+    STR_SPECIAL = re.compile(r"#[0-9]|'|\"")
+    STR_QUOTE_END = { "'":re.compile(r"'"), '"':re.compile(r'"') }
+    BYTES_SPECIAL = re.compile(rb"#[0-9]|'|\"")
+    BYTES_QUOTE_END = { ord("'"):re.compile(rb"'"), ord('"'):re.compile(rb'"') }
+
+    #
+    # Takes a str or a bytes like object and returns the text (as a str) with
+    # the blocks replaced by placeholders and the list of payloads
+    #
+    def extract(self,data):
+        if isinstance(data,str):
+            if '#' not in data:
+                return data,[]
+            return self._extract(data,self.STR_SPECIAL,self.STR_QUOTE_END,'#',"\n")
+        view = memoryview(data).cast('B') if isinstance(data,memoryview) else memoryview(data)
+        return self._extract(view,self.BYTES_SPECIAL,self.BYTES_QUOTE_END,ord('#'),ord("\n"))
+
+    def _extract(self,data,special,quote_end,hash_char,newline):
+        parts = []
+        blocks = []
+        text_start = 0
+        pos = 0
+        end = len(data)
+        while True:
+            match = special.search(data,pos)
+            if not match:
+                break
+            start = match.start()
+            if data[start] != hash_char:
+                # Skip over string program data
+                close = quote_end[data[start]].search(data,start+1)
+                if not close:
+                    break
+                pos = close.end()
+                continue
+
+            digit = data[start+1]
+            digits = digit - 48 if isinstance(digit,int) else int(digit)
+            if digits == 0:
+                # An indefinite length block runs to the end of the message
+                payload_start = start + 2
+                payload_end = end - 1 if end > payload_start and data[end-1] == newline else end
+            else:
+                length = self._decode(data[start+2:start+2+digits])
+                if len(length) != digits or not (length.isascii() and length.isdigit()):
+                    raise BlockDataError("Invalid block length at position "+str(start))
+                payload_start = start + 2 + digits
+                payload_end = payload_start + int(length)
+                if payload_end > end:
+                    raise BlockDataError("Block at position "+str(start)+" is truncated")
+
+            parts.append(self._decode(data[text_start:start]))
+            parts.append(self.PLACEHOLDER % len(blocks))
+            blocks.append(data[payload_start:payload_end])
+            text_start = payload_end
+            pos = payload_end
+
+        if not blocks:
+            return self._decode(data),blocks
+        parts.append(self._decode(data[text_start:end]))
+        return "".join(parts),blocks
+
+    def _decode(self,text):
+        if isinstance(text,str):
+            return text
+        return str(text,'latin-1')
@@ -0,0 +1,151 @@
+import re
+
+class ChannelListException(ValueError):
+    pass
+
+#
+# A SCPI channel list such as (@1:16,20) or (@1!1:2!4) as used by switch and
+# data acquisition instruments (ROUTe:CLOSe (@101:164,201:264)).
+#
+# The list is kept as (start,stop) pairs so a range is the same size however
+# many channels it covers. Iteration, membership (in) and len work from the
+# ranges without expanding them. For one dimension the channels are ints and
+# for more (channels given as 1!2) tuples of ints. A multi-dimensional range
+# covers every channel between its two corners (1!1:2!2 is 1!1, 1!2, 2!1 and
+# 2!2). Ranges may count down (@5:1) and the channels are iterated in the
+# order they were given (duplicates included, as in a scan list).
+#
+class ChannelList:
+
+    PREFIX = re.compile(r'\(\s*@')
+    CHANNEL = re.compile(r'^[0-9]+(?:![0-9]+)*$')
+
+    def __init__(self,ranges=()):
+        self.ranges = []
+        self.dimensions = None
+        for start,stop in ranges:
+            self._add_range(start,stop)
+
+    #
+    # Parses the text of channel list program data (including the (@ and ))
+    # and raises ChannelListException if it isn't valid
+    #
+    @classmethod
+    def from_string(cls,text):
+        match = cls.PREFIX.match(text)
+        body = text.strip()
+        if not match or not body.endswith(")"):
+            raise ChannelListException("Invalid channel list")
+        body = body[match.end():len(body)-1].strip()
+        channel_list = cls()
+        if not body:
+            return channel_list
+        for entry in body.split(","):
+            parts = entry.split(":")
+            if len(parts) > 2:
+                raise ChannelListException("Invalid channel list")
+            channels = [cls._parse_channel(part) for part in parts]
+            channel_list._add_range(channels[0],channels[-1])
+        return channel_list
+
+    def get_ranges(self):
+        return list(self.ranges)
+
+    #
+    # Returns the number of numbers in each channel (1 for 101, 2 for 1!2) or
+    # None if the list is empty
+    #
+    def get_dimensions(self):
+        return self.dimensions
+
+    def __len__(self):
+        count = 0
+        for start,stop in self.ranges:
+            if self.dimensions == 1:
+                count += abs(stop - start) + 1
+            else:
+                size = 1
+                for first,last in zip(start,stop):
+                    size *= abs(last - first) + 1
+                count += size
+        return count
+
+    def __iter__(self):
+        for start,stop in self.ranges:
+            if self.dimensions == 1:
+                step = 1 if stop >= start else -1
+                yield from range(start,stop+step,step)
+            else:
+                yield from self._iterate(start,stop,0,())
+
+    def __contains__(self,channel):
+        if isinstance(channel,str):
+            try:
+                channel = self._parse_channel(channel)
+            except ChannelListException:
+                return False
+        if self.dimensions == 1:
+            if not isinstance(channel,int):
+                return False
+            for start,stop in self.ranges:
+                if min(start,stop) <= channel <= max(start,stop):
+                    return True
+        elif isinstance(channel,tuple) and len(channel) == self.dimensions:
+            for start,stop in self.ranges:
+                if all(min(first,last) <= number <= max(first,last)
+                        for first,last,number in zip(start,stop,channel)):
+                    return True
+        return False
+
+    def __eq__(self,other):
+        if not isinstance(other,ChannelList):
+            return NotImplemented
+        return self.ranges == other.ranges
+
+    def __hash__(self):
+        return hash(tuple(self.ranges))
+
+    def __repr__(self):
+        return "ChannelList("+repr(self.ranges)+")"
+
+    #
+    # Returns the list in SCPI form (@1:16,20) so it can be returned from a
+    # query
+    #
+    def __str__(self):
+        entries = []
+        for start,stop in self.ranges:
+            entry = self._format_channel(start)
+            if stop != start:
+                entry += ":" + self._format_channel(stop)
+            entries.append(entry)
+        return "(@" + ",".join(entries) + ")"
+
+    def _add_range(self,start,stop):
+        dimensions = len(start) if isinstance(start,tuple) else 1
+        stop_dimensions = len(stop) if isinstance(stop,tuple) else 1
+        if dimensions != stop_dimensions or (self.dimensions is not None and dimensions != self.dimensions):
+            raise ChannelListException("Invalid channel list")
+        self.dimensions = dimensions
+        self.ranges.append((start,stop))
+
+    def _iterate(self,start,stop,index,prefix):
+        step = 1 if stop[index] >= start[index] else -1
+        for number in range(start[index],stop[index]+step,step):
+            if index == len(start) - 1:
+                yield prefix + (number,)
+            else:
+                yield from self._iterate(start,stop,index+1,prefix+(number,))
+
+    @classmethod
+    def _parse_channel(cls,text):
+        text = text.strip()
+        if not cls.CHANNEL.match(text):
+            raise ChannelListException("Invalid channel list")
+        numbers = tuple(int(number) for number in text.split("!"))
+        return numbers[0] if len(numbers) == 1 else numbers
+
+    def _format_channel(self,channel):
+        if isinstance(channel,tuple):
+            return "!".join(str(number) for number in channel)
+        return str(channel)
@@ -1,6 +1,35 @@
 
 
 class CommandHandler():
+
+    #
+    # Set argument_types to a tuple of types (like (float,float,str)) to have
+    # the arguments converted to these types and passed to set as a tuple. The
+    # arguments are checked when the line is parsed so set is only called if
+    # they are valid. See ArgumentConverter for the types that can be used.
+    # If required_arguments is set the arguments after this many are optional.
+    #
+    # Without argument_types set gets None if there are no arguments, the
+    # value if there is one and a tuple of values if there are more.
+    #
+    argument_types = None
+    required_arguments = None
+
+    #
+    # Running a command drops the cached responses (see ResponseCache) for
+    # queries on its header and the headers below it, or all of them for a
+    # common command like *RST. Set invalidated_queries to a tuple of headers
+    # to drop those (and the headers below them) instead.
+    #
+    invalidated_queries = None
+
+    #
+    # Set async_handler to an AsyncCommandHandler to have process_line_async
+    # run it in place of this handler (so a command that waits can await
+    # rather than block the event loop)
+    #
+    async_handler = None
+
     def __init__(self):
         pass
 
@@ -10,12 +39,32 @@ class CommandHandler():
     # become an array of two strings
     #
     # The argument is passed as program data and includes the value 
-    # after applying unit scaling
+    # after applying unit scaling. Without argument_types it is None if the
+    # command has no arguments, the value itself if it has one and a tuple of
+    # the values if it has more (so check for a tuple before indexing it).
+    # With argument_types it is always a tuple.
     #
     def set(self,program_header,program_data):
         pass
 
+#
+# A command handler whose set method is a coroutine. Use these with 
+# CommandInterpreter.process_line_async so that a slow command doesn't
+# block other work on the event loop. Async and normal handlers can be
+# registered with the same interpreter.
+#
+class AsyncCommandHandler():
+    argument_types = None
+    required_arguments = None
+    invalidated_queries = None
+
+    def __init__(self):
+        pass
+
+    async def set(self,program_header,program_data):
+        pass
+
 class PrintHandler(CommandHandler):
     def set(self,program_header,program_data):
-        print("Command = "+program_header+" Args="+program_data)
+        print("Command = "+program_header+" Args="+str(program_data))
         return "Ok"
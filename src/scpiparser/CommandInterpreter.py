@@ -1,22 +1,83 @@
 
-from lark import Lark,Token
+import asyncio
+import inspect
+import re
+import threading
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Iterator
+
+from lark import Token
 from lark.exceptions import UnexpectedInput
 
 if __package__:
     from .QueryHandler import QueryHandler
+    from .QueryHandler import AsyncQueryHandler
+    from .CommandHandler import AsyncCommandHandler
     from .CommandHandler import PrintHandler
     from .QueryHandler import IDNHandler
     from .HandlerMap import HandlerMap
+    from .ParserCache import ParserCache
+    from .FastParser import FastParser
+    from .ProgramMessageUnit import ProgramMessageUnit
+    from .PendingOperations import PendingOperations
+    from .PendingOperations import OverlappedCommandHandler
+    from .PendingOperations import WAIHandler
+    from .PendingOperations import OPCHandler
+    from .PendingOperations import OPCQueryHandler
+    from .PendingOperations import ESRQueryHandler
+    from .PendingOperations import CLSHandler
+    from .BlockScanner import BlockScanner
+    from .BlockScanner import BlockDataError
+    from .DataFormat import DataFormat
+    from .DataFormat import DataFormatException
+    from .DataFormat import DataFormatHandler
+    from .DataFormat import ByteOrderHandler
+    from .PlanCache import PlanCache
+    from .InterpreterMetrics import InterpreterMetrics
+    from .ArgumentConverter import ArgumentConverter
+    from .ArgumentConverter import ArgumentException
+    from .ResponseCache import CachedQueryHandler
+    from .ErrorQueue import ErrorQueue
+    from .ErrorQueue import ErrorQueryHandler
+    from .ErrorQueue import ErrorCountQueryHandler
 else:
     from QueryHandler import QueryHandler
+    from QueryHandler import AsyncQueryHandler
+    from CommandHandler import AsyncCommandHandler
     from CommandHandler import PrintHandler
     from QueryHandler import IDNHandler
     from HandlerMap import HandlerMap
+    from ParserCache import ParserCache
+    from FastParser import FastParser
+    from ProgramMessageUnit import ProgramMessageUnit
+    from PendingOperations import PendingOperations
+    from PendingOperations import OverlappedCommandHandler
+    from PendingOperations import WAIHandler
+    from PendingOperations import OPCHandler
+    from PendingOperations import OPCQueryHandler
+    from PendingOperations import ESRQueryHandler
+    from PendingOperations import CLSHandler
+    from BlockScanner import BlockScanner
+    from BlockScanner import BlockDataError
+    from DataFormat import DataFormat
+    from DataFormat import DataFormatException
+    from DataFormat import DataFormatHandler
+    from DataFormat import ByteOrderHandler
+    from PlanCache import PlanCache
+    from InterpreterMetrics import InterpreterMetrics
+    from ArgumentConverter import ArgumentConverter
+    from ArgumentConverter import ArgumentException
+    from ResponseCache import CachedQueryHandler
+    from ErrorQueue import ErrorQueue
+    from ErrorQueue import ErrorQueryHandler
+    from ErrorQueue import ErrorCountQueryHandler
 
 class ParserContext:
     def __init__(self):
         self.is_first = True
         self.command_scope = ""
+        self.has_error = False
     def get_is_first(self):
         return self.is_first
     def set_is_first(self,value):
@@ -25,201 +86,896 @@ class ParserContext:
         return self.command_scope
     def set_command_scope(self,value):
         self.command_scope = value
+    def get_has_error(self):
+        return self.has_error
+    def set_has_error(self,value):
+        self.has_error = value
+
+#
+# Collects the response chunks for a line. The response is a str unless one 
+# of the chunks is binary in which case it is a list of buffers so the binary
+# data never has to be joined into a single string.
+#
+class ResponseBuilder:
+    def __init__(self):
+        self.parts = []
+        self.binary = False
+    def add(self,chunk):
+        if not isinstance(chunk,str):
+            self.binary = True
+        self.parts.append(chunk)
+    def get_response(self):
+        if not self.binary:
+            return "".join(self.parts)
+        return [part.encode('utf-8') if isinstance(part,str) else part for part in self.parts]
 
 class CommandInterpreter:
 
     SCPI_GRAMMAR = """
-        start: program_message_unit ( PROGRAM_MESSAGE_SEPARATOR WS_INLINE? program_message_unit )*
+        start: program_message_unit ( PROGRAM_MESSAGE_SEPARATOR program_message_unit )*
         program_message_unit: command_message_unit | query_message_unit
-        command_message_unit: command_program_header [ WS_INLINE program_data ( PROGRAM_DATA_SEPARATOR program_data )*]
-        query_message_unit: query_program_header ( WS_INLINE program_data (PROGRAM_DATA_SEPARATOR program_data )*)?
+        command_message_unit: command_program_header ( program_data ( PROGRAM_DATA_SEPARATOR program_data )* )?
+        query_message_unit: query_program_header ( program_data ( PROGRAM_DATA_SEPARATOR program_data )* )?
         
         program_data :  character_program_data 
                         | DECIMAL_NUMERIC_PROGRAM_DATA suffix_program_data?
                         | NON_DECIMAL_NUMERIC_DATA
                         | STRING_PROGRAM_DATA
-                        | suffix_program_data
+                        | ARBITRARY_BLOCK_PROGRAM_DATA
+                        | CHANNEL_LIST_PROGRAM_DATA
                         
-        //              | arbitrary_block_program_data
         //              | expression_program_data
                         
-        command_program_header: WS_INLINE? SIMPE_COMMAND_PROGRAM_HEADER 
+        command_program_header: SIMPE_COMMAND_PROGRAM_HEADER 
                                 | COMPOUND_COMMAND_PROGRAM_HEADER 
                                 | COMMON_COMMAND_PROGRAM_HEADER
                                 
-        SIMPE_COMMAND_PROGRAM_HEADER: PROGRAM_MNEMONIC
+        //
+        // IEEE 488.2 requires white space between a header and its program
+        // data. As white space is ignored this is checked by only matching a
+        // header that is followed by white space, a ; or the end of the line
+        // (so VOLT5.4, VOLT#H12 and VOLT?5 are errors)
+        //
+        _HEADER_END: /(?=[ \\t\\f\\r\\n;]|$)/
+
+        SIMPE_COMMAND_PROGRAM_HEADER: PROGRAM_MNEMONIC _HEADER_END
         
-        COMPOUND_COMMAND_PROGRAM_HEADER: ":"? PROGRAM_MNEMONIC ( ":" PROGRAM_MNEMONIC )+
-        COMMON_COMMAND_PROGRAM_HEADER: "*" PROGRAM_MNEMONIC
+        COMPOUND_COMMAND_PROGRAM_HEADER: _COMPOUND_HEADER _HEADER_END
+        _COMPOUND_HEADER: ":" PROGRAM_MNEMONIC ( ":" PROGRAM_MNEMONIC )* 
+                            | PROGRAM_MNEMONIC ( ":" PROGRAM_MNEMONIC )+
+        COMMON_COMMAND_PROGRAM_HEADER: "*" PROGRAM_MNEMONIC _HEADER_END
         
-        query_program_header:   WS_INLINE? SIMPLE_QUERY_PROGRAM_HEADER
+        query_program_header:   SIMPLE_QUERY_PROGRAM_HEADER
                                 | COMPOUND_QUERY_PROGRAM_HEADER
                                 | COMMON_QUERY_PROGRAM_HEADER
                                 
-        SIMPLE_QUERY_PROGRAM_HEADER: PROGRAM_MNEMONIC "?"
-        COMPOUND_QUERY_PROGRAM_HEADER: ":"? PROGRAM_MNEMONIC (":" PROGRAM_MNEMONIC)+ "?"
-        COMMON_QUERY_PROGRAM_HEADER: "*" PROGRAM_MNEMONIC "?"
+        //
+        // The query headers are given a higher priority so that the lexer
+        // prefers VOLT? over the command header VOLT followed by junk
+        //
+        SIMPLE_QUERY_PROGRAM_HEADER.2: PROGRAM_MNEMONIC "?" _HEADER_END
+        COMPOUND_QUERY_PROGRAM_HEADER.2: _COMPOUND_HEADER "?" _HEADER_END
+        COMMON_QUERY_PROGRAM_HEADER.2: "*" PROGRAM_MNEMONIC "?" _HEADER_END
         
         
         character_program_data: PROGRAM_MNEMONIC
         
-        suffix_program_data: WS_INLINE? "/"? (suffix_program_data_middle ( ("/"|".") suffix_program_data_middle )*)?
-        suffix_program_data_middle: (suffix_prog_data_with_mult | suffix_prog_data_without_mult)
-        suffix_prog_data_with_mult: SUFFIX_MULT (PROGRAM_MNEMONIC "-"? _DIGIT)?
-        suffix_prog_data_without_mult: PROGRAM_MNEMONIC ("-"? _DIGIT)?
-        
-        SUFFIX_MULT: "EX"|"PE"|"T"|"G"|"MA"|"K"|"M"|"U"|"N"|"P"|"F"|"A"
+        //
+        // The suffix is lexed as a single token (such as MHz or V/s) rather 
+        // than as separate multiplier and unit rules. Splitting these in the
+        // grammar is ambiguous (is MA mega or milli-amps?) which the LALR 
+        // parser can't cope with
+        //
+        suffix_program_data: SUFFIX_PROGRAM_DATA
+        SUFFIX_PROGRAM_DATA: "/"? SUFFIX_ELEMENT ( ("/"|".") SUFFIX_ELEMENT )*
+        SUFFIX_ELEMENT: /[A-Za-z]+/ ("-"? _DIGIT)?
         
-        SUFFIX_UNIT: /[a-zA-Z]{1,4}/
-        
-        NON_DECIMAL_NUMERIC_DATA: "#" (( "H"|"h" _HEX_DIGIT+ ) | ( "Q"|"q" _OCTAL_DIGIT+ ) | ( "B"|"b" _BINARY_DIGIT+ ))
+        NON_DECIMAL_NUMERIC_DATA: "#" (( ("H"|"h") _HEX_DIGIT+ ) | ( ("Q"|"q") _OCTAL_DIGIT+ ) | ( ("B"|"b") _BINARY_DIGIT+ ))
                                     
         
+        //
+        // Blocks are removed from the line by the BlockScanner before parsing and 
+        // replaced by a placeholder #<index>#
+        //
+        ARBITRARY_BLOCK_PROGRAM_DATA: "#" _DIGIT+ "#"
+        
+        //
+        // A channel list such as (@1:16,20) or (@1!1:2!4) is a single token.
+        // Its ranges are parsed by ChannelList
+        //
+        CHANNEL_LIST_PROGRAM_DATA: /\\(\\s*@[0-9!:,\\s]*\\)/
+
         STRING_PROGRAM_DATA: ( SINGLE_QUOTED_STRING | DOUBLE_QUOTED_STRING )
         SINGLE_QUOTED_STRING: "\'" ( "\'\'" | /[^']/ )* "\'"
         DOUBLE_QUOTED_STRING: "\\"" ( "\\"\\"" | /[^\\"]/ )* "\\""
         
-        DECIMAL_NUMERIC_PROGRAM_DATA: MANTISSA WS? EXPONENT?
-        MANTISSA: ("+"|"-")? ( _DIGIT* "." _DIGIT+) | (_DIGIT+ ("." _DIGIT*)? )
-        EXPONENT: ("E"|"e") WS? ("+"|"-")? _DIGIT+
+        DECIMAL_NUMERIC_PROGRAM_DATA: MANTISSA ( WS_INLINE? EXPONENT )?
+        MANTISSA: ("+"|"-")? (( _DIGIT* "." _DIGIT+) | (_DIGIT+ ("." _DIGIT*)? ))
+        EXPONENT: ("E"|"e") WS_INLINE? ("+"|"-")? _DIGIT+
         _DIGIT: "0".."9"
         _HEX_DIGIT: "a".."f"|"A".."F"|"0".."9"
         _BINARY_DIGIT: "0".."1"
         _OCTAL_DIGIT: "0".."7"
         
-        PROGRAM_MESSAGE_SEPARATOR: WS_INLINE? ";"
-        PROGRAM_DATA_SEPARATOR : WS_INLINE? "," WS_INLINE?
+        PROGRAM_MESSAGE_SEPARATOR: ";"
+        PROGRAM_DATA_SEPARATOR : ","
         PROGRAM_MNEMONIC : /[A-Za-z]+[A-Za-z0-9_]*/
                 
         %import common.WS_INLINE
         %import common.WS
-        %import common.DECIMAL
-        %import common.NEWLINE
-        %ignore WS_INLINE
         %ignore WS
     """
 
     
+    PARSER_MODE_EARLEY = 'earley'
+    PARSER_MODE_LALR = 'lalr'
+    PARSER_MODES = (PARSER_MODE_EARLEY,PARSER_MODE_LALR)
+
+    DEFAULT_DATA_FORMAT = DataFormat()
+
+    #
+    # The plans for lines that can't be parsed are kept in a separate small
+    # cache so a flood of different bad lines can't push the good lines out
+    # of the plan cache
+    #
+    ERROR_PLAN_CACHE_SIZE = 64
+
+    # Characters that can only appear in a line inside a string (or block)
+    INVALID_CHARACTER = re.compile(r'[^ \t\f\r\n!-~]')
+
     #
     # The manufacturer, model, serial and firmware values are used to build the 
     # response to the IDN command. This can be handled by the application by overridding
     # the IDN handler also
     #
-    def __init__(self,manufacturer='Runcible Software Pty Ltd',model='Not Defined',serial='0',firmware_version='0'):
-        # print(self.SCPI_GRAMMAR)
-        # self.parser = Lark(self.SCPI_GRAMMAR, parser='earley', lexer="standard")
-        self.parser = Lark(self.SCPI_GRAMMAR)
-        self.command_handlers = HandlerMap()
-        self.query_handlers = HandlerMap()
+    # The parser_mode selects the Lark parser used to parse each line. The LALR
+    # parser is much faster than the default Earley parser and produces the same
+    # parse tree. The only difference is the wording of syntax error messages.
+    #
+    # The compiled parser is shared with every other interpreter in the process
+    # using the same parser mode. If cache_dir is set the compiled LALR parser is
+    # also saved to (and loaded from) that directory to speed up later processes.
+    #
+    # When fast_path is set simple lines are parsed with a hand written scanner
+    # and only lines it can't handle go through Lark. The results are the same
+    # either way.
+    #
+    # Overlapped commands are run on a pool of up to overlapped_workers threads.
+    #
+    # If plan_cache_size is set the execution plans (the handlers, header names
+    # and converted arguments) for up to that many recently processed lines are
+    # kept so a repeated line doesn't have to be parsed again (see PlanCache).
+    #
+    # If thread_safe is set the interpreter can be shared by threads calling
+    # process_line (and registering handlers) at the same time. The handler
+    # maps are then immutable snapshots that a registration replaces in one
+    # assignment (see HandlerMap) so the lookups don't take a lock. The plan
+    # cache is locked. Registrations are serialised and a line already being
+    # run finishes with the handlers it started with. The metrics aren't
+    # locked so their counts can come out slightly low when many threads
+    # update them. Threads still share the GIL; to use more than one core
+    # see ShardedInterpreter.
+    #
+    # By default an error (a syntax error, unknown header or invalid argument)
+    # is reported by returning a message describing it as the response. If
+    # error_queue_size is set errors are instead reported the SCPI way: the
+    # response is empty and the standard error code (such as -113,"Undefined
+    # header") is added to an ErrorQueue of that size which is read with
+    # SYSTem:ERRor? and SYSTem:ERRor:COUNt? (see get_error_queue). This is
+    # also much cheaper for lines that can't be parsed as no message is built
+    # and their plans can be cached (in a small cache of their own so they
+    # don't push out the plans for good lines).
+    #
+    def __init__(self,manufacturer='Runcible Software Pty Ltd',model='Not Defined',serial='0',firmware_version='0',parser_mode=PARSER_MODE_EARLEY,cache_dir=None,fast_path=True,overlapped_workers=4,plan_cache_size=0,thread_safe=False,error_queue_size=0):
+        if parser_mode not in self.PARSER_MODES:
+            raise ValueError("Unknown parser mode "+str(parser_mode))
+        self.parser_mode = parser_mode
+        self.parser = ParserCache.get_parser(self.SCPI_GRAMMAR,parser_mode,cache_dir)
+        self.fast_parser = FastParser() if fast_path else None
+        self.block_scanner = BlockScanner()
+        self.argument_converter = ArgumentConverter()
+        self.overlapped_workers = overlapped_workers
+        self.pending_operations = None
+        self.data_format = None
+        self.thread_safe = thread_safe
+        self.registration_lock = threading.RLock()
+        self.plan_cache = PlanCache(plan_cache_size,thread_safe) if plan_cache_size else None
+        self.error_plan_cache = PlanCache(min(plan_cache_size,self.ERROR_PLAN_CACHE_SIZE),thread_safe) if plan_cache_size else None
+        self.metrics = None
+        self.metric_keys = {}
+        self.response_cache = None
+        self.invalidated_headers = {}
+        self.command_handlers = HandlerMap(thread_safe)
+        self.query_handlers = HandlerMap(thread_safe)
+        self.error_queue = None
+        if error_queue_size:
+            error_queue = ErrorQueue(error_queue_size,thread_safe)
+            for key in ["SYSTem:ERRor","SYSTem:ERRor:NEXT"]:
+                self.register_query_handler(key,ErrorQueryHandler(error_queue))
+            self.register_query_handler("SYSTem:ERRor:COUNt",ErrorCountQueryHandler(error_queue))
+            self.register_command_handler("*CLS",CLSHandler(None,error_queue))
+            self.error_queue = error_queue
         self.register_query_handler("*IDN",IDNHandler(manufacturer,model,serial,firmware_version))
         pass
 
-    def register_command_handler(self,key,handler):
-        self.command_handlers.register_handler(key,handler)
+    #
+    # If overlapped is set the handler is run on a worker thread and the 
+    # command returns straight away so the following commands can run while
+    # it finishes. Registering an overlapped handler also adds handlers for 
+    # *WAI, *OPC, *OPC?, *ESR? and *CLS (unless these have already been 
+    # registered) which wait for or report the completion of these commands.
+    # Cached query responses are invalidated both when an overlapped command
+    # starts and when it finishes.
+    #
+    def register_command_handler(self,key,handler,overlapped=False):
+        argument_types = getattr(handler,'argument_types',None)
+        if isinstance(argument_types,tuple):
+            ArgumentConverter.check_types(argument_types,getattr(handler,'required_arguments',None))
+        with self.registration_lock:
+            if overlapped:
+                handler = OverlappedCommandHandler(handler,self.get_pending_operations(),self._overlapped_done)
+            self.command_handlers.register_handler(key,handler)
+            self._handlers_changed()
 
+    #
+    # If the handler has cache_responses set its responses are cached (see
+    # ResponseCache) until a command is run on the same header.
+    #
     def register_query_handler(self,key,handler):
-        self.query_handlers.register_handler(key,handler)
+        argument_types = getattr(handler,'query_argument_types',None)
+        if isinstance(argument_types,tuple):
+            ArgumentConverter.check_types(argument_types,getattr(handler,'query_required_arguments',None))
+        with self.registration_lock:
+            if getattr(handler,'cache_responses',False) is True:
+                self.response_cache = self.query_handlers.get_response_cache()
+                if self.pending_operations is not None:
+                    # Overlapped commands invalidate it from worker threads
+                    self.response_cache.make_thread_safe()
+                handler = CachedQueryHandler(handler,key.upper(),self.response_cache)
+            self.query_handlers.register_handler(key,handler)
+            self._handlers_changed()
+
+    #
+    # Returns the ResponseCache (or None if no handler caches its responses)
+    #
+    def get_response_cache(self):
+        return self.response_cache
+
+    #
+    # Drops the cached responses for queries on the header and the headers
+    # below it (or all of them if header is None). Call this when a value
+    # changes outside the interpreter (from the front panel for example).
+    #
+    def invalidate_responses(self,header=None):
+        if self.response_cache is not None:
+            self.response_cache.invalidate(None if header is None else self._long_name(header))
+
+    #
+    # Adds a unit (like DIV) to those accepted in the suffix of decimal data.
+    # The standard SI units are already known (see SuffixTable).
+    #
+    def register_unit(self,unit):
+        with self.registration_lock:
+            self.argument_converter.get_suffix_table().add_unit(unit)
+            self._handlers_changed()
+
+    def is_thread_safe(self):
+        return self.thread_safe
+
+    #
+    # Returns the ErrorQueue (or None if the error_queue_size was 0). Handlers
+    # can add their own errors to it.
+    #
+    def get_error_queue(self):
+        return self.error_queue
+
+    #
+    # Returns the PlanCache (or None if the plan_cache_size was 0)
+    #
+    def get_plan_cache(self):
+        return self.plan_cache
+
+    #
+    # Starts collecting timings and counters (see InterpreterMetrics) and
+    # returns the InterpreterMetrics they are collected in. While metrics 
+    # are disabled (the default) the parse and handler stages aren't timed
+    # at all.
+    #
+    def enable_metrics(self):
+        if self.metrics is None:
+            self.metrics = InterpreterMetrics()
+            self._parse = self._timed_parse
+            self._run = self._timed_run
+        return self.metrics
+
+    def disable_metrics(self):
+        if self.metrics is not None:
+            self.metrics = None
+            del self._parse
+            del self._run
+
+    #
+    # Returns the InterpreterMetrics or None if metrics aren't enabled
+    #
+    def get_metrics(self):
+        return self.metrics
+
+    def _handlers_changed(self):
+        if self.plan_cache is not None:
+            self.plan_cache.clear()
+        self.metric_keys = {}
+        self.invalidated_headers = {}
+
+    #
+    # Flattens the handler maps for faster lookups. Call this after all the 
+    # handlers are registered (registering another handler undoes it)
+    #
+    def freeze(self):
+        self.command_handlers.freeze()
+        self.query_handlers.freeze()
+
+    def get_pending_operations(self):
+        with self.registration_lock:
+            if self.pending_operations is None:
+                pending_operations = PendingOperations(self.overlapped_workers)
+                self._register_default_command_handler("*WAI",WAIHandler(pending_operations))
+                self._register_default_command_handler("*OPC",OPCHandler(pending_operations))
+                cls_handler = self.command_handlers.find_handler("*CLS")
+                if isinstance(cls_handler,CLSHandler) and cls_handler.get_operations() is None:
+                    # The one clearing the error queue
+                    cls_handler.set_operations(pending_operations)
+                else:
+                    self._register_default_command_handler("*CLS",CLSHandler(pending_operations))
+                self._register_default_query_handler("*OPC",OPCQueryHandler(pending_operations))
+                self._register_default_query_handler("*ESR",ESRQueryHandler(pending_operations))
+                if self.response_cache is not None:
+                    self.response_cache.make_thread_safe()
+                if self.error_queue is not None:
+                    self.error_queue.set_operations(pending_operations)
+                self.pending_operations = pending_operations
+        return self.pending_operations
+
+    #
+    # Returns the DataFormat used to encode array data returned by query handlers.
+    # The first call also adds handlers for FORMat[:DATA] and FORMat:BORDer 
+    # (unless these have already been registered). Until then arrays are
+    # encoded as ASCii.
+    #
+    def get_data_format(self):
+        with self.registration_lock:
+            if self.data_format is None:
+                data_format = DataFormat()
+                format_handler = DataFormatHandler(data_format,self.error_queue)
+                byte_order_handler = ByteOrderHandler(data_format,self.error_queue)
+                for key in ["FORMat","FORMat:DATA"]:
+                    self._register_default_command_handler(key,format_handler)
+                    self._register_default_query_handler(key,format_handler)
+                self._register_default_command_handler("FORMat:BORDer",byte_order_handler)
+                self._register_default_query_handler("FORMat:BORDer",byte_order_handler)
+                self.data_format = data_format
+        return self.data_format
+
+    def _register_default_command_handler(self,key,handler):
+        if not self.command_handlers.find_handler(key):
+            self.register_command_handler(key,handler)
 
+    def _register_default_query_handler(self,key,handler):
+        if not self.query_handlers.find_handler(key):
+            self.register_query_handler(key,handler)
+
+    #
+    # The command_string can be a str or a bytes like object (bytes, bytearray,
+    # memoryview etc). Arbitrary block program data (#<n><length><data> or
+    # #0<data>) is passed to the handler as a str when the line is a str. When 
+    # the line is bytes it is passed as a memoryview over the line so large
+    # blocks are never copied.
+    #
+    # Query handlers can return array data (a NumPy array or a buffer) rather
+    # than a str. This is encoded using the current DataFormat (see 
+    # get_data_format). If this produces a binary block the response is a list 
+    # of buffers rather than a str.
+    #
     def process_line(self, command_string, call_context=None):
-        if not command_string or command_string.isspace():
-            return "\n"
+        response = ResponseBuilder()
+        for chunk in self.iter_process_line(command_string,call_context):
+            response.add(chunk)
+        return response.get_response()
+
+    #
+    # The same as process_line except that handlers which are coroutines (such as
+    # AsyncQueryHandler and AsyncCommandHandler) are awaited. The commands on the
+    # line are still run one at a time in order. (process_line can also run these
+    # handlers but it blocks until each one finishes and it can't be used from 
+    # within a running event loop)
+    #
+    async def process_line_async(self, command_string, call_context=None):
+        response = ResponseBuilder()
+        async for chunk in self.aiter_process_line(command_string,call_context):
+            response.add(chunk)
+        return response.get_response()
+
+    #
+    # A generator version of process_line which yields the response in chunks
+    # as it is produced rather than building the whole response first. Each 
+    # unit's response is yielded as soon as its handler returns (followed by a
+    # "\n" chunk) so the first response can be sent before the later commands
+    # on the line have run.
+    #
+    # Chunks are either a str or a bytes like object (for binary data). A 
+    # handler can also return an iterator (such as a generator) of chunks for a
+    # very large response in which case each chunk is passed on as it is 
+    # produced (binary chunks are passed on as they are so the handler is 
+    # responsible for any block header).
+    #
+    def iter_process_line(self, command_string, call_context=None):
+        plan = self._get_plan(command_string)
+        if isinstance(plan,str):
+            yield plan
+            return
+        for step in plan:
+            yield from self._sync_result_chunks(self._run(step,call_context))
+            yield "\n"
+
+    #
+    # Processes each line from lines in turn yielding the response for each
+    # line (as process_line would return it). This avoids some of the overhead
+    # of calling process_line for each line. A line with a syntax error just 
+    # gets the error as its response and the following lines are still run.
+    #
+    # If preparse is set every line is parsed before any are run and lines
+    # that appear more than once in the batch are only parsed once. As the 
+    # responses come after all the parsing is done this is best for scripted
+    # sequences rather than interactive use. (lines is read in full first
+    # so it must not be an endless iterator in this case)
+    #
+    def process_lines(self, lines, call_context=None, preparse=False):
+        plans = self._get_batch_plans(lines) if preparse else map(self._get_plan,lines)
+        for plan in plans:
+            if isinstance(plan,str):
+                yield plan
+            else:
+                yield self._run_plan(plan,call_context)
+
+    #
+    # Runs a single program message unit (the text between semicolons) and
+    # returns its response (with the trailing "\n"). The context holds the
+    # command scope from the earlier units of the same message so it must be
+    # a new ParserContext for the first unit of each message. If the unit
+    # can't be parsed the error is returned and the context is marked as
+    # having an error (see IncrementalParser).
+    #
+    def process_unit(self, unit_string, context, call_context=None):
+        units = self._parse(unit_string)
+        if isinstance(units,str):
+            context.set_has_error(True)
+            return units
+        if isinstance(units,int):
+            context.set_has_error(True)
+            return self._report_error(False,units) + "\n"
+        plan = []
+        for unit in units:
+            plan.append(self._plan(unit,context))
+            context.set_is_first(False)
+        return self._run_plan(plan,call_context)
+
+    #
+    # The async version of iter_process_line. Handlers can also return async
+    # iterators of chunks and a handler with an async_handler (like *WAI and
+    # *OPC?) has that run in its place.
+    #
+    async def aiter_process_line(self, command_string, call_context=None):
+        plan = self._get_plan(command_string)
+        if isinstance(plan,str):
+            yield plan
+            return
+        for step in plan:
+            async_handler = getattr(step[1],'async_handler',None)
+            if isinstance(async_handler,(AsyncCommandHandler,AsyncQueryHandler)):
+                step = (step[0],async_handler,step[2],step[3])
+            result = self._run(step,call_context)
+            if inspect.isawaitable(result):
+                result = await result
+            if isinstance(result,AsyncIterator):
+                async for chunk in result:
+                    for part in self._result_chunks(chunk):
+                        yield part
+            else:
+                for chunk in self._result_chunks(result):
+                    yield chunk
+            yield "\n"
+
+    def _run_plan(self,plan,call_context):
+        if len(plan) == 1:
+            # The usual case of one unit with a str response
+            result = self._run(plan[0],call_context)
+            if isinstance(result,str):
+                return result + "\n"
+            response = ResponseBuilder()
+            for chunk in self._sync_result_chunks(result):
+                response.add(chunk)
+            response.add("\n")
+            return response.get_response()
+        response = ResponseBuilder()
+        for step in plan:
+            for chunk in self._sync_result_chunks(self._run(step,call_context)):
+                response.add(chunk)
+            response.add("\n")
+        return response.get_response()
+
+    #
+    # Returns the response chunks for a handler result running async handlers
+    # to completion
+    #
+    def _sync_result_chunks(self,result):
+        if inspect.isawaitable(result):
+            # An async handler. Run it to completion here
+            result = asyncio.run(self._await(result))
+        if isinstance(result,AsyncIterator):
+            result = iter(asyncio.run(self._collect(result)))
+        return self._result_chunks(result)
+
+    #
+    # A handler returning None (as commands usually do) gets an empty response
+    # and anything other than array data is converted with str
+    #
+    def _result_chunks(self,result):
+        if isinstance(result,str):
+            return (result,)
+        if result is None:
+            return ("",)
+        if isinstance(result,Iterator):
+            return result
+        if not DataFormat.is_array(result):
+            return (str(result),)
         try:
-            parse_tree = self.parser.parse(command_string)
-        except UnexpectedInput as err:
-            return str(err) + err.get_context(text=command_string,span=200)
-        results = ""
+            result = (self.data_format or self.DEFAULT_DATA_FORMAT).encode(result)
+        except DataFormatException as err:
+            if self.error_queue is not None:
+                return (self._report_error(True,ErrorQueue.EXECUTION_ERROR),)
+            return (str(err),)
+        return (result,) if isinstance(result,str) else result
+
+    async def _await(self,awaitable):
+        return await awaitable
+
+    async def _collect(self,chunks):
+        return [chunk async for chunk in chunks]
+
+    #
+    # Returns the execution plan for the line, a tuple of (is_query,handler,name,
+    # arg) for each unit, or the response string if there is nothing to run. 
+    # Plans for str lines are kept in the plan cache (bytes lines aren't as their
+    # blocks are views over a buffer the caller may reuse).
+    #
+    def _get_plan(self,command_string):
+        cacheable = self.plan_cache is not None and isinstance(command_string,str)
+        if cacheable:
+            plan = self.plan_cache.get(command_string)
+            if plan is not None:
+                return plan
+            plan = self.error_plan_cache.get(command_string)
+            if plan is not None:
+                return plan
+            # Don't cache the plan if a handler is registered while building it
+            generation = self.plan_cache.get_generation()
+        units = self._parse(command_string)
+        if isinstance(units,str):
+            return units
+        if isinstance(units,int):
+            # A line that can't be parsed when errors are queued
+            plan = ((False,None,None,units),)
+            if cacheable:
+                self.error_plan_cache.put(command_string,plan)
+            return plan
         context = ParserContext()
+        steps = []
+        for unit in units:
+            steps.append(self._plan(unit,context))
+            context.set_is_first(False)
+        plan = tuple(steps)
+        if cacheable:
+            self.plan_cache.put(command_string,plan,generation)
+        return plan
+
+    def _get_batch_plans(self,lines):
+        plans = []
+        str_plans = {}
+        for line in lines:
+            if isinstance(line,str):
+                plan = str_plans.get(line)
+                if plan is None:
+                    plan = str_plans[line] = self._get_plan(line)
+            else:
+                plan = self._get_plan(line)
+            plans.append(plan)
+        return plans
+
+    #
+    # Returns the list of ProgramMessageUnit for the line or, if there is 
+    # nothing to run, the response string (for an empty line or syntax error).
+    # When errors are queued a syntax error is returned as its error code
+    # instead as building Lark's message (which works out every token it
+    # could have accepted) costs more than the parse.
+    #
+    def _parse(self,command_string):
+        try:
+            text,blocks = self.block_scanner.extract(command_string)
+        except BlockDataError as err:
+            if self.error_queue is not None:
+                return ErrorQueue.BLOCK_DATA_ERROR
+            return str(err) + "\n"
+        if not text or text.isspace():
+            return "\n"
+        units = self.fast_parser.parse(text) if self.fast_parser else None
+        if units is None:
+            if self.error_queue is not None and "'" not in text and '"' not in text and self.INVALID_CHARACTER.search(text):
+                # Binary junk can be rejected without parsing it
+                return ErrorQueue.INVALID_CHARACTER
+            try:
+                units = self._to_units(self.parser.parse(text))
+            except UnexpectedInput as err:
+                if self.error_queue is not None:
+                    return ErrorQueue.SYNTAX_ERROR
+                return str(err) + err.get_context(text=text,span=200)
+        if blocks:
+            self._insert_blocks(units,blocks)
+        return units
+
+    def _insert_blocks(self,units,blocks):
+        for unit in units:
+            program_data = unit.get_program_data()
+            for index,(arg_type,arg_value,suffix) in enumerate(program_data):
+                if arg_type == 'ARBITRARY_BLOCK_PROGRAM_DATA':
+                    program_data[index] = (arg_type,blocks[int(arg_value[1:-1])],suffix)
+
+    def _to_units(self,parse_tree):
+        units = []
         for command in parse_tree.children:
             if not isinstance(command,Token):
-                results += self._process(command.children[0],context,call_context) + "\n"
-                context.set_is_first(False)
-        return results
+                unit = command.children[0]
+                header = unit.children[0].children[0].value
+                program_data = []
+                for child in unit.children[1:]:
+                    if not isinstance(child,Token):
+                        program_data.append(self._to_program_data(child))
+                units.append(ProgramMessageUnit(unit.data == 'query_message_unit',header,program_data))
+        return units
 
-    def _process(self,command,context,call_context):
-        if command.data == 'query_message_unit':
-            return self._process_query(command.children[0].children[0],context,call_context)
+    def _to_program_data(self,program_data):
+        arg = program_data.children[0]
+        if not isinstance(arg,Token):
+            # character_program_data is a rule wrapping the mnemonic
+            arg = arg.children[0]
+        suffix = None
+        if len(program_data.children) > 1:
+            suffix = program_data.children[1].children[0].value
+        return (arg.type,arg.value,suffix)
+
+    def _plan(self,unit,context):
+        if unit.get_is_query():
+            return self._plan_query(unit,context)
+        else:
+            return self._plan_command(unit,context)
+
+    #
+    # A step is (is_query,handler,name,arg). If there is no handler arg is the
+    # error (see _report_error) and name is None if the line couldn't be
+    # parsed. For queries arg is None unless the handler declared
+    # query_argument_types.
+    #
+    def _run(self,step,call_context):
+        is_query,handler,name,arg = step
+        if handler is None:
+            return self._report_error(is_query,arg)
+        if is_query:
+            if arg is None:
+                if call_context != None:
+                    return handler.query(name,call_context)
+                else:
+                    return handler.query(name)
+            if call_context != None:
+                return handler.query(name,arg,call_context)
+            else:
+                return handler.query(name,arg)
+        if call_context != None:
+            result = handler.set(name,arg,call_context)
         else:
-            return self._process_command(command,context,call_context)
+            result = handler.set(name,arg)
+        if self.response_cache is not None:
+            self._invalidate_responses(handler,name)
+            if inspect.isawaitable(result):
+                # An async command. Queries run while it is awaited read the
+                # old value so invalidate again once it has finished.
+                result = self._invalidate_when_done(result,handler,name)
+        return result
+
+    #
+    # Reports an error and returns the response for it. The error is None for
+    # an unknown header and otherwise an error code (when errors are queued)
+    # or the message.
+    #
+    def _report_error(self,is_query,error):
+        if self.error_queue is None:
+            if error is not None:
+                return error
+            return "Invalid query" if is_query else "Invalid command"
+        if error is None:
+            error = ErrorQueue.UNDEFINED_HEADER
+        self.error_queue.push(error)
+        return ""
+
+    #
+    # The error for an argument that can't be converted
+    #
+    def _argument_error(self,err):
+        if self.error_queue is not None:
+            return err.get_code()
+        return str(err)
+
+    def _invalidate_responses(self,handler,name):
+        cache = self.response_cache
+        headers = self.invalidated_headers.get(name)
+        if headers is None:
+            invalidated_queries = getattr(handler,'invalidated_queries',None)
+            if isinstance(invalidated_queries,tuple):
+                headers = tuple(self._long_name(header) for header in invalidated_queries)
+            elif name.startswith("*"):
+                headers = (None,)
+            else:
+                headers = (self.command_handlers.find_key(name).upper(),)
+            self.invalidated_headers[name] = headers
+        for header in headers:
+            cache.invalidate(header)
 
-    def _process_query(self,query,context,call_context):
-        # print("Query = "+str(command))
-        query_name = query.value[:-1]
+    #
+    # The long form of a header for the response cache. A spelling the query
+    # handlers don't accept (SOUR:VOLT for a query registered as
+    # SOURCE:VOLTAGE) may still be known to the command handlers.
+    #
+    def _long_name(self,header):
+        long_name = self.query_handlers.get_long_name(header)
+        if long_name == header.upper():
+            long_name = self.command_handlers.get_long_name(header)
+        return long_name
+
+    async def _invalidate_when_done(self,awaitable,handler,name):
+        try:
+            return await awaitable
+        finally:
+            self._invalidate_responses(handler,name)
+
+    #
+    # Called on a worker thread when an overlapped command finishes so that
+    # responses read while it was running aren't kept
+    #
+    def _overlapped_done(self,handler,name):
+        if self.response_cache is not None:
+            self._invalidate_responses(handler,name)
+
+    def _plan_query(self,query,context):
+        query_name = query.get_header()[:-1]
         if context.get_is_first():
             query_parts = query_name.split(":")
             context.set_command_scope(":".join(query_parts[:-1]))
 
-        if not context.get_is_first() and context.get_command_scope() and query_name[0] != ":":
+        if not context.get_is_first() and context.get_command_scope() and query_name[0] != ":" and query_name[0] != "*":
             query_name = context.get_command_scope() + ":" + query_name
 
+        if query_name[0] == ":":
+            query_name = query_name[1:]
+
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter_ns()
         handler = self.query_handlers.find_handler(query_name)
-        if handler:
-            if call_context != None:
-                return handler.query(query_name,call_context)
-            else:
-                return handler.query(query_name)
-        else:
-            # print("No handler for query "+query_name)
-            return "Invalid query"
+        if metrics is not None:
+            metrics.record(InterpreterMetrics.LOOKUP,time.perf_counter_ns() - start)
+        argument_types = getattr(handler,'query_argument_types',None)
+        if not isinstance(argument_types,tuple):
+            # The handler doesn't take arguments
+            return (True,handler,query_name,None)
+        if metrics is not None:
+            start = time.perf_counter_ns()
+        try:
+            arg = self.argument_converter.convert_typed(query.get_program_data(),argument_types,
+                getattr(handler,'query_required_arguments',None))
+        except ArgumentException as err:
+            return (True,None,query_name,self._argument_error(err))
+        finally:
+            if metrics is not None:
+                metrics.record(InterpreterMetrics.CONVERSION,time.perf_counter_ns() - start)
+        return (True,handler,query_name,arg)
 
-    def _process_command(self,command,context,call_context):
-        # print("Command = "+str(command))
-        header_token = command.children[0].children[0]
-        command_name = header_token.value
+    def _plan_command(self,command,context):
+        command_name = command.get_header()
         if context.get_is_first():
             query_parts = command_name.split(":")
             context.set_command_scope(":".join(query_parts[:-1]))
 
-        if not context.get_is_first() and context.get_command_scope() and command_name[0] != ":":
+        if not context.get_is_first() and context.get_command_scope() and command_name[0] != ":" and command_name[0] != "*":
             command_name = context.get_command_scope() + ":" + command_name
         
         if command_name[0] == ":":
             command_name = command_name[1:]
 
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter_ns()
         handler = self.command_handlers.find_handler(command_name)
-        if handler:
-            if command.children[2].data == 'program_data':
-                arg = self._parse_program_data(command.children[2])
-            else:
-                arg = "no Idea"
+        if metrics is not None:
+            metrics.record(InterpreterMetrics.LOOKUP,time.perf_counter_ns() - start)
+        if not handler:
+            return (False,None,command_name,None)
+        program_data = command.get_program_data()
+        if metrics is not None:
+            start = time.perf_counter_ns()
+        try:
+            arg = self._convert_command_arguments(handler,program_data)
+        except ArgumentException as err:
+            return (False,None,command_name,self._argument_error(err))
+        finally:
+            if metrics is not None:
+                metrics.record(InterpreterMetrics.CONVERSION,time.perf_counter_ns() - start)
+        return (False,handler,command_name,arg)
 
-            if call_context != None:
-                return handler.set(command_name,arg,call_context)
+    #
+    # Handlers that declare argument_types get a tuple of converted values.
+    # Otherwise the handler gets None if there are no arguments, the value if
+    # there is one and a tuple of values if there are more.
+    #
+    def _convert_command_arguments(self,handler,program_data):
+        argument_types = getattr(handler,'argument_types',None)
+        if isinstance(argument_types,tuple):
+            return self.argument_converter.convert_typed(program_data,argument_types,
+                getattr(handler,'required_arguments',None))
+        if not program_data:
+            return None
+        if len(program_data) == 1:
+            return self.argument_converter.convert(program_data[0])
+        return self.argument_converter.convert_all(program_data)
+
+    #
+    # Replace _parse and _run while metrics are enabled
+    #
+    def _timed_parse(self,command_string):
+        start = time.perf_counter_ns()
+        units = type(self)._parse(self,command_string)
+        self.metrics.record(InterpreterMetrics.PARSE,time.perf_counter_ns() - start)
+        if isinstance(units,str) and units != "\n":
+            self.metrics.count_parse_error()
+        return units
+
+    def _timed_run(self,step,call_context):
+        is_query,handler,name,arg = step
+        if handler is None:
+            if name is None:
+                # A line that couldn't be parsed when errors are queued
+                self.metrics.count_parse_error()
+            elif arg is not None:
+                self.metrics.count_invalid_argument()
+            elif is_query:
+                self.metrics.count_invalid_query()
             else:
-                return handler.set(command_name,arg)
-        else:
-            #print("No handler for query "+command_name)
-            return "Invalid command"
-
-    def _parse_program_data(self,program_data):
-        # print(program_data)
-        arg_type = program_data.children[0].type
-        arg_value = program_data.children[0].value
-        if arg_type == 'DECIMAL_NUMERIC_PROGRAM_DATA':
-            return float(arg_value)
-        elif arg_type == 'NON_DECIMAL_NUMERIC_DATA':
-            return self._parse_non_decimal(arg_value)
-        elif arg_type == 'STRING_PROGRAM_DATA':
-            string_body = arg_value[1:len(arg_value)-1]
-            if arg_value[0] == '\'':
-                string_body = string_body.replace('\'\'','\'')
+                self.metrics.count_invalid_command()
+            return type(self)._run(self,step,call_context)
+        start = time.perf_counter_ns()
+        result = type(self)._run(self,step,call_context)
+        self.metrics.record_handler(self._metric_key(is_query,name),time.perf_counter_ns() - start)
+        return result
+
+    #
+    # Returns the name the handler for name was registered with (plus ? for
+    # queries) which the handler timings are recorded under
+    #
+    def _metric_key(self,is_query,name):
+        key = self.metric_keys.get((is_query,name))
+        if key is None:
+            if is_query:
+                key = self.query_handlers.find_key(name) + "?"
             else:
-                string_body = string_body.replace('\"\"','\"')
-            return string_body
-        else:
-            return arg_value
-
-    def _parse_non_decimal(self,arg_value):
-        value_body = arg_value[2:len(arg_value)]
-        type_char = arg_value[1].upper()
-        if  type_char == 'H':
-            as_hex_string = "0x"+value_body
-            return int(as_hex_string,16)
-        elif type_char == 'B':
-            as_binary_string = "0b"+value_body
-            return int(as_binary_string,2)
-        elif type_char == 'Q':
-            as_octal_string = "0o"+value_body
-            return int(as_octal_string,8)
+                key = self.command_handlers.find_key(name)
+            self.metric_keys[(is_query,name)] = key
+        return key
 
     def _join_compound_name(self,names):
         # print("Names "+names)
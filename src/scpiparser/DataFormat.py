@@ -0,0 +1,240 @@
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if __package__:
+    from .CommandHandler import CommandHandler
+    from .QueryHandler import QueryHandler
+    from .ErrorQueue import ErrorQueue
+else:
+    from CommandHandler import CommandHandler
+    from QueryHandler import QueryHandler
+    from ErrorQueue import ErrorQueue
+
+class DataFormatException(ValueError):
+    pass
+
+#
+# Encodes array data returned by query handlers in the format selected with
+# FORMat:DATA and FORMat:BORDer.
+#
+# In ASCii format the values are returned as a comma separated list. In the
+# REAL and INTeger formats they are returned as an IEEE 488.2 definite length
+# block (#<n><length><bytes>) of 32 or 64 bit floats or 16 or 32 bit signed
+# integers. The block is returned as a list of buffers with the data itself
+# being a memoryview over the (converted) array so it is never joined into a
+# single string. NORMal byte order is big endian and SWAPped little endian.
+#
+# Values that don't fit in the INTeger format (after rounding) raise a
+# DataFormatException rather than being wrapped around.
+#
+# Arrays can be NumPy arrays or anything supporting the buffer protocol
+# (array.array etc). Converting these needs NumPy. Byte buffers (bytes,
+# bytearray or memoryviews of bytes) are always sent as they are in a block.
+#
+class DataFormat:
+
+    ASCII = 'ASC'
+    REAL = 'REAL'
+    INTEGER = 'INT'
+
+    NORMAL = 'NORM'
+    SWAPPED = 'SWAP'
+
+    LONG_FORMS = { ASCII:'ASCII', REAL:'REAL', INTEGER:'INTEGER', NORMAL:'NORMAL', SWAPPED:'SWAPPED' }
+
+    LENGTHS = { ASCII:(0,), REAL:(32,64), INTEGER:(16,32) }
+    DEFAULT_LENGTHS = { ASCII:0, REAL:32, INTEGER:16 }
+
+    def __init__(self,format_type=ASCII,length=None,byte_order=NORMAL):
+        self.set_format(format_type,length)
+        self.set_byte_order(byte_order)
+
+    def get_format(self):
+        return self.format_type
+    def get_length(self):
+        return self.length
+    def get_byte_order(self):
+        return self.byte_order
+
+    #
+    # format_type can be the long or short form (ASCii, REAL, INTeger)
+    #
+    def set_format(self,format_type,length=None):
+        format_type = self._short_form(format_type,(self.ASCII,self.REAL,self.INTEGER))
+        if length is None:
+            length = self.DEFAULT_LENGTHS[format_type]
+        length = int(length)
+        if format_type == self.ASCII:
+            length = 0
+        if length not in self.LENGTHS[format_type]:
+            raise DataFormatException("Invalid length "+str(length)+" for format "+format_type)
+        self.format_type = format_type
+        self.length = length
+
+    def set_byte_order(self,byte_order):
+        self.byte_order = self._short_form(byte_order,(self.NORMAL,self.SWAPPED))
+
+    #
+    # Returns True if the value is array data to encode (a NumPy array or
+    # anything supporting the buffer protocol)
+    #
+    @staticmethod
+    def is_array(value):
+        if numpy is not None and isinstance(value,numpy.ndarray):
+            return True
+        try:
+            memoryview(value)
+        except TypeError:
+            return False
+        return True
+
+    #
+    # Returns a str for ASCii format otherwise a list of buffers making up the
+    # definite length block
+    #
+    def encode(self,value):
+        if self._is_byte_buffer(value):
+            return self.block(value)
+        if numpy is None:
+            raise DataFormatException("NumPy is needed to encode array data")
+        values = numpy.asarray(value)
+        if self.format_type == self.ASCII:
+            return self._encode_ascii(values)
+        dtype = self._dtype()
+        if self.format_type == self.INTEGER:
+            values = self._to_integers(values,dtype)
+        values = numpy.ascontiguousarray(values.reshape(-1),dtype=dtype)
+        return self.block(memoryview(values.view(numpy.uint8)))
+
+    #
+    # Encodes a list of arrays (such as the two halves of a ring buffer) as
+    # if they were one. In the block formats each array that is already in
+    # the right type and byte order is sent as a view over it without being
+    # copied or joined to the others.
+    #
+    def encode_segments(self,segments):
+        if numpy is None:
+            raise DataFormatException("NumPy is needed to encode array data")
+        if self.format_type == self.ASCII:
+            return ",".join([self._encode_ascii(numpy.asarray(segment)) for segment in segments if len(segment)])
+        dtype = self._dtype()
+        views = []
+        for segment in segments:
+            values = numpy.asarray(segment).reshape(-1)
+            if self.format_type == self.INTEGER:
+                values = self._to_integers(values,dtype)
+            if len(values):
+                views.append(memoryview(numpy.ascontiguousarray(values,dtype=dtype).view(numpy.uint8)))
+        return [self._block_header(sum(len(view) for view in views))] + views
+
+    #
+    # Wraps a bytes like object in a definite length block header
+    #
+    def block(self,data):
+        data = memoryview(data).cast('B')
+        return [self._block_header(len(data)),data]
+
+    def _block_header(self,length):
+        length = str(length)
+        if len(length) > 9:
+            raise DataFormatException("Block of "+length+" bytes is too big")
+        return ("#"+str(len(length))+length).encode('ascii')
+
+    def _encode_ascii(self,values):
+        values = values.reshape(-1)
+        if values.dtype.kind == 'b':
+            values = values.astype(numpy.int8)
+        # Formatting the Python floats is faster than values.astype(str)
+        return ",".join(map(str,values.tolist()))
+
+    #
+    # Rounds the values to integers and checks they fit in the dtype as
+    # casting would silently wrap them around
+    #
+    def _to_integers(self,values,dtype):
+        if numpy.can_cast(values.dtype,dtype) or not values.size:
+            return values
+        if values.dtype.kind == 'f':
+            values = numpy.rint(values)
+            if not numpy.isfinite(values).all():
+                raise DataFormatException("Value out of range for format "+self.format_type+","+str(self.length))
+        limits = numpy.iinfo(dtype)
+        if values.min() < limits.min or values.max() > limits.max:
+            raise DataFormatException("Value out of range for format "+self.format_type+","+str(self.length))
+        return values
+
+    def _dtype(self):
+        order = '>' if self.byte_order == self.NORMAL else '<'
+        kind = 'f' if self.format_type == self.REAL else 'i'
+        return numpy.dtype(order+kind+str(self.length//8))
+
+    def _is_byte_buffer(self,value):
+        if isinstance(value,(bytes,bytearray)):
+            return True
+        if isinstance(value,memoryview):
+            return value.format in ('B','b','c')
+        return False
+
+    #
+    # Maps the long or short form of a mnemonic (like ASCii or ASC) onto
+    # the short form
+    #
+    def _short_form(self,value,choices):
+        value = str(value).upper()
+        for choice in choices:
+            if value.startswith(choice) and self.LONG_FORMS[choice].startswith(value):
+                return choice
+        raise DataFormatException("Invalid value "+value)
+
+#
+# FORMat[:DATA] <type>[,<length>] like FORM REAL,64
+#
+# An invalid format is returned as the response or, if there is an
+# error_queue, added to it as -224 (illegal parameter value).
+#
+class DataFormatHandler(QueryHandler,CommandHandler):
+    argument_types = (str,int)
+    required_arguments = 1
+
+    def __init__(self,data_format,error_queue=None):
+        self.data_format = data_format
+        self.error_queue = error_queue
+
+    def query(self,program_header,call_context=None):
+        if self.data_format.get_format() == DataFormat.ASCII:
+            return DataFormat.ASCII
+        return self.data_format.get_format()+","+str(self.data_format.get_length())
+
+    def set(self,program_header,program_data,call_context=None):
+        try:
+            self.data_format.set_format(*program_data)
+        except DataFormatException as err:
+            if self.error_queue is None:
+                return str(err)
+            self.error_queue.push(ErrorQueue.ILLEGAL_PARAMETER_VALUE,str(err))
+        return ""
+
+#
+# FORMat:BORDer NORMal|SWAPped
+#
+class ByteOrderHandler(QueryHandler,CommandHandler):
+    argument_types = (str,)
+
+    def __init__(self,data_format,error_queue=None):
+        self.data_format = data_format
+        self.error_queue = error_queue
+
+    def query(self,program_header,call_context=None):
+        return self.data_format.get_byte_order()
+
+    def set(self,program_header,program_data,call_context=None):
+        try:
+            self.data_format.set_byte_order(program_data[0])
+        except DataFormatException as err:
+            if self.error_queue is None:
+                return str(err)
+            self.error_queue.push(ErrorQueue.ILLEGAL_PARAMETER_VALUE,str(err))
+        return ""
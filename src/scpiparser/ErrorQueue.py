@@ -0,0 +1,195 @@
+import threading
+
+if __package__:
+    from .QueryHandler import QueryHandler
+    from .Locking import locked
+else:
+    from QueryHandler import QueryHandler
+    from Locking import locked
+
+#
+# The SCPI error queue read with SYSTem:ERRor[:NEXT]? and SYSTem:ERRor:COUNt?
+#
+# Errors are kept in a fixed size ring buffer so a client sending a flood of
+# bad lines can't make it grow. As SCPI requires, when the queue is full the
+# most recent error is replaced with -350,"Queue overflow" and later errors
+# are discarded until there is room again. The oldest errors are kept.
+#
+# An error is a code and an optional message. If there is no message the
+# standard one for the code is used so reporting one of the standard errors
+# doesn't build a string. Negative codes are the standard SCPI errors and
+# applications can add their own device specific errors with positive codes.
+#
+class ErrorQueue:
+
+    DEFAULT_MAX_SIZE = 20
+
+    NO_ERROR = 0
+    COMMAND_ERROR = -100
+    INVALID_CHARACTER = -101
+    SYNTAX_ERROR = -102
+    INVALID_SEPARATOR = -103
+    DATA_TYPE_ERROR = -104
+    PARAMETER_NOT_ALLOWED = -108
+    MISSING_PARAMETER = -109
+    UNDEFINED_HEADER = -113
+    INVALID_SUFFIX = -131
+    BLOCK_DATA_ERROR = -160
+    EXECUTION_ERROR = -200
+    ILLEGAL_PARAMETER_VALUE = -224
+    DEVICE_ERROR = -300
+    QUEUE_OVERFLOW = -350
+    QUERY_ERROR = -400
+
+    MESSAGES = {
+        NO_ERROR: "No error",
+        COMMAND_ERROR: "Command error",
+        INVALID_CHARACTER: "Invalid character",
+        SYNTAX_ERROR: "Syntax error",
+        INVALID_SEPARATOR: "Invalid separator",
+        DATA_TYPE_ERROR: "Data type error",
+        PARAMETER_NOT_ALLOWED: "Parameter not allowed",
+        MISSING_PARAMETER: "Missing parameter",
+        UNDEFINED_HEADER: "Undefined header",
+        INVALID_SUFFIX: "Invalid suffix",
+        BLOCK_DATA_ERROR: "Block data error",
+        EXECUTION_ERROR: "Execution error",
+        ILLEGAL_PARAMETER_VALUE: "Illegal parameter value",
+        DEVICE_ERROR: "Device-specific error",
+        QUEUE_OVERFLOW: "Queue overflow",
+        QUERY_ERROR: "Query error",
+    }
+
+    # The bits of the standard event status register for each class of error
+    COMMAND_ERROR_BIT = 0x20
+    EXECUTION_ERROR_BIT = 0x10
+    DEVICE_ERROR_BIT = 0x08
+    QUERY_ERROR_BIT = 0x04
+
+    def __init__(self,max_size=DEFAULT_MAX_SIZE,thread_safe=False):
+        if max_size < 1:
+            raise ValueError("Invalid queue size "+str(max_size))
+        self.max_size = max_size
+        self.entries = [None] * max_size
+        self.head = 0
+        self.count = 0
+        self.reported = 0
+        self.discarded = 0
+        self.operations = None
+        if thread_safe:
+            lock = threading.Lock()
+            self.push = locked(lock,self.push)
+            self.pop = locked(lock,self.pop)
+            self.clear = locked(lock,self.clear)
+
+    #
+    # Adds an error to the end of the queue. Returns False if the queue was
+    # full and the error was discarded.
+    #
+    def push(self,code,message=None):
+        self.reported += 1
+        if self.operations is not None:
+            self.operations.set_event_status(self.get_event_status_bit(code))
+        if self.count == self.max_size:
+            self.discarded += 1
+            last = (self.head + self.count - 1) % self.max_size
+            if self.entries[last][0] != self.QUEUE_OVERFLOW:
+                self.entries[last] = (self.QUEUE_OVERFLOW,None)
+            return False
+        self.entries[(self.head + self.count) % self.max_size] = (code,message)
+        self.count += 1
+        return True
+
+    #
+    # Removes the oldest error and returns it as (code,message) or returns
+    # (0,"No error") if the queue is empty
+    #
+    def pop(self):
+        if not self.count:
+            return (self.NO_ERROR,self.MESSAGES[self.NO_ERROR])
+        code,message = self.entries[self.head]
+        self.entries[self.head] = None
+        self.head = (self.head + 1) % self.max_size
+        self.count -= 1
+        return (code,self.get_message(code) if message is None else message)
+
+    #
+    # Removes the oldest error and returns it as SYSTem:ERRor? does, like
+    # -113,"Undefined header"
+    #
+    def pop_response(self):
+        code,message = self.pop()
+        return str(code) + ',"' + message.replace('"','""') + '"'
+
+    def clear(self):
+        self.entries = [None] * self.max_size
+        self.head = 0
+        self.count = 0
+
+    #
+    # If set each error also sets the bit of the PendingOperations' event
+    # status register for its class of error (see get_event_status_bit)
+    #
+    def get_operations(self):
+        return self.operations
+    def set_operations(self,operations):
+        self.operations = operations
+
+    def get_max_size(self):
+        return self.max_size
+    def get_count(self):
+        return self.count
+
+    #
+    # The number of errors reported (including those discarded) and the
+    # number discarded because the queue was full
+    #
+    def get_reported(self):
+        return self.reported
+    def get_discarded(self):
+        return self.discarded
+
+    #
+    # Returns the standard message for the code or, if it has none, the
+    # message for its class of error (-100 for -114 and so on)
+    #
+    @classmethod
+    def get_message(cls,code):
+        message = cls.MESSAGES.get(code)
+        if message is None:
+            message = cls.MESSAGES.get(-(-code // 100 * 100) if code < 0 else cls.DEVICE_ERROR,cls.MESSAGES[cls.DEVICE_ERROR])
+        return message
+
+    #
+    # Returns the bit of the standard event status register that reports
+    # an error with the code
+    #
+    @classmethod
+    def get_event_status_bit(cls,code):
+        if -200 < code <= -100:
+            return cls.COMMAND_ERROR_BIT
+        if -300 < code <= -200:
+            return cls.EXECUTION_ERROR_BIT
+        if -500 < code <= -400:
+            return cls.QUERY_ERROR_BIT
+        return cls.DEVICE_ERROR_BIT
+
+#
+# SYSTem:ERRor[:NEXT]?
+#
+class ErrorQueryHandler(QueryHandler):
+    def __init__(self,error_queue):
+        self.error_queue = error_queue
+
+    def query(self,program_header,call_context=None):
+        return self.error_queue.pop_response()
+
+#
+# SYSTem:ERRor:COUNt?
+#
+class ErrorCountQueryHandler(QueryHandler):
+    def __init__(self,error_queue):
+        self.error_queue = error_queue
+
+    def query(self,program_header,call_context=None):
+        return str(self.error_queue.get_count())
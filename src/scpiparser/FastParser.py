@@ -0,0 +1,107 @@
+import re
+
+if __package__:
+    from .ProgramMessageUnit import ProgramMessageUnit
+else:
+    from ProgramMessageUnit import ProgramMessageUnit
+
+#
+# A hand written scanner for the common shapes of program message such as
+# SOUR:VOLT 5.4e-3, MEAS:CURR? or *IDN?; SOUR:VOLT? so these don't need to
+# go through Lark.
+#
+# The regular expressions mirror the terminals in CommandInterpreter.SCPI_GRAMMAR
+# and the scanner matches them one at a time (as the Lark lexer does) rather
+# than backtracking over the whole line. Anything the scanner isn't sure about
+# (including every syntax error) makes parse() return None so the caller can
+# fall back to the full grammar which also produces the error message.
+#
+class FastParser:
+
+    _MNEMONIC = r'[A-Za-z]+[A-Za-z0-9_]*'
+
+    HEADER = re.compile(r'(?:\*'+_MNEMONIC+r'|:?'+_MNEMONIC+r'(?::'+_MNEMONIC+r')*)\??')
+    WHITE_SPACE = re.compile(r'[ \t\f\r\n]*')
+    CHARACTER_DATA = re.compile(_MNEMONIC)
+    DECIMAL_DATA = re.compile(r'[+-]?(?:[0-9]*\.[0-9]+|[0-9]+(?:\.[0-9]*)?)(?:[ \t]*[Ee][ \t]*[+-]?[0-9]+)?')
+    SUFFIX_DATA = re.compile(r'/?[A-Za-z]+(?:-?[0-9])?(?:[/.][A-Za-z]+(?:-?[0-9])?)*')
+    NON_DECIMAL_DATA = re.compile(r'#(?:[Hh][0-9A-Fa-f]+|[Qq][0-7]+|[Bb][01]+)')
+    BLOCK_DATA = re.compile(r'#[0-9]+#')
+    STRING_DATA = re.compile(r'\'(?:\'\'|[^\'])*\'|"(?:""|[^"])*"')
+    CHANNEL_LIST_DATA = re.compile(r'\(\s*@[0-9!:,\s]*\)')
+
+    #
+    # Returns a list of ProgramMessageUnit or None if the line needs the
+    # full parser
+    #
+    def parse(self,line):
+        units = []
+        end = len(line)
+        pos = self.WHITE_SPACE.match(line,0).end()
+        while True:
+            match = self.HEADER.match(line,pos)
+            if not match:
+                return None
+            header = match.group()
+            pos = match.end()
+            data_start = self.WHITE_SPACE.match(line,pos).end()
+            program_data = []
+            if data_start < end and line[data_start] != ';':
+                if data_start == pos:
+                    return None
+                pos = data_start
+                while True:
+                    pos = self._match_program_data(line,pos,program_data)
+                    if pos < 0:
+                        return None
+                    pos = self.WHITE_SPACE.match(line,pos).end()
+                    if pos == end or line[pos] != ',':
+                        break
+                    pos = self.WHITE_SPACE.match(line,pos+1).end()
+            else:
+                pos = data_start
+            units.append(ProgramMessageUnit(header[-1] == '?',header,program_data))
+            if pos == end:
+                return units
+            if line[pos] != ';':
+                return None
+            pos = self.WHITE_SPACE.match(line,pos+1).end()
+
+    #
+    # Matches one program data element at pos appending it to program_data.
+    # Returns the position after the element or -1 if it can't be matched
+    #
+    def _match_program_data(self,line,pos,program_data):
+        if pos == len(line):
+            return -1
+        first = line[pos]
+        if first.isalpha():
+            match = self.CHARACTER_DATA.match(line,pos)
+            arg_type = 'PROGRAM_MNEMONIC'
+        elif first == '#':
+            match = self.NON_DECIMAL_DATA.match(line,pos)
+            arg_type = 'NON_DECIMAL_NUMERIC_DATA'
+            if not match:
+                match = self.BLOCK_DATA.match(line,pos)
+                arg_type = 'ARBITRARY_BLOCK_PROGRAM_DATA'
+        elif first == '\'' or first == '"':
+            match = self.STRING_DATA.match(line,pos)
+            arg_type = 'STRING_PROGRAM_DATA'
+        elif first == '(':
+            match = self.CHANNEL_LIST_DATA.match(line,pos)
+            arg_type = 'CHANNEL_LIST_PROGRAM_DATA'
+        else:
+            match = self.DECIMAL_DATA.match(line,pos)
+            if not match:
+                return -1
+            suffix_start = self.WHITE_SPACE.match(line,match.end()).end()
+            suffix = self.SUFFIX_DATA.match(line,suffix_start)
+            if suffix:
+                program_data.append(('DECIMAL_NUMERIC_PROGRAM_DATA',match.group(),suffix.group()))
+                return suffix.end()
+            program_data.append(('DECIMAL_NUMERIC_PROGRAM_DATA',match.group(),None))
+            return match.end()
+        if not match:
+            return -1
+        program_data.append((arg_type,match.group(),None))
+        return match.end()
@@ -1,34 +1,169 @@
 
+import threading
+
+if __package__:
+    from .ResponseCache import ResponseCache
+else:
+    from ResponseCache import ResponseCache
+
 class DuplicateHandlerException(Exception):
     pass
 
 class HandlerMapNode:
-    def __init__(self,handler=None):
+    __slots__ = ('handler','children','key')
+
+    def __init__(self,handler=None,key=None):
         self.handler = handler
         self.children = {}
+        self.key = key
     def get_children(self):
         return self.children
     def get_handler(self):
         return self.handler
     def set_handler(self,handler):
         self.handler = handler
+    def get_key(self):
+        return self.key
+    def set_key(self,key):
+        self.key = key
 
+#
+# Maps SCPI headers (like SOURce:VOLTage) to handlers. Headers are stored in a
+# tree with one level per mnemonic so that both the long and short forms can
+# be looked up (SOURCE:VOLTAGE or SOUR:VOLT).
+#
+# Once all the handlers are registered freeze() can be called to flatten the
+# tree into a single dictionary keyed on every header spelling the tree
+# accepts. Lookups are then a single dictionary lookup. Registering another
+# handler discards the flattened table so freeze() must be called again.
+#
+# A thread_safe map is always frozen. Registering a handler copies the
+# flattened table, adds the new handler to the copy and then swaps it in with
+# a single assignment, so lookups from other threads see either the old or
+# the new table and never need a lock. Registrations are serialised with a
+# lock. Each registration copies the table so register everything up front
+# where possible.
+#
+# The map also manages the ResponseCache for the query handlers that cache
+# their responses. Registering a handler drops any responses cached for its
+# header.
+#
 class HandlerMap:
-    def __init__(self):
+    def __init__(self,thread_safe=False):
         self.map = {}
+        self.frozen_map = None
+        self.frozen_keys = None
+        self.lock = None
+        self.response_cache = None
+        if thread_safe:
+            self.lock = threading.Lock()
+            self.frozen_map = {}
+            self.frozen_keys = {}
 
     def register_handler(self,name,handler):
         name_parts = name.split(":")
         short_name_parts = self._to_short_names(name_parts)
         name_parts = list(map(lambda name: name.upper(),name_parts))
-        self._add_entry(name_parts,self.map,handler)
-        self._add_entry(short_name_parts,self.map,handler)
+        if self.response_cache is not None:
+            self.response_cache.invalidate(name.upper())
+        if self.lock is None:
+            self._add_entry(name_parts,self.map,handler,name)
+            self._add_entry(short_name_parts,self.map,handler,name)
+            self.frozen_map = None
+            self.frozen_keys = None
+            return
+        with self.lock:
+            self._add_entry(name_parts,self.map,handler,name)
+            self._add_entry(short_name_parts,self.map,handler,name)
+            frozen_map = dict(self.frozen_map)
+            frozen_keys = dict(self.frozen_keys)
+            for parts in (name_parts,short_name_parts):
+                frozen_map[":".join(parts)] = handler
+                frozen_keys[":".join(parts)] = name
+            # Keys first so a lookup that finds the new handler finds its key
+            self.frozen_keys = frozen_keys
+            self.frozen_map = frozen_map
 
     def find_handler(self,name):
+        frozen_map = self.frozen_map
+        if frozen_map is not None:
+            return frozen_map.get(name.upper())
         name_parts = name.upper().split(":")
         return self._find_entry(name_parts,self.map)
 
-    def _add_entry(self,name_parts,nodes,handler):
+    #
+    # Returns the name the handler for name was registered with (so SOUR:VOLT
+    # gives SOURce:VOLTage) or None if there is no handler
+    #
+    def find_key(self,name):
+        frozen_keys = self.frozen_keys
+        if frozen_keys is not None:
+            return frozen_keys.get(name.upper())
+        nodes = self.map
+        node = None
+        for name_part in name.upper().split(":"):
+            node = nodes.get(name_part)
+            if node is None:
+                return None
+            nodes = node.children
+        return node.key if node.handler else None
+
+    #
+    # Returns the long form of a header in upper case (SOURCE:VOLTAGE for
+    # SOUR:VOLT, sour:volt or SOURce:VOLTage) found from the registered
+    # headers, so different spellings of the same header give the same name.
+    # Mnemonics that aren't registered are just upper cased.
+    #
+    def get_long_name(self,name):
+        parts = name.upper().split(":")
+        nodes = self.map
+        for depth,part in enumerate(parts):
+            node = nodes.get(part)
+            if node is None:
+                break
+            key = self._first_key(node)
+            if key is not None:
+                parts[depth] = key.split(":")[depth].upper()
+            nodes = node.children
+        return ":".join(parts)
+
+    #
+    # Returns the ResponseCache (created by the first call)
+    #
+    def get_response_cache(self):
+        if self.response_cache is None:
+            self.response_cache = ResponseCache(thread_safe=self.lock is not None)
+        return self.response_cache
+
+    def freeze(self):
+        if self.lock is None:
+            self._freeze()
+        else:
+            with self.lock:
+                self._freeze()
+
+    def is_frozen(self):
+        return self.frozen_map is not None
+
+    def is_thread_safe(self):
+        return self.lock is not None
+
+    def _freeze(self):
+        frozen_map = {}
+        frozen_keys = {}
+        self._flatten("",self.map,frozen_map,frozen_keys)
+        self.frozen_keys = frozen_keys
+        self.frozen_map = frozen_map
+
+    def _flatten(self,prefix,nodes,frozen_map,frozen_keys):
+        for name_part,node in nodes.items():
+            name = prefix + name_part
+            if node.get_handler():
+                frozen_map[name] = node.get_handler()
+                frozen_keys[name] = node.get_key()
+            self._flatten(name + ":",node.get_children(),frozen_map,frozen_keys)
+
+    def _add_entry(self,name_parts,nodes,handler,key):
         name_part = name_parts[0]
         last_part = (len(name_parts) == 1)
         if name_part in nodes:
@@ -36,23 +171,33 @@ class HandlerMap:
                 if nodes[name_part].get_handler() and nodes[name_part].get_handler() != handler:
                     raise DuplicateHandlerException
                 nodes[name_part].set_handler(handler)
+                nodes[name_part].set_key(key)
             else:
-                self._add_entry(name_parts[1:],nodes[name_part].get_children(),handler)
+                self._add_entry(name_parts[1:],nodes[name_part].get_children(),handler,key)
         else:
-            nodes[name_part] = HandlerMapNode(handler if last_part else None)
+            nodes[name_part] = HandlerMapNode(handler if last_part else None,key if last_part else None)
             if not last_part:
-                self._add_entry(name_parts[1:],nodes[name_part].get_children(),handler)
+                self._add_entry(name_parts[1:],nodes[name_part].get_children(),handler,key)
+
+    #
+    # Returns the key of the first handler at or below the node
+    #
+    def _first_key(self,node):
+        if node.key is not None:
+            return node.key
+        for child in node.children.values():
+            key = self._first_key(child)
+            if key is not None:
+                return key
+        return None
 
     def _find_entry(self,name_parts,nodes):
-        name_part = name_parts[0]
-        last_part = (len(name_parts) == 1)
-        if name_part in nodes:
-            if last_part:
-                return nodes[name_part].get_handler()
-            else:
-                return self._find_entry(name_parts[1:],nodes[name_part].get_children())
-        else:
-            return None
+        for name_part in name_parts:
+            node = nodes.get(name_part)
+            if node is None:
+                return None
+            nodes = node.children
+        return node.handler
 
     def _to_short_names(self,name_parts):
         short_name_parts = []
@@ -61,6 +206,9 @@ class HandlerMap:
         return short_name_parts
 
     def _short_name(self,name):
+        if name.startswith("*"):
+            # Common commands like *IDN have no short form
+            return name.upper()
         short_name = ""
         for next_char in name:
             if next_char.isupper() :
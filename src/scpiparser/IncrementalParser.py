@@ -0,0 +1,180 @@
+import re
+
+if __package__:
+    from .CommandInterpreter import ParserContext
+    from .CommandInterpreter import ResponseBuilder
+    from .ErrorQueue import ErrorQueue
+else:
+    from CommandInterpreter import ParserContext
+    from CommandInterpreter import ResponseBuilder
+    from ErrorQueue import ErrorQueue
+
+#
+# Feeds program messages to a CommandInterpreter as they arrive in chunks of
+# bytes (from a socket or serial port) rather than a line at a time. Each
+# program message unit is run as soon as the semicolon or newline ending it
+# arrives so a transport doesn't have to buffer (and decode) whole lines.
+#
+#   parser = IncrementalParser(interpreter)
+#   while True:
+#       send(parser.feed(receive()))
+#
+# feed returns the responses to the units completed by the chunk in the same
+# form as process_line (a str or, if there is binary data, a list of buffers).
+# The command scope is carried from one unit to the next until the end of
+# the message. Semicolons and newlines inside strings and arbitrary block
+# data don't end a unit. When a unit fully within one chunk contains block
+# data the handler gets a memoryview over the chunk (otherwise the unit is
+# joined into a new buffer first).
+#
+# Unlike process_line a syntax error only stops the units that come after it
+# in the message (the earlier ones have already been run). The rest of the
+# message is discarded. An empty unit (like the first in ;*IDN?) is a syntax
+# error.
+#
+class IncrementalParser:
+
+    NORMAL = 0
+    STRING = 1
+    STRING_END = 2
+    HASH = 3
+    BLOCK_LENGTH = 4
+    BLOCK_DATA = 5
+    INDEFINITE_BLOCK = 6
+
+    SPECIAL = re.compile(rb"[;\n'\"#]")
+    QUOTE_END = { ord("'"):re.compile(rb"'"), ord('"'):re.compile(rb'"') }
+    NEWLINE = re.compile(rb"\n")
+    NOT_BLANK = re.compile(rb"[^ \t\f\r\n]")
+
+    EMPTY_UNIT_ERROR = "Empty program message unit\n"
+
+    def __init__(self,interpreter,call_context=None):
+        self.interpreter = interpreter
+        self.call_context = call_context
+        self.context = ParserContext()
+        self.parts = []
+        self.state = self.NORMAL
+        self.quote = None
+        self.length_text = b""
+        self.length_digits = 0
+        self.remaining = 0
+
+    def feed(self,chunk):
+        data = memoryview(chunk).cast('B')
+        response = ResponseBuilder()
+        start = 0
+        pos = 0
+        end = len(data)
+        while pos < end:
+            if self.state == self.NORMAL:
+                match = self.SPECIAL.search(data,pos)
+                if not match:
+                    break
+                pos = match.end()
+                char = data[match.start()]
+                if char == 0x3b or char == 0x0a:
+                    self._dispatch(self._take(data,start,match.start()),char == 0x0a,response)
+                    start = pos
+                elif char == 0x23:
+                    self.state = self.HASH
+                else:
+                    self.quote = char
+                    self.state = self.STRING
+            elif self.state == self.STRING:
+                match = self.QUOTE_END[self.quote].search(data,pos)
+                if not match:
+                    break
+                pos = match.end()
+                self.state = self.STRING_END
+            elif self.state == self.STRING_END:
+                # A doubled quote is part of the string
+                if data[pos] == self.quote:
+                    pos += 1
+                    self.state = self.STRING
+                else:
+                    self.state = self.NORMAL
+            elif self.state == self.HASH:
+                digit = data[pos] - 0x30
+                if digit == 0:
+                    pos += 1
+                    self.state = self.INDEFINITE_BLOCK
+                elif 0 < digit <= 9:
+                    pos += 1
+                    self.length_digits = digit
+                    self.length_text = b""
+                    self.state = self.BLOCK_LENGTH
+                else:
+                    self.state = self.NORMAL
+            elif self.state == self.BLOCK_LENGTH:
+                count = min(self.length_digits - len(self.length_text),end - pos)
+                self.length_text += bytes(data[pos:pos+count])
+                pos += count
+                if len(self.length_text) == self.length_digits:
+                    if self.length_text.isdigit():
+                        self.remaining = int(self.length_text)
+                        self.state = self.BLOCK_DATA
+                    else:
+                        # Leave the error to the interpreter
+                        self.state = self.NORMAL
+            elif self.state == self.BLOCK_DATA:
+                count = min(self.remaining,end - pos)
+                pos += count
+                self.remaining -= count
+                if self.remaining == 0:
+                    self.state = self.NORMAL
+            else:
+                # An indefinite length block runs to the end of the message
+                match = self.NEWLINE.search(data,pos)
+                if not match:
+                    break
+                pos = match.start()
+                self.state = self.NORMAL
+        if start < end:
+            # Copied as the caller may reuse the chunk's buffer
+            self.parts.append(bytes(data[start:end]))
+        return response.get_response()
+
+    #
+    # Runs any incomplete unit as if the message had ended (at the end of the
+    # input for example) and returns its response
+    #
+    def close(self):
+        response = ResponseBuilder()
+        if self.parts:
+            self._dispatch(self._take(b"",0,0),True,response)
+        self.state = self.NORMAL
+        return response.get_response()
+
+    def _take(self,data,start,stop):
+        if not self.parts:
+            return data[start:stop]
+        self.parts.append(data[start:stop])
+        unit = b"".join(self.parts)
+        self.parts = []
+        return unit
+
+    def _dispatch(self,unit,end_of_message,response):
+        context = self.context
+        if end_of_message:
+            self.context = ParserContext()
+        if context.get_has_error():
+            return
+        if not self.NOT_BLANK.search(unit):
+            if context.get_is_first() and end_of_message:
+                response.add("\n")
+            else:
+                context.set_has_error(True)
+                error_queue = self.interpreter.get_error_queue()
+                if error_queue is None:
+                    response.add(self.EMPTY_UNIT_ERROR)
+                else:
+                    error_queue.push(ErrorQueue.SYNTAX_ERROR)
+                    response.add("\n")
+            return
+        result = self.interpreter.process_unit(unit,context,self.call_context)
+        if isinstance(result,str):
+            response.add(result)
+        else:
+            for buffer in result:
+                response.add(buffer)
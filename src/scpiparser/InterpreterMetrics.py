@@ -0,0 +1,185 @@
+import json
+
+#
+# A latency histogram with power of two buckets (bucket n counts the times
+# shorter than 2**n ns). Recording a time is just an int.bit_length() and a
+# couple of additions so it is cheap enough to do for every command.
+#
+class LatencyHistogram:
+
+    # The bucket bounds reported (about 1us to 17s)
+    MIN_EXPORTED_BUCKET = 10
+    MAX_EXPORTED_BUCKET = 34
+
+    def __init__(self):
+        self.counts = [0] * 65
+        self.count = 0
+        self.total_ns = 0
+
+    def record(self,elapsed_ns):
+        self.counts[elapsed_ns.bit_length()] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+
+    def get_count(self):
+        return self.count
+    def get_total_seconds(self):
+        return self.total_ns / 1e9
+
+    def get_mean_seconds(self):
+        return self.total_ns / self.count / 1e9 if self.count else 0.0
+
+    #
+    # Returns the upper bound (in seconds) of the bucket holding the given
+    # quantile (0.5 for the median) or None if nothing has been recorded
+    #
+    def get_quantile_seconds(self,quantile):
+        if not self.count:
+            return None
+        target = quantile * self.count
+        seen = 0
+        for index,count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return (1 << index) / 1e9
+        return None
+
+    #
+    # Returns a list of (upper bound in seconds,cumulative count) pairs ending
+    # with (inf,count) as Prometheus expects
+    #
+    def get_buckets(self):
+        buckets = []
+        cumulative = sum(self.counts[:self.MIN_EXPORTED_BUCKET])
+        for index in range(self.MIN_EXPORTED_BUCKET,self.MAX_EXPORTED_BUCKET+1):
+            cumulative += self.counts[index]
+            buckets.append(((1 << index) / 1e9,cumulative))
+        buckets.append((float('inf'),self.count))
+        return buckets
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum_seconds': self.get_total_seconds(),
+            'mean_seconds': self.get_mean_seconds(),
+            'p50_seconds': self.get_quantile_seconds(0.5),
+            'p99_seconds': self.get_quantile_seconds(0.99),
+        }
+
+#
+# The timings and counters collected by a CommandInterpreter once
+# enable_metrics() has been called.
+#
+# The time spent on each line is split into stages:
+#
+#   parse       parsing the line into units (skipped for plan cache hits)
+#   lookup      finding the handler in the HandlerMap
+#   conversion  converting the program data for the handler
+#   handler     running the handler (for async handlers this is only the
+#               time taken to start the coroutine)
+#
+# The handler time is also recorded for each registered header (keyed on the
+# name it was registered with, with a trailing ? for queries). Lines that
+# fail to parse, units with no handler and units with arguments that don't
+# match the handler's declared types are counted.
+#
+class InterpreterMetrics:
+
+    PARSE = 'parse'
+    LOOKUP = 'lookup'
+    CONVERSION = 'conversion'
+    HANDLER = 'handler'
+    STAGES = (PARSE,LOOKUP,CONVERSION,HANDLER)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stages = { stage:LatencyHistogram() for stage in self.STAGES }
+        self.headers = {}
+        self.parse_errors = 0
+        self.invalid_commands = 0
+        self.invalid_queries = 0
+        self.invalid_arguments = 0
+
+    def record(self,stage,elapsed_ns):
+        self.stages[stage].record(elapsed_ns)
+
+    def record_handler(self,header,elapsed_ns):
+        self.stages[self.HANDLER].record(elapsed_ns)
+        histogram = self.headers.get(header)
+        if histogram is None:
+            histogram = self.headers[header] = LatencyHistogram()
+        histogram.record(elapsed_ns)
+
+    def count_parse_error(self):
+        self.parse_errors += 1
+    def count_invalid_command(self):
+        self.invalid_commands += 1
+    def count_invalid_query(self):
+        self.invalid_queries += 1
+    def count_invalid_argument(self):
+        self.invalid_arguments += 1
+
+    def get_stage(self,stage):
+        return self.stages[stage]
+    def get_header(self,header):
+        return self.headers.get(header)
+    def get_headers(self):
+        return dict(self.headers)
+    def get_parse_errors(self):
+        return self.parse_errors
+    def get_invalid_commands(self):
+        return self.invalid_commands
+    def get_invalid_queries(self):
+        return self.invalid_queries
+    def get_invalid_arguments(self):
+        return self.invalid_arguments
+
+    def snapshot(self):
+        return {
+            'stages': { stage:histogram.snapshot() for stage,histogram in self.stages.items() },
+            'headers': { header:histogram.snapshot() for header,histogram in sorted(self.headers.items()) },
+            'parse_errors': self.parse_errors,
+            'invalid_commands': self.invalid_commands,
+            'invalid_queries': self.invalid_queries,
+            'invalid_arguments': self.invalid_arguments,
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(),indent=2)
+
+    #
+    # Returns the metrics in the Prometheus text exposition format
+    #
+    def to_prometheus(self,prefix='scpi'):
+        lines = []
+        name = prefix + "_stage_duration_seconds"
+        lines.append("# HELP "+name+" Time spent in each stage of processing a line")
+        lines.append("# TYPE "+name+" histogram")
+        for stage,histogram in self.stages.items():
+            self._add_histogram(lines,name,'stage="'+stage+'"',histogram)
+        name = prefix + "_handler_duration_seconds"
+        lines.append("# HELP "+name+" Time spent in the handler for each header")
+        lines.append("# TYPE "+name+" histogram")
+        for header,histogram in sorted(self.headers.items()):
+            self._add_histogram(lines,name,'header="'+self._escape(header)+'"',histogram)
+        for counter,value,description in [
+                ("parse_errors_total",self.parse_errors,"Lines that could not be parsed"),
+                ("invalid_commands_total",self.invalid_commands,"Commands with no handler"),
+                ("invalid_queries_total",self.invalid_queries,"Queries with no handler"),
+                ("invalid_arguments_total",self.invalid_arguments,"Commands and queries with invalid arguments")]:
+            lines.append("# HELP "+prefix+"_"+counter+" "+description)
+            lines.append("# TYPE "+prefix+"_"+counter+" counter")
+            lines.append(prefix+"_"+counter+" "+str(value))
+        return "\n".join(lines) + "\n"
+
+    def _add_histogram(self,lines,name,labels,histogram):
+        for bound,count in histogram.get_buckets():
+            bound = "+Inf" if bound == float('inf') else repr(bound)
+            lines.append(name+"_bucket{"+labels+',le="'+bound+'"} '+str(count))
+        lines.append(name+"_sum{"+labels+"} "+repr(histogram.get_total_seconds()))
+        lines.append(name+"_count{"+labels+"} "+str(histogram.get_count()))
+
+    def _escape(self,value):
+        return value.replace("\\","\\\\").replace('"','\\"')
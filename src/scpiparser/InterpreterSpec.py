@@ -0,0 +1,56 @@
+if __package__:
+    from .CommandInterpreter import CommandInterpreter
+else:
+    from CommandInterpreter import CommandInterpreter
+
+#
+# A picklable description of how to build a CommandInterpreter: the options
+# passed to its constructor and the handlers (and units) to register. Use it
+# where an interpreter has to be built somewhere else, such as in each of the
+# worker processes of a ShardedInterpreter.
+#
+#   spec = InterpreterSpec(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+#   spec.register_command_handler("SOURce:VOLTage",VoltageHandler())
+#   interpreter = spec.build()
+#
+# The handlers must be picklable (instances of classes defined at the top
+# level of a module). Each process the spec is sent to gets its own copy of
+# them. The registrations are replayed in order by build() which then
+# freezes the handler maps.
+#
+class InterpreterSpec:
+
+    COMMAND = 'command'
+    QUERY = 'query'
+    UNIT = 'unit'
+
+    def __init__(self,**interpreter_options):
+        self.interpreter_options = interpreter_options
+        self.registrations = []
+
+    def register_command_handler(self,key,handler,overlapped=False):
+        self.registrations.append((self.COMMAND,key,handler,overlapped))
+
+    def register_query_handler(self,key,handler):
+        self.registrations.append((self.QUERY,key,handler,False))
+
+    def register_unit(self,unit):
+        self.registrations.append((self.UNIT,unit,None,False))
+
+    def get_interpreter_options(self):
+        return dict(self.interpreter_options)
+
+    def get_registrations(self):
+        return list(self.registrations)
+
+    def build(self):
+        interpreter = CommandInterpreter(**self.interpreter_options)
+        for kind,key,handler,overlapped in self.registrations:
+            if kind == self.COMMAND:
+                interpreter.register_command_handler(key,handler,overlapped)
+            elif kind == self.QUERY:
+                interpreter.register_query_handler(key,handler)
+            else:
+                interpreter.register_unit(key)
+        interpreter.freeze()
+        return interpreter
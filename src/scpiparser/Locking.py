@@ -0,0 +1,13 @@
+import functools
+
+#
+# Returns a function that calls method while holding lock. The caches and the
+# error queue use this to replace their methods when they are made thread
+# safe so there is no locking cost when they aren't.
+#
+def locked(lock,method):
+    @functools.wraps(method)
+    def locked_method(*args,**kwargs):
+        with lock:
+            return method(*args,**kwargs)
+    return locked_method
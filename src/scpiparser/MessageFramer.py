@@ -0,0 +1,151 @@
+import re
+
+class FramingError(ValueError):
+    pass
+
+#
+# Splits the bytes received on a stream connection into program messages
+# (lines) for process_line. A message ends at a newline that isn't inside
+# string data or arbitrary block data so a block can hold any bytes,
+# including newlines. The block lengths are followed as in IncrementalParser.
+#
+#   framer = MessageFramer(max_line_length=65536)
+#   for line in framer.feed(receive()):
+#       send(interpreter.process_line(line))
+#
+# feed returns the messages completed by the chunk without the terminator
+# (a "\r" before the newline is dropped unless it is block data). The rest of
+# the chunk is kept until the end of its message arrives.
+#
+# FramingError is raised if the text of a message (not counting definite
+# length block data) is longer than max_line_length bytes or a block is
+# longer than max_block_length bytes. The connection can't be recovered so
+# it should be closed.
+#
+class MessageFramer:
+
+    NORMAL = 0
+    STRING = 1
+    STRING_END = 2
+    HASH = 3
+    BLOCK_LENGTH = 4
+    BLOCK_DATA = 5
+    INDEFINITE_BLOCK = 6
+
+    SPECIAL = re.compile(rb"[\n'\"#]")
+    QUOTE_END = { ord("'"):re.compile(rb"'"), ord('"'):re.compile(rb'"') }
+    NEWLINE = re.compile(rb"\n")
+
+    def __init__(self,max_line_length=None,max_block_length=None):
+        self.max_line_length = max_line_length
+        self.max_block_length = max_block_length
+        self.parts = []
+        # The bytes of the message held in parts, how many of them are block
+        # data and where the last block ends
+        self.size = 0
+        self.block_bytes = 0
+        self.block_end = 0
+        self.state = self.NORMAL
+        self.quote = None
+        self.length_text = b""
+        self.length_digits = 0
+        self.remaining = 0
+
+    def feed(self,chunk):
+        data = bytes(chunk)
+        messages = []
+        start = 0
+        pos = 0
+        end = len(data)
+        while pos < end:
+            if self.state == self.NORMAL:
+                match = self.SPECIAL.search(data,pos)
+                if not match:
+                    break
+                pos = match.end()
+                char = data[match.start()]
+                if char == 0x0a:
+                    messages.append(self._take(data,start,match.start()))
+                    start = pos
+                elif char == 0x23:
+                    self.state = self.HASH
+                else:
+                    self.quote = char
+                    self.state = self.STRING
+            elif self.state == self.STRING:
+                match = self.QUOTE_END[self.quote].search(data,pos)
+                if not match:
+                    break
+                pos = match.end()
+                self.state = self.STRING_END
+            elif self.state == self.STRING_END:
+                # A doubled quote is part of the string
+                if data[pos] == self.quote:
+                    pos += 1
+                    self.state = self.STRING
+                else:
+                    self.state = self.NORMAL
+            elif self.state == self.HASH:
+                digit = data[pos] - 0x30
+                if digit == 0:
+                    pos += 1
+                    self.state = self.INDEFINITE_BLOCK
+                elif 0 < digit <= 9:
+                    pos += 1
+                    self.length_digits = digit
+                    self.length_text = b""
+                    self.state = self.BLOCK_LENGTH
+                else:
+                    self.state = self.NORMAL
+            elif self.state == self.BLOCK_LENGTH:
+                count = min(self.length_digits - len(self.length_text),end - pos)
+                self.length_text += data[pos:pos+count]
+                pos += count
+                if len(self.length_text) == self.length_digits:
+                    if self.length_text.isdigit():
+                        self.remaining = int(self.length_text)
+                        if self.max_block_length is not None and self.remaining > self.max_block_length:
+                            raise FramingError("Block too long")
+                        self.state = self.BLOCK_DATA
+                    else:
+                        # Leave the error to the interpreter
+                        self.state = self.NORMAL
+            elif self.state == self.BLOCK_DATA:
+                count = min(self.remaining,end - pos)
+                pos += count
+                self.remaining -= count
+                self.block_bytes += count
+                if self.remaining == 0:
+                    self.block_end = self.size + pos - start
+                    self.state = self.NORMAL
+            else:
+                # An indefinite length block runs to the end of the message
+                match = self.NEWLINE.search(data,pos)
+                if not match:
+                    break
+                pos = match.start()
+                self.state = self.NORMAL
+        if start < end:
+            self.parts.append(data[start:end])
+            self.size += end - start
+            self._check_length(self.size)
+        return messages
+
+    def _take(self,data,start,stop):
+        if self.parts:
+            self.parts.append(data[start:stop])
+            message = b"".join(self.parts)
+            self.parts = []
+        else:
+            message = data[start:stop]
+        self._check_length(len(message))
+        if message.endswith(b"\r") and len(message) > self.block_end:
+            message = message[:-1]
+        self.size = 0
+        self.block_bytes = 0
+        self.block_end = 0
+        return message
+
+    def _check_length(self,size):
+        if self.max_line_length is not None and size - self.block_bytes > self.max_line_length:
+            raise FramingError("Line too long")
@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+import lark
+from lark import Lark
+
+#
+# Caches compiled Lark parsers so that creating many interpreters doesn't
+# compile the same grammar over and over again.
+#
+# Parsers are shared in memory by every interpreter in the process. LALR
+# parsers can also be persisted to a directory so that later processes can
+# load the compiled parse tables rather than building them (Lark can't
+# serialise an Earley parser so these are only cached in memory).
+#
+# Entries are keyed on a hash of the grammar text, the Lark version and the
+# parser mode so a grammar or Lark upgrade never picks up a stale parser.
+#
+class ParserCache:
+
+    CACHE_FILE_PREFIX = "scpiparser_"
+    CACHE_FILE_SUFFIX = ".lark_cache"
+
+    _parsers = {}
+
+    @classmethod
+    def get_parser(cls,grammar,parser_mode,cache_dir=None):
+        key = cls.cache_key(grammar,parser_mode)
+        parser = cls._parsers.get(key)
+        if parser is None:
+            parser = cls._build_parser(grammar,parser_mode,key,cache_dir)
+            cls._parsers[key] = parser
+        return parser
+
+    @classmethod
+    def cache_key(cls,grammar,parser_mode):
+        digest = hashlib.sha256()
+        digest.update(grammar.encode("utf-8"))
+        digest.update(lark.__version__.encode("utf-8"))
+        digest.update(parser_mode.encode("utf-8"))
+        return digest.hexdigest()
+
+    @classmethod
+    def cache_file(cls,grammar,parser_mode,cache_dir):
+        return os.path.join(cache_dir,cls.CACHE_FILE_PREFIX+cls.cache_key(grammar,parser_mode)+cls.CACHE_FILE_SUFFIX)
+
+    #
+    # Drops the in-memory parsers. Files written to a cache directory are
+    # left alone.
+    #
+    @classmethod
+    def clear(cls):
+        cls._parsers.clear()
+
+    @classmethod
+    def _build_parser(cls,grammar,parser_mode,key,cache_dir):
+        if cache_dir and parser_mode == 'lalr':
+            os.makedirs(cache_dir,exist_ok=True)
+            cache_file = os.path.join(cache_dir,cls.CACHE_FILE_PREFIX+key+cls.CACHE_FILE_SUFFIX)
+            return Lark(grammar,parser=parser_mode,cache=cache_file)
+        return Lark(grammar,parser=parser_mode)
@@ -0,0 +1,259 @@
+import asyncio
+import inspect
+import logging
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+
+if __package__:
+    from .CommandHandler import CommandHandler
+    from .CommandHandler import AsyncCommandHandler
+    from .QueryHandler import QueryHandler
+    from .QueryHandler import AsyncQueryHandler
+else:
+    from CommandHandler import CommandHandler
+    from CommandHandler import AsyncCommandHandler
+    from QueryHandler import QueryHandler
+    from QueryHandler import AsyncQueryHandler
+
+logger = logging.getLogger(__name__)
+
+#
+# Runs overlapped commands on a pool of worker threads and keeps track of
+# the ones that haven't finished yet so that *WAI, *OPC and *OPC? can be
+# implemented.
+#
+# This also holds the standard event status register as *OPC reports
+# completion by setting the operation complete bit in it.
+#
+class PendingOperations:
+
+    OPERATION_COMPLETE = 0x01
+
+    def __init__(self,max_workers=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,thread_name_prefix="scpi-overlapped")
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.last_by_key = {}
+        self.opc_armed = False
+        self.event_status = 0
+
+    def submit(self,function,*args):
+        future = self.executor.submit(function,*args)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._operation_done)
+        return future
+
+    #
+    # Runs the operation after the last one submitted with the same key has
+    # finished so operations for one handler complete in the order they were
+    # sent. Operations with different keys still run at the same time.
+    #
+    def submit_in_order(self,key,function,*args):
+        future = Future()
+        with self.lock:
+            previous = self.last_by_key.get(key)
+            self.last_by_key[key] = future
+            self.pending.add(future)
+        future.add_done_callback(self._operation_done)
+        future.add_done_callback(lambda done: self._forget(key,done))
+        def start(previous_future=None):
+            try:
+                running = self.executor.submit(function,*args)
+            except RuntimeError as err:
+                # The executor has been shut down
+                future.set_exception(err)
+                return
+            running.add_done_callback(lambda done: self._copy_result(done,future))
+        if previous is None:
+            start()
+        else:
+            previous.add_done_callback(start)
+        return future
+
+    def is_complete(self):
+        with self.lock:
+            return not self.pending
+
+    def get_pending(self):
+        with self.lock:
+            return list(self.pending)
+
+    #
+    # Blocks until every operation submitted so far has finished
+    #
+    def wait(self):
+        for future in self.get_pending():
+            future.exception()
+
+    async def wait_async(self):
+        pending = self.get_pending()
+        if pending:
+            await asyncio.gather(*map(asyncio.wrap_future,pending),return_exceptions=True)
+
+    #
+    # Sets the operation complete bit once all pending operations are
+    # finished (straight away if there are none)
+    #
+    def arm_operation_complete(self):
+        with self.lock:
+            if self.pending:
+                self.opc_armed = True
+            else:
+                self.event_status |= self.OPERATION_COMPLETE
+
+    def set_event_status(self,bits):
+        with self.lock:
+            self.event_status |= bits
+
+    #
+    # Returns the event status register and clears it (as *ESR? does)
+    #
+    def read_event_status(self):
+        with self.lock:
+            event_status = self.event_status
+            self.event_status = 0
+            return event_status
+
+    def clear(self):
+        with self.lock:
+            self.event_status = 0
+            self.opc_armed = False
+
+    def shutdown(self,wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def _forget(self,key,future):
+        with self.lock:
+            if self.last_by_key.get(key) is future:
+                del self.last_by_key[key]
+
+    @staticmethod
+    def _copy_result(source,future):
+        if source.cancelled():
+            future.cancel()
+        elif source.exception() is not None:
+            future.set_exception(source.exception())
+        else:
+            future.set_result(source.result())
+
+    def _operation_done(self,future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Overlapped command failed",exc_info=future.exception())
+        with self.lock:
+            self.pending.discard(future)
+            if self.opc_armed and not self.pending:
+                self.opc_armed = False
+                self.event_status |= self.OPERATION_COMPLETE
+
+#
+# Wraps a command handler so its set method runs on the worker pool. The
+# command returns straight away with an empty response. The commands for one
+# handler are run one at a time in the order they were sent. If done_callback
+# is given it is called with this handler and the program header when each
+# command finishes (on the worker thread). An AsyncCommandHandler's set is
+# run to completion on the worker thread with its own event loop.
+#
+class OverlappedCommandHandler(CommandHandler):
+    def __init__(self,handler,operations,done_callback=None):
+        self.handler = handler
+        self.operations = operations
+        self.done_callback = done_callback
+        self.argument_types = getattr(handler,'argument_types',None)
+        self.required_arguments = getattr(handler,'required_arguments',None)
+        self.invalidated_queries = getattr(handler,'invalidated_queries',None)
+
+    def set(self,program_header,program_data,call_context=None):
+        if call_context != None:
+            future = self.operations.submit_in_order(id(self.handler),self._set,program_header,program_data,call_context)
+        else:
+            future = self.operations.submit_in_order(id(self.handler),self._set,program_header,program_data)
+        if self.done_callback is not None:
+            future.add_done_callback(lambda done: self.done_callback(self,program_header))
+        return ""
+
+    def _set(self,*args):
+        result = self.handler.set(*args)
+        if inspect.isawaitable(result):
+            result = asyncio.run(self._await(result))
+        return result
+
+    @staticmethod
+    async def _await(awaitable):
+        return await awaitable
+
+#
+# *WAI and *OPC? block until the pending operations have finished. As they
+# can't block the event loop process_line_async runs their async_handler
+# instead, which awaits them.
+#
+class WAIHandler(CommandHandler):
+    def __init__(self,operations):
+        self.operations = operations
+        self.async_handler = AsyncWAIHandler(operations)
+
+    def set(self,program_header,program_data,call_context=None):
+        self.operations.wait()
+        return ""
+
+class AsyncWAIHandler(AsyncCommandHandler):
+    def __init__(self,operations):
+        self.operations = operations
+
+    async def set(self,program_header,program_data,call_context=None):
+        await self.operations.wait_async()
+        return ""
+
+class OPCHandler(CommandHandler):
+    def __init__(self,operations):
+        self.operations = operations
+
+    def set(self,program_header,program_data,call_context=None):
+        self.operations.arm_operation_complete()
+        return ""
+
+class OPCQueryHandler(QueryHandler):
+    def __init__(self,operations):
+        self.operations = operations
+        self.async_handler = AsyncOPCQueryHandler(operations)
+
+    def query(self,program_header,call_context=None):
+        self.operations.wait()
+        return "1"
+
+class AsyncOPCQueryHandler(AsyncQueryHandler):
+    def __init__(self,operations):
+        self.operations = operations
+
+    async def query(self,program_header,call_context=None):
+        await self.operations.wait_async()
+        return "1"
+
+class ESRQueryHandler(QueryHandler):
+    def __init__(self,operations):
+        self.operations = operations
+
+    def query(self,program_header,call_context=None):
+        return str(self.operations.read_event_status())
+
+#
+# *CLS clears the event status register and the error queue (either of which
+# may be None)
+#
+class CLSHandler(CommandHandler):
+    def __init__(self,operations,error_queue=None):
+        self.operations = operations
+        self.error_queue = error_queue
+
+    def get_operations(self):
+        return self.operations
+    def set_operations(self,operations):
+        self.operations = operations
+
+    def set(self,program_header,program_data,call_context=None):
+        if self.operations is not None:
+            self.operations.clear()
+        if self.error_queue is not None:
+            self.error_queue.clear()
+        return ""
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+
+if __package__:
+    from .Locking import locked
+else:
+    from Locking import locked
+
+#
+# A least recently used cache of the execution plans for recently processed
+# lines (keyed on the raw line). A plan is the list of (is_query,handler,name,
+# arg) tuples for the units on the line, that is the handler found for each 
+# unit, the header name after the command scope has been applied and the
+# converted program data. Running a cached line skips parsing and the handler
+# lookups altogether.
+#
+# The cache holds handlers so it has to be cleared whenever a handler is
+# registered (the CommandInterpreter does this). Clearing the cache starts a
+# new generation. A plan built before the clear can be put with the
+# generation it was started in and is then dropped rather than cached.
+#
+# A thread_safe cache takes a lock around each operation so it can be shared
+# by threads running lines on the same interpreter.
+#
+class PlanCache:
+
+    DEFAULT_MAX_SIZE = 1024
+
+    def __init__(self,max_size=DEFAULT_MAX_SIZE,thread_safe=False):
+        if max_size < 1:
+            raise ValueError("Invalid cache size "+str(max_size))
+        self.max_size = max_size
+        self.plans = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        if thread_safe:
+            lock = threading.Lock()
+            self.get = locked(lock,self.get)
+            self.put = locked(lock,self.put)
+            self.clear = locked(lock,self.clear)
+
+    #
+    # Returns the plan for the line or None if it isn't in the cache
+    #
+    def get(self,line):
+        plan = self.plans.get(line)
+        if plan is None:
+            self.misses += 1
+            return None
+        self.plans.move_to_end(line)
+        self.hits += 1
+        return plan
+
+    def put(self,line,plan,generation=None):
+        if generation is not None and generation != self.generation:
+            return
+        self.plans[line] = plan
+        if len(self.plans) > self.max_size:
+            self.plans.popitem(last=False)
+
+    def clear(self):
+        self.plans.clear()
+        self.generation += 1
+
+    def get_generation(self):
+        return self.generation
+
+    def get_max_size(self):
+        return self.max_size
+    def get_size(self):
+        return len(self.plans)
+    def get_hits(self):
+        return self.hits
+    def get_misses(self):
+        return self.misses
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
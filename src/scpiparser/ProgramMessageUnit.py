@@ -0,0 +1,36 @@
+
+#
+# A single command or query from a program message (the parts of a line
+# separated by semicolons).
+#
+# The header is the header text as it was sent (including any leading colon
+# and the trailing question mark for queries). The program data is a list of
+# (type,value,suffix) tuples where type is the name of the grammar terminal
+# (DECIMAL_NUMERIC_PROGRAM_DATA, NON_DECIMAL_NUMERIC_DATA, STRING_PROGRAM_DATA,
+# ARBITRARY_BLOCK_PROGRAM_DATA, CHANNEL_LIST_PROGRAM_DATA or PROGRAM_MNEMONIC
+# for character data), value is the raw text (or the block payload) and
+# suffix is the raw suffix text (or None).
+#
+class ProgramMessageUnit:
+    __slots__ = ('is_query','header','program_data')
+
+    def __init__(self,is_query,header,program_data):
+        self.is_query = is_query
+        self.header = header
+        self.program_data = program_data
+
+    def get_is_query(self):
+        return self.is_query
+    def get_header(self):
+        return self.header
+    def get_program_data(self):
+        return self.program_data
+
+    def __eq__(self,other):
+        return (isinstance(other,ProgramMessageUnit)
+            and self.is_query == other.is_query
+            and self.header == other.header
+            and self.program_data == other.program_data)
+
+    def __repr__(self):
+        return "ProgramMessageUnit("+repr(self.is_query)+","+repr(self.header)+","+repr(self.program_data)+")"
@@ -1,6 +1,31 @@
 
 
 class QueryHandler():
+
+    #
+    # Queries normally ignore any arguments. Set query_argument_types (and 
+    # optionally query_required_arguments) as for CommandHandler.argument_types
+    # to have them converted and passed to query as a tuple. The handler's query
+    # method then takes (program_header,program_data,call_context=None).
+    #
+    query_argument_types = None
+    query_required_arguments = None
+
+    #
+    # Set cache_responses to have the interpreter keep the response (if it is
+    # a str or bytes) and return it for the same query until a command is run
+    # on the query's header or a header above it (see ResponseCache). Set
+    # cache_ttl to a number of seconds to also fetch it again after that long.
+    #
+    cache_responses = False
+    cache_ttl = None
+
+    #
+    # Set async_handler to an AsyncQueryHandler to have process_line_async
+    # run it in place of this handler
+    #
+    async_handler = None
+
     def __init__(self):
         pass
 
@@ -11,9 +36,29 @@ class QueryHandler():
     # The return value (as a string) is returned to the caller
     # as the response to this function
     #
+    # Any arguments to the query are ignored unless query_argument_types is
+    # set in which case they are passed as a tuple (see above)
+    #
     def query(self,program_header,call_context=None):
         pass
 
+#
+# A query handler whose query method is a coroutine. Use these with 
+# CommandInterpreter.process_line_async so that a slow query (like a 
+# hardware readback) doesn't block other work on the event loop.
+#
+class AsyncQueryHandler():
+    query_argument_types = None
+    query_required_arguments = None
+    cache_responses = False
+    cache_ttl = None
+
+    def __init__(self):
+        pass
+
+    async def query(self,program_header,call_context=None):
+        pass
+
 class IDNHandler(QueryHandler):
     def __init__(self,manufacturer,model,serial,firmware_version):
         self.result = manufacturer+","+model+","+serial+","+firmware_version
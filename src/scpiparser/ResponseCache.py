@@ -0,0 +1,208 @@
+import inspect
+import threading
+import time
+
+if __package__:
+    from .QueryHandler import QueryHandler
+    from .Locking import locked
+else:
+    from QueryHandler import QueryHandler
+    from Locking import locked
+
+#
+# Caches the responses of query handlers that opt in (see
+# QueryHandler.cache_responses) so a query whose value hasn't changed doesn't
+# go back to the hardware.
+#
+# Responses are stored under the header the query was registered with (in
+# its long form in upper case, so SOURCE:VOLTAGE for SOURce:VOLTage, see
+# HandlerMap.get_long_name) and the arguments passed to the handler.
+# invalidate(header) drops the responses for that header and everything
+# below it, so invalidating SOURCE:VOLTAGE drops SOUR:VOLT? and
+# SOUR:VOLT:PROT? but not SOUR:CURR?. The CommandInterpreter does this for
+# the header of every command it runs. A response can also be given a time to
+# live in seconds after which it is fetched again.
+#
+# Once max_size responses are cached the responses for the header cached
+# longest ago are dropped. A thread_safe cache takes a lock around each
+# operation.
+#
+# Every invalidation moves the cache to a new generation. A response read
+# before an invalidation (but put after it) is passed with the generation
+# it was read in and isn't cached, so a value that was read from the hardware
+# while a command changing it was still running isn't kept.
+#
+class ResponseCache:
+
+    DEFAULT_MAX_SIZE = 1024
+
+    def __init__(self,max_size=DEFAULT_MAX_SIZE,thread_safe=False):
+        if max_size < 1:
+            raise ValueError("Invalid cache size "+str(max_size))
+        self.max_size = max_size
+        self.responses = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.generation = 0
+        self.lock = None
+        if thread_safe:
+            self.make_thread_safe()
+
+    #
+    # Takes a lock around each operation from now on (for when responses are
+    # invalidated from other threads)
+    #
+    def make_thread_safe(self):
+        if self.lock is None:
+            self.lock = threading.Lock()
+            self.get = locked(self.lock,self.get)
+            self.put = locked(self.lock,self.put)
+            self.invalidate = locked(self.lock,self.invalidate)
+
+    def is_thread_safe(self):
+        return self.lock is not None
+
+    def get_generation(self):
+        return self.generation
+
+    #
+    # Returns the cached response or None. The arguments must be hashable.
+    #
+    def get(self,header,arguments):
+        header_responses = self.responses.get(header)
+        entry = header_responses.get(arguments) if header_responses is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+        response,expires = entry
+        if expires is not None and time.monotonic() >= expires:
+            del header_responses[arguments]
+            self.size -= 1
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return response
+
+    def put(self,header,arguments,response,ttl=None,generation=None):
+        if generation is not None and generation != self.generation:
+            return
+        header_responses = self.responses.get(header)
+        if header_responses is None or arguments not in header_responses:
+            if self.size >= self.max_size:
+                self._drop(next(iter(self.responses)))
+                header_responses = self.responses.get(header)
+            if header_responses is None:
+                header_responses = self.responses[header] = {}
+            self.size += 1
+        header_responses[arguments] = (response,None if ttl is None else time.monotonic() + ttl)
+
+    #
+    # Drops the responses for the header and the headers below it or, if
+    # header is None, all of them
+    #
+    def invalidate(self,header=None):
+        self.generation += 1
+        if not self.size:
+            return
+        if header is None:
+            self.invalidations += self.size
+            self.responses = {}
+            self.size = 0
+            return
+        prefix = header + ":"
+        for cached_header in [cached for cached in self.responses if cached == header or cached.startswith(prefix)]:
+            self.invalidations += self._drop(cached_header)
+
+    def clear(self):
+        self.invalidate()
+
+    def get_max_size(self):
+        return self.max_size
+    def get_size(self):
+        return self.size
+    def get_hits(self):
+        return self.hits
+    def get_misses(self):
+        return self.misses
+    def get_expirations(self):
+        return self.expirations
+    def get_invalidations(self):
+        return self.invalidations
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def snapshot(self):
+        return {
+            'size': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+    def _drop(self,header):
+        header_responses = self.responses.pop(header)
+        self.size -= len(header_responses)
+        return len(header_responses)
+
+
+#
+# Wraps a query handler that has cache_responses set. Only str and bytes
+# responses are cached (an array may be changed by the handler after it is
+# returned and an iterator can only be read once). The responses of async
+# handlers are cached once they have been awaited.
+#
+class CachedQueryHandler(QueryHandler):
+    def __init__(self,handler,header,cache):
+        self.handler = handler
+        self.header = header
+        self.cache = cache
+        self.query_argument_types = getattr(handler,'query_argument_types',None)
+        self.query_required_arguments = getattr(handler,'query_required_arguments',None)
+        ttl = getattr(handler,'cache_ttl',None)
+        self.ttl = ttl if isinstance(ttl,(int,float)) else None
+
+    def get_handler(self):
+        return self.handler
+
+    # So registering the same handler again isn't a duplicate
+    def __eq__(self,other):
+        if not isinstance(other,CachedQueryHandler):
+            return NotImplemented
+        return self.handler is other.handler
+
+    def __hash__(self):
+        return hash(id(self.handler))
+
+    # The arguments are the program data (if the handler takes it) and the
+    # call_context (if there is one)
+    def query(self,program_header,*arguments):
+        try:
+            hash(arguments)
+        except TypeError:
+            # Such as block data passed as a memoryview
+            return self.handler.query(program_header,*arguments)
+        response = self.cache.get(self.header,arguments)
+        if response is not None:
+            return response
+        generation = self.cache.get_generation()
+        response = self.handler.query(program_header,*arguments)
+        if inspect.isawaitable(response):
+            return self._cache_when_done(arguments,response,generation)
+        if isinstance(response,(str,bytes)):
+            self.cache.put(self.header,arguments,response,self.ttl,generation)
+        return response
+
+    async def _cache_when_done(self,arguments,awaitable,generation):
+        response = await awaitable
+        if isinstance(response,(str,bytes)):
+            self.cache.put(self.header,arguments,response,self.ttl,generation)
+        return response
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+
+if __package__:
+    from .ErrorQueue import ErrorQueue
+    from .MessageFramer import MessageFramer
+    from .MessageFramer import FramingError
+else:
+    from ErrorQueue import ErrorQueue
+    from MessageFramer import MessageFramer
+    from MessageFramer import FramingError
+
+logger = logging.getLogger(__name__)
+
+#
+# An asyncio TCP server that feeds newline terminated lines from each client
+# to a CommandInterpreter and writes the responses back (the raw socket
+# interface most instruments serve on port 5025).
+#
+# All connections share the one interpreter. If a call_context_factory is
+# given it is called with the peer address of each new connection and the
+# value it returns is passed as the call_context for every line read from
+# that connection.
+#
+# Lines are run with process_line_async so a handler that awaits (such as an
+# AsyncQueryHandler) doesn't hold up the other connections. They are passed
+# to the interpreter as the bytes read so arbitrary block data reaches the
+# handler unchanged. A line only ends at a newline outside string and block
+# data (see MessageFramer) so a block can contain newlines. The encoding is
+# used for str responses.
+#
+# Responses are written as they are produced (see iter_process_line). Small
+# chunks are collected until there are write_buffer_size bytes (or the line is
+# finished) so a line of short responses is still sent with one write.
+#
+# If a handler raises an exception the responses to the earlier units on
+# the line are still sent, the rest of the line is skipped, the exception is
+# logged and the connection is kept open. The error is pushed onto the
+# interpreter's error queue (if it has one) and the unit gets an empty
+# response, otherwise its response is "Execution error".
+#
+# Lines longer than max_line_length bytes (not counting definite length
+# block data), blocks longer than max_block_length bytes and connections that are idle for
+# more than idle_timeout seconds are closed. Once max_connections clients
+# are connected further connections are closed straight away.
+#
+class SCPIServer:
+
+    DEFAULT_PORT = 5025
+
+    READ_SIZE = 65536
+
+    def __init__(self,interpreter,host=None,port=DEFAULT_PORT,call_context_factory=None,
+            max_line_length=65536,idle_timeout=None,max_connections=None,encoding='ascii',
+            write_buffer_size=65536,max_block_length=67108864):
+        self.interpreter = interpreter
+        self.host = host
+        self.port = port
+        self.call_context_factory = call_context_factory
+        self.max_line_length = max_line_length
+        self.max_block_length = max_block_length
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.encoding = encoding
+        self.write_buffer_size = write_buffer_size
+        self.server = None
+        self.connections = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection,self.host,self.port)
+        # Pick up the real port if port 0 was given
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+
+    async def wait_closed(self):
+        if self.server is not None:
+            await self.server.wait_closed()
+        if self.connections:
+            await asyncio.gather(*self.connections.values(),return_exceptions=True)
+
+    def get_connection_count(self):
+        return len(self.connections)
+
+    async def _handle_connection(self,reader,writer):
+        if self.max_connections is not None and len(self.connections) >= self.max_connections:
+            logger.warning("Too many connections, closing connection from %s",writer.get_extra_info('peername'))
+            writer.close()
+            return
+
+        self.connections[writer] = asyncio.current_task()
+        try:
+            peer = writer.get_extra_info('peername')
+            call_context = self.call_context_factory(peer) if self.call_context_factory else None
+            framer = MessageFramer(self.max_line_length,self.max_block_length)
+            while True:
+                lines = await self._read_lines(reader,framer,peer)
+                if lines is None:
+                    break
+                for line in lines:
+                    try:
+                        await self._write_response(writer,self.interpreter.aiter_process_line(line,call_context))
+                    except ConnectionError:
+                        raise
+                    except Exception:
+                        logger.exception("Error running line from %s",peer)
+                        await self._write_error(writer)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.pop(writer,None)
+            writer.close()
+
+    async def _write_response(self,writer,chunks):
+        buffers = []
+        buffered = 0
+        try:
+            async for chunk in chunks:
+                if isinstance(chunk,str):
+                    chunk = chunk.encode(self.encoding,errors='replace')
+                buffers.append(chunk)
+                buffered += memoryview(chunk).nbytes
+                if buffered >= self.write_buffer_size:
+                    writer.writelines(buffers)
+                    await writer.drain()
+                    buffers = []
+                    buffered = 0
+        finally:
+            # The responses to the units before one that failed are still sent
+            if buffers:
+                writer.writelines(buffers)
+        await writer.drain()
+
+    async def _write_error(self,writer):
+        get_error_queue = getattr(self.interpreter,'get_error_queue',None)
+        error_queue = get_error_queue() if get_error_queue is not None else None
+        if error_queue is not None:
+            error_queue.push(ErrorQueue.EXECUTION_ERROR)
+            response = "\n"
+        else:
+            response = ErrorQueue.get_message(ErrorQueue.EXECUTION_ERROR) + "\n"
+        writer.write(response.encode(self.encoding))
+        await writer.drain()
+
+    #
+    # Returns the next lines (without the terminators) or None if the
+    # connection should be closed
+    #
+    async def _read_lines(self,reader,framer,peer):
+        while True:
+            try:
+                if self.idle_timeout is not None:
+                    data = await asyncio.wait_for(reader.read(self.READ_SIZE),self.idle_timeout)
+                else:
+                    data = await reader.read(self.READ_SIZE)
+            except asyncio.TimeoutError:
+                logger.info("Idle timeout, closing connection from %s",peer)
+                return None
+            if not data:
+                return None
+            try:
+                lines = framer.feed(data)
+            except FramingError as err:
+                logger.warning("%s, closing connection from %s",err,peer)
+                return None
+            if lines:
+                return lines
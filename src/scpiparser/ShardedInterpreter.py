@@ -0,0 +1,209 @@
+import asyncio
+import multiprocessing
+import os
+import pickle
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+#
+# Runs lines on a set of worker processes (shards), each with its own
+# CommandInterpreter built from the same InterpreterSpec, so that the work
+# can use more than one core.
+#
+#   with ShardedInterpreter(spec,processes=4) as sharded:
+#       sharded.process_line("ROUT:CLOS (@101)",call_context=1)
+#
+# Lines are sent to a shard chosen from their call_context (the client or
+# instrument channel they are for) so all the lines for one call_context go
+# to the same process, in order, and see the state left by the ones before.
+# An int call_context picks shard call_context % processes and anything else
+# is hashed from its repr (so it should have a stable repr, like a peer
+# address tuple). Pass shard_key to map call contexts to keys some other way.
+# The call_context must be picklable and is also passed on to the handlers.
+#
+# process_sharded runs the lines for many call contexts at once with each
+# shard working through its own lines in parallel with the others. Responses
+# come back as process_line returns them except that binary responses are
+# lists of bytes.
+#
+# It also has the aiter_process_line method SCPIServer uses so it can serve
+# clients directly, with a call_context_factory choosing the shard for each
+# connection:
+#
+#   server = SCPIServer(sharded,call_context_factory=lambda peer: peer)
+#
+# An exception raised by a handler is raised again by the call that sent the
+# line (as a RuntimeError if the exception itself can't be pickled).
+#
+class ShardedInterpreter:
+
+    def __init__(self,spec,processes=None,shard_key=None,start_method=None):
+        # Check up front rather than in the child (which fails silently
+        # for the fork start method)
+        pickle.dumps(spec)
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if processes < 1:
+            raise ValueError("Invalid process count "+str(processes))
+        self.shard_key = shard_key
+        self.executor = None
+        self.shards = []
+        context = multiprocessing.get_context(start_method)
+        for _ in range(processes):
+            connection,child_connection = context.Pipe()
+            process = context.Process(target=_run_shard,args=(spec,child_connection),daemon=True)
+            process.start()
+            child_connection.close()
+            self.shards.append((process,connection,threading.Lock()))
+
+    def get_shard_count(self):
+        return len(self.shards)
+
+    #
+    # Returns the index of the shard that runs lines for the call_context
+    #
+    def get_shard(self,call_context):
+        key = self.shard_key(call_context) if self.shard_key else call_context
+        if key is None:
+            return 0
+        if isinstance(key,int):
+            return key % len(self.shards)
+        return zlib.crc32(repr(key).encode('utf-8')) % len(self.shards)
+
+    def process_line(self,line,call_context=None):
+        return self.process_lines([line],call_context)[0]
+
+    def process_lines(self,lines,call_context=None):
+        shard = self.get_shard(call_context)
+        process,connection,lock = self.shards[shard]
+        with lock:
+            connection.send([(self._to_picklable(lines),call_context)])
+            return self._receive(connection)[0]
+
+    #
+    # Takes a dictionary of call_context to lists of lines and returns a
+    # dictionary of call_context to lists of responses. The shards run their
+    # lines at the same time.
+    #
+    def process_sharded(self,lines_by_context):
+        requests = {}
+        for call_context,lines in lines_by_context.items():
+            requests.setdefault(self.get_shard(call_context),[]).append((call_context,lines))
+        responses = {}
+        # Taken in order so two of these running at once can't deadlock
+        locked = []
+        try:
+            for shard in sorted(requests):
+                process,connection,lock = self.shards[shard]
+                lock.acquire()
+                locked.append(lock)
+                connection.send([(self._to_picklable(lines),call_context) for call_context,lines in requests[shard]])
+            error = None
+            for shard in sorted(requests):
+                process,connection,lock = self.shards[shard]
+                try:
+                    results = self._receive(connection)
+                except Exception as err:
+                    error = error or err
+                    continue
+                for (call_context,lines),result in zip(requests[shard],results):
+                    responses[call_context] = result
+            if error is not None:
+                raise error
+        finally:
+            for lock in locked:
+                lock.release()
+        return responses
+
+    async def process_line_async(self,line,call_context=None):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.shards))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,self.process_line,line,call_context)
+
+    async def aiter_process_line(self,line,call_context=None):
+        response = await self.process_line_async(line,call_context)
+        if isinstance(response,str):
+            yield response
+        else:
+            for buffer in response:
+                yield buffer
+
+    def close(self):
+        for process,connection,lock in self.shards:
+            with lock:
+                try:
+                    connection.send(None)
+                except (OSError,ValueError):
+                    pass
+                connection.close()
+        for process,connection,lock in self.shards:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.close()
+
+    def _to_picklable(self,lines):
+        return [bytes(line) if isinstance(line,memoryview) else line for line in lines]
+
+    def _receive(self,connection):
+        try:
+            succeeded,result = connection.recv()
+        except EOFError:
+            raise RuntimeError("Shard process has exited")
+        if not succeeded:
+            raise result
+        return result
+
+#
+# The main loop of a shard process. Each request is a list of (lines,
+# call_context) pairs and is answered with (True,list of responses) or
+# (False,exception).
+#
+def _run_shard(spec,connection):
+    interpreter = None
+    build_error = None
+    try:
+        interpreter = spec.build()
+    except Exception as err:
+        build_error = err
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        if build_error is not None:
+            _send_error(connection,build_error)
+            continue
+        try:
+            results = []
+            for lines,call_context in request:
+                results.append([_to_picklable_response(response)
+                    for response in interpreter.process_lines(lines,call_context)])
+        except Exception as err:
+            _send_error(connection,err)
+            continue
+        connection.send((True,results))
+    connection.close()
+
+def _send_error(connection,err):
+    try:
+        connection.send((False,err))
+    except Exception:
+        connection.send((False,RuntimeError(repr(err))))
+
+def _to_picklable_response(response):
+    if isinstance(response,str):
+        return response
+    return [bytes(buffer) for buffer in response]
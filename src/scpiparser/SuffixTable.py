@@ -0,0 +1,185 @@
+import re
+
+#
+# A float carrying the unit of the suffix it was sent with. The value has
+# already been scaled by the suffix multiplier so 10MHZ arrives as
+# Quantity(10000000.0,"HZ"). It can be used anywhere a float can.
+#
+class Quantity(float):
+    __slots__ = ('unit',)
+
+    def __new__(cls,value,unit):
+        quantity = float.__new__(cls,value)
+        quantity.unit = unit
+        return quantity
+
+    def __reduce__(self):
+        return (Quantity,(float(self),self.unit))
+
+    def __repr__(self):
+        return "Quantity("+float.__repr__(self)+","+repr(self.unit)+")"
+
+#
+# An argument type (see ArgumentConverter) for numeric data in a given unit.
+# Unit("HZ") accepts 10, 10HZ or 10KHZ but not 10V. The value is passed to
+# the handler as a Quantity in the unit.
+#
+class Unit:
+
+    def __init__(self,unit):
+        self.unit = unit.upper()
+
+    def __call__(self,value):
+        if isinstance(value,Quantity):
+            if value.unit != self.unit:
+                raise ValueError("Expected a value in "+self.unit)
+            return value
+        if isinstance(value,str):
+            raise ValueError("Expected a number")
+        return Quantity(value,self.unit)
+
+    def __repr__(self):
+        return "Unit("+repr(self.unit)+")"
+
+#
+# Looks up the multiplier and unit for the suffix of decimal numeric data.
+#
+# Each suffix element is an optional multiplier followed by a unit (like KHZ
+# or UV). All the multiplier and unit combinations are worked out when the
+# table is created so most suffixes are a single dictionary lookup. Compound
+# suffixes (V/S, /S or V.S-1) and those not in upper case are broken into
+# their elements once and the result is cached.
+#
+# Suffixes aren't case sensitive so M is always milli and mega is MA (1MV is
+# a millivolt and 1MAV a megavolt). As IEEE 488.2 requires, a suffix that is
+# a unit on its own is taken as the unit, so MA is milliamps rather than mega
+# with no unit, A is amps and F farads. MHZ and MOHM are the exceptions and
+# mean megahertz and megohms (there is no suffix for millihertz or milliohms).
+#
+# lookup returns (multiplier,divisor,unit) where one of multiplier and
+# divisor is 1. Scaling by dividing for the negative powers gives 1.5MV the
+# same value as 1.5E-3 (multiplying by 0.001 doesn't).
+#
+class SuffixTable:
+
+    MULTIPLIERS = {
+        'EX':18, 'PE':15, 'T':12, 'G':9, 'MA':6, 'K':3,
+        'M':-3, 'U':-6, 'N':-9, 'P':-12, 'F':-15, 'A':-18,
+    }
+
+    UNITS = ( "A", "ADU", "C", "CEL", "DB", "DBA", "DBM", "DBMV", "DBMW", "DBUA", "DBUV", "DBUW",
+        "DBV", "DBW", "DEG", "F", "FAR", "H", "HZ", "J", "K", "OHM", "PCT", "PPM", "RAD", "S", "SIE",
+        "V", "W" )
+
+    # Suffixes that are mega rather than milli
+    MEGA = { "MHZ":"HZ", "MOHM":"OHM" }
+
+    ELEMENT = re.compile(r'([A-Z]+)(-?[0-9])?$')
+
+    # The number of other suffixes (compound or not in upper case) cached
+    MAX_CACHED = 1024
+
+    def __init__(self):
+        self.units = set(self.UNITS)
+        self.suffixes = self._build_table(self.units)
+        self.cache = {}
+
+    def get_units(self):
+        return frozenset(self.units)
+
+    #
+    # Adds a unit (like DIV or PTS) to those accepted in suffixes
+    #
+    def add_unit(self,unit):
+        self.units.add(unit.upper())
+        self.suffixes = self._build_table(self.units)
+        self.cache = {}
+
+    #
+    # Returns (multiplier,divisor,unit) for the suffix or None if it isn't
+    # valid
+    #
+    def lookup(self,suffix):
+        result = self.suffixes.get(suffix)
+        if result is None:
+            result = self.cache.get(suffix)
+            if result is None:
+                result = self._parse(suffix)
+                if len(self.cache) >= self.MAX_CACHED:
+                    self.cache = {}
+                self.cache[suffix] = result
+        return result or None
+
+    #
+    # Returns the value (a float) scaled by the suffix as a Quantity
+    #
+    def scale(self,value,suffix):
+        result = self.lookup(suffix)
+        if result is None:
+            return None
+        multiplier,divisor,unit = result
+        return Quantity(value * multiplier / divisor,unit)
+
+    @classmethod
+    def _build_table(cls,units):
+        table = {}
+        for prefix,power in cls.MULTIPLIERS.items():
+            for unit in units:
+                table[prefix+unit] = cls._entry(power,unit)
+        for suffix,unit in cls.MEGA.items():
+            table[suffix] = cls._entry(6,unit)
+        for unit in units:
+            table[unit] = (1,1,unit)
+        return table
+
+    @staticmethod
+    def _entry(power,unit):
+        if power >= 0:
+            return (10 ** power,1,unit)
+        return (1,10 ** -power,unit)
+
+    #
+    # Works out a compound suffix. Returns False (so that it can be cached) if
+    # the suffix isn't valid
+    #
+    def _parse(self,suffix):
+        if suffix.startswith("."):
+            return False
+        multiplier = 1
+        divisor = 1
+        unit = []
+        position = 0
+        separator = ""
+        for part in re.split(r'([/.])',suffix.upper()):
+            if part == "/" or part == ".":
+                separator = part
+                continue
+            if not part:
+                if position != 0 or separator:
+                    return False
+                position += 1
+                continue
+            match = self.ELEMENT.match(part)
+            if not match:
+                return False
+            element = self.suffixes.get(match.group(1))
+            if element is None:
+                return False
+            exponent = int(match.group(2) or 1)
+            element_multiplier,element_divisor,element_unit = element
+            if separator == "/":
+                exponent = -exponent
+            if exponent < 0:
+                element_multiplier,element_divisor = element_divisor,element_multiplier
+            multiplier *= element_multiplier ** abs(exponent)
+            divisor *= element_divisor ** abs(exponent)
+            unit.append(separator+element_unit+(match.group(2) or ""))
+            position += 1
+            separator = ""
+        if separator or not unit:
+            return False
+        # Both are powers of ten so this leaves one of them 1
+        common = min(multiplier,divisor)
+        multiplier //= common
+        divisor //= common
+        return (multiplier,divisor,"".join(unit))
@@ -0,0 +1,326 @@
+import os
+
+import numpy
+
+if __package__:
+    from .CommandHandler import CommandHandler
+    from .QueryHandler import QueryHandler
+    from .ErrorQueue import ErrorQueue
+    from .DataFormat import DataFormatException
+else:
+    from CommandHandler import CommandHandler
+    from QueryHandler import QueryHandler
+    from ErrorQueue import ErrorQueue
+    from DataFormat import DataFormatException
+
+#
+# A fixed size ring buffer of samples (a NumPy array) for acquisition data
+# that is produced continuously and read by clients with TRACe:DATA? or
+# FETCh? (see TraceHandler).
+#
+# Samples are added with append and read with read(position) which returns
+# the samples written since position as views over the buffer (one, or two
+# if they wrap around the end) and the position to read from next. Positions
+# count every sample ever written so a reader that falls more than the size
+# of the buffer behind loses the oldest samples (counted by get_lost) rather
+# than getting samples out of order.
+#
+# If path is given the buffer is a memory mapped file so that another process
+# (an acquisition process or simulator) can write into it:
+#
+#   trace = TraceBuffer(1000000,numpy.float32,path="/dev/shm/trace")   # server
+#   trace = TraceBuffer(dtype=numpy.float32,path="/dev/shm/trace")     # writer
+#
+# The file is created if it doesn't exist, otherwise its size is taken from
+# the file and the dtype must match the one it was created with. The file
+# starts with a small header holding the size and the count of samples
+# written. There must only be one writer. It writes the samples before it
+# updates the count so a reader never sees samples that aren't there yet.
+#
+# As the samples are sent without being copied a writer that gets more than
+# the size of the buffer ahead of a response that is still being sent
+# overwrites it. Make the buffer several fetches in size.
+#
+class TraceBuffer:
+
+    DEFAULT_SIZE = 65536
+
+    MAGIC = int.from_bytes(b"SCPITRC1","little")
+    HEADER_WORDS = 8
+    HEADER_BYTES = HEADER_WORDS * 8
+
+    # The words of the header
+    SIZE = 1
+    ITEM_SIZE = 2
+    WRITTEN = 3
+    CLEARED = 4
+
+    def __init__(self,size=DEFAULT_SIZE,dtype=numpy.float32,path=None):
+        self.dtype = numpy.dtype(dtype)
+        self.path = path
+        self.lost = 0
+        if path is None:
+            self._allocate(size)
+        else:
+            self._map(path,size)
+
+    def get_size(self):
+        return len(self.samples)
+    def get_dtype(self):
+        return self.dtype
+    def get_path(self):
+        return self.path
+
+    #
+    # The number of samples ever written and the position reads start from
+    # after a clear
+    #
+    def get_written(self):
+        return int(self.header[self.WRITTEN])
+    def get_cleared(self):
+        return int(self.header[self.CLEARED])
+
+    #
+    # The number of samples overwritten before they were read
+    #
+    def get_lost(self):
+        return self.lost
+
+    #
+    # Adds samples (anything NumPy can convert to a 1 dimensional array of the
+    # buffer's dtype) to the end of the buffer
+    #
+    def append(self,samples):
+        samples = numpy.asarray(samples,dtype=self.dtype).reshape(-1)
+        size = len(self.samples)
+        written = int(self.header[self.WRITTEN])
+        count = len(samples)
+        if count > size:
+            # Only the last size samples survive
+            written += count - size
+            samples = samples[count-size:]
+        start = written % size
+        first = min(len(samples),size - start)
+        self.samples[start:start+first] = samples[:first]
+        self.samples[:len(samples)-first] = samples[first:]
+        self.header[self.WRITTEN] = written + len(samples)
+
+    #
+    # Returns the number of samples a reader at position hasn't read yet
+    #
+    def get_available(self,position):
+        written = int(self.header[self.WRITTEN])
+        return written - max(self._oldest(written),min(position,written))
+
+    #
+    # Returns (segments,position) where segments is a list of views over the
+    # samples written since position (at most max_count of them) and position
+    # is where the next read should start. Start from position 0 to read all
+    # the samples in the buffer.
+    #
+    def read(self,position,max_count=None):
+        written = int(self.header[self.WRITTEN])
+        oldest = self._oldest(written)
+        if position > written:
+            # The buffer has been resized since the last read
+            position = oldest
+        if position < oldest:
+            self.lost += max(0,written - len(self.samples) - position)
+            position = oldest
+        count = written - position
+        if max_count is not None:
+            count = max(0,min(count,max_count))
+        if not count:
+            return ([],position)
+        size = len(self.samples)
+        start = position % size
+        if start + count <= size:
+            segments = [self.samples[start:start+count]]
+        else:
+            segments = [self.samples[start:],self.samples[:start+count-size]]
+        return (segments,position + count)
+
+    #
+    # Discards the samples written so far (readers start from the next one
+    # written)
+    #
+    def clear(self):
+        self.header[self.CLEARED] = self.header[self.WRITTEN]
+
+    #
+    # Replaces the buffer with an empty one of the new size. A mapped buffer
+    # can't be resized as the other process has the file mapped.
+    #
+    def resize(self,size):
+        if self.path is not None:
+            raise ValueError("A mapped trace can't be resized")
+        self._allocate(size)
+
+    def close(self):
+        if self.path is not None:
+            self.samples.flush()
+            self.header.flush()
+
+    def _oldest(self,written):
+        return max(int(self.header[self.CLEARED]),written - len(self.samples),0)
+
+    def _allocate(self,size):
+        if size < 1:
+            raise ValueError("Invalid trace size "+str(size))
+        header = numpy.zeros(self.HEADER_WORDS,dtype=numpy.uint64)
+        header[0] = self.MAGIC
+        header[self.SIZE] = size
+        header[self.ITEM_SIZE] = self.dtype.itemsize
+        self.samples = numpy.zeros(size,dtype=self.dtype)
+        self.header = header
+
+    def _map(self,path,size):
+        if not os.path.exists(path) or os.path.getsize(path) < self.HEADER_BYTES:
+            if size < 1:
+                raise ValueError("Invalid trace size "+str(size))
+            with open(path,"wb") as trace_file:
+                trace_file.truncate(self.HEADER_BYTES + size * self.dtype.itemsize)
+            header = numpy.memmap(path,dtype=numpy.uint64,mode='r+',shape=(self.HEADER_WORDS,))
+            header[self.SIZE] = size
+            header[self.ITEM_SIZE] = self.dtype.itemsize
+            header[0] = self.MAGIC
+            header.flush()
+        else:
+            header = numpy.memmap(path,dtype=numpy.uint64,mode='r+',shape=(self.HEADER_WORDS,))
+            if int(header[0]) != self.MAGIC or int(header[self.ITEM_SIZE]) != self.dtype.itemsize:
+                raise ValueError("Invalid trace file "+path)
+            size = int(header[self.SIZE])
+        self.samples = numpy.memmap(path,dtype=self.dtype,mode='r+',offset=self.HEADER_BYTES,shape=(size,))
+        self.header = header
+
+#
+# Serves a TraceBuffer to clients:
+#
+#   TRACe[:DATA]? [<max count>]   the samples since this client's last read
+#   FETCh? [<max count>]          the same
+#   DATA:POINts?                  the number of samples waiting to be read
+#   TRACe:CLEar                   discard the samples written so far
+#   TRACe:POINts <size>           resize the buffer (not for a mapped one)
+#   TRACe:POINts?                 the size of the buffer
+#
+#   trace = TraceBuffer(1000000)
+#   TraceHandler(trace).register(interpreter)
+#
+# An invalid size is added to the interpreter's error queue (if it has one)
+# as -224 (illegal parameter value).
+#
+# Each client (call_context) has its own read position so every client gets
+# every sample. The samples are encoded with the interpreter's DataFormat
+# (see FORMat:DATA). In the REAL and INTeger formats they are sent as views
+# over the buffer without being copied when the buffer's dtype is the one
+# selected, so FORM REAL,32 with FORM:BORD SWAP (little endian) for a float32
+# buffer.
+#
+class TraceHandler:
+
+    # The most clients whose read positions are kept
+    MAX_READERS = 64
+
+    DATA_KEYS = ("TRACe","TRACe:DATA","FETCh")
+
+    def __init__(self,trace,data_format=None):
+        self.trace = trace
+        self.data_format = data_format
+        self.error_queue = None
+        self.positions = {}
+
+    def get_trace(self):
+        return self.trace
+    def get_error_queue(self):
+        return self.error_queue
+
+    def register(self,interpreter):
+        if self.data_format is None:
+            self.data_format = interpreter.get_data_format()
+        self.error_queue = interpreter.get_error_queue()
+        data_handler = TraceDataHandler(self)
+        for key in self.DATA_KEYS:
+            interpreter.register_query_handler(key,data_handler)
+        interpreter.register_query_handler("DATA:POINts",TraceAvailableHandler(self))
+        interpreter.register_command_handler("TRACe:CLEar",TraceClearHandler(self))
+        size_handler = TraceSizeHandler(self)
+        interpreter.register_command_handler("TRACe:POINts",size_handler)
+        interpreter.register_query_handler("TRACe:POINts",size_handler)
+
+    #
+    # Returns the response for the samples the client hasn't read yet
+    #
+    def fetch(self,call_context=None,max_count=None):
+        position = self.positions.pop(call_context,0)
+        segments,next_position = self.trace.read(position,max_count)
+        try:
+            response = self.data_format.encode_segments(segments)
+        except DataFormatException as err:
+            # The samples are left to be read again in another format
+            next_position -= sum(len(segment) for segment in segments)
+            if self.error_queue is not None:
+                self.error_queue.push(ErrorQueue.EXECUTION_ERROR,str(err))
+                response = ""
+            else:
+                response = str(err)
+        if len(self.positions) >= self.MAX_READERS:
+            del self.positions[next(iter(self.positions))]
+        self.positions[call_context] = next_position
+        if isinstance(response,str):
+            return response
+        # Passed on as they are rather than encoded again as an array
+        return iter(response)
+
+    def get_available(self,call_context=None):
+        return self.trace.get_available(self.positions.get(call_context,0))
+
+    def clear(self):
+        self.trace.clear()
+
+    def resize(self,size):
+        self.trace.resize(size)
+        self.positions = {}
+
+class TraceDataHandler(QueryHandler):
+    query_argument_types = (int,)
+    query_required_arguments = 0
+
+    def __init__(self,trace_handler):
+        self.trace_handler = trace_handler
+
+    def query(self,program_header,program_data,call_context=None):
+        return self.trace_handler.fetch(call_context,program_data[0] if program_data else None)
+
+class TraceAvailableHandler(QueryHandler):
+    def __init__(self,trace_handler):
+        self.trace_handler = trace_handler
+
+    def query(self,program_header,call_context=None):
+        return str(self.trace_handler.get_available(call_context))
+
+class TraceClearHandler(CommandHandler):
+    def __init__(self,trace_handler):
+        self.trace_handler = trace_handler
+
+    def set(self,program_header,program_data,call_context=None):
+        self.trace_handler.clear()
+        return ""
+
+class TraceSizeHandler(QueryHandler,CommandHandler):
+    argument_types = (int,)
+
+    def __init__(self,trace_handler):
+        self.trace_handler = trace_handler
+
+    def query(self,program_header,call_context=None):
+        return str(self.trace_handler.get_trace().get_size())
+
+    def set(self,program_header,program_data,call_context=None):
+        try:
+            self.trace_handler.resize(program_data[0])
+        except ValueError as err:
+            error_queue = self.trace_handler.get_error_queue()
+            if error_queue is None:
+                return str(err)
+            error_queue.push(ErrorQueue.ILLEGAL_PARAMETER_VALUE,str(err))
+        return ""
@@ -0,0 +1,152 @@
+import unittest
+
+from unittest.mock import Mock
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+from context import ArgumentConverter
+from context import ArgumentException
+
+class ApplyHandler(CommandHandler):
+    argument_types = (float,float,float)
+    required_arguments = 1
+
+    def set(self,program_header,program_data):
+        self.program_data = program_data
+        return ""
+
+class ListQueryHandler(QueryHandler):
+    query_argument_types = (int,...)
+    query_required_arguments = 0
+
+    def query(self,program_header,program_data,call_context=None):
+        return ",".join(str(value * 2) for value in program_data)
+
+class ArgumentConverterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.converter = ArgumentConverter()
+
+    def _data(self,arg_type,value):
+        return (getattr(ArgumentConverter,arg_type),value,None)
+
+    def test_default_conversion(self):
+        self.assertEqual(self.converter.convert(self._data('DECIMAL',"1.0 E 3")),1000.0)
+        self.assertEqual(self.converter.convert(self._data('NON_DECIMAL',"#Q17")),15)
+        self.assertEqual(self.converter.convert(self._data('STRING',"'it''s'")),"it's")
+        self.assertEqual(self.converter.convert(self._data('CHARACTER',"MAX")),"MAX")
+
+    def test_types(self):
+        cases = [
+            (float,'DECIMAL',"2",2.0),
+            (float,'NON_DECIMAL',"#HFF",255.0),
+            (int,'DECIMAL',"2.0",2),
+            (int,'NON_DECIMAL',"#B101",5),
+            (bool,'CHARACTER',"on",True),
+            (bool,'CHARACTER',"OFF",False),
+            (bool,'DECIMAL',"0.2",False),
+            (str,'STRING',"\"a\"\"b\"","a\"b"),
+            (str,'CHARACTER',"MAX","MAX"),
+            (str,'DECIMAL',"1.50","1.50"),
+            (bytes,'STRING',"'abc'",b"abc"),
+            (bytes,'BLOCK',memoryview(b"abc"),b"abc"),
+            (memoryview,'BLOCK',"abc",memoryview(b"abc")),
+            (None,'DECIMAL',"1",1.0),
+            (lambda value: value.lower(),'CHARACTER',"MAX","max"),
+        ]
+        for to_type,arg_type,value,expected in cases:
+            with self.subTest(to_type=to_type,value=value):
+                self.assertEqual(self.converter.convert_to(self._data(arg_type,value),to_type),expected)
+
+    def test_invalid(self):
+        cases = [
+            (float,'CHARACTER',"MAX"),
+            (int,'DECIMAL',"2.5"),
+            (bool,'CHARACTER',"MAYBE"),
+            (str,'BLOCK',"abc"),
+            (bytes,'DECIMAL',"1"),
+            (int,'STRING',"'1'"),
+        ]
+        for to_type,arg_type,value in cases:
+            with self.subTest(to_type=to_type,value=value):
+                with self.assertRaises(ArgumentException):
+                    self.converter.convert_to(self._data(arg_type,value),to_type)
+
+    def test_counts(self):
+        data = [self._data('DECIMAL',"1"),self._data('DECIMAL',"2")]
+        self.assertEqual(self.converter.convert_typed(data,(float,int)),(1.0,2))
+        self.assertEqual(self.converter.convert_typed(data,(int,...)),(1,2))
+        self.assertEqual(self.converter.convert_typed(data,(float,float,float),2),(1.0,2.0))
+        self.assertRaisesRegex(ArgumentException,"Missing",self.converter.convert_typed,data,(float,float,float))
+        self.assertRaisesRegex(ArgumentException,"Too many",self.converter.convert_typed,data,(float,))
+        self.assertRaisesRegex(ArgumentException,"Too many",self.converter.convert_typed,data,())
+
+    def test_check_types(self):
+        for argument_types,required_arguments in [((),None),((float,int),1),((int,...),5),((None,str,bytes),0)]:
+            ArgumentConverter.check_types(argument_types,required_arguments)
+        for argument_types,required_arguments in [((...,),None),((...,float),None),((float,...,...),None),
+                ((float,"V"),None),((float,),2),((float,),-1),((float,),"1")]:
+            with self.subTest(argument_types=argument_types,required_arguments=required_arguments):
+                self.assertRaises(ValueError,ArgumentConverter.check_types,argument_types,required_arguments)
+
+class ArgumentsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fixture = CommandInterpreter()
+
+    def test_untyped_command(self):
+        handler = Mock()
+        handler.set.return_value = ""
+        self.fixture.register_command_handler("APPLy:SINusoid",handler)
+        self.fixture.process_line("APPL:SIN")
+        handler.set.assert_called_with("APPL:SIN",None)
+        self.fixture.process_line("APPL:SIN 1")
+        handler.set.assert_called_with("APPL:SIN",1.0)
+        self.fixture.process_line("APPL:SIN 1KHZ,2.0,'x',#H10")
+        handler.set.assert_called_with("APPL:SIN",(1000.0,2.0,"x",16))
+
+    def test_typed_command(self):
+        handler = ApplyHandler()
+        self.fixture.register_command_handler("APPLy:SINusoid",handler)
+        self.assertEqual(self.fixture.process_line("APPL:SIN 1000,2.0,#H1"),"\n")
+        self.assertEqual(handler.program_data,(1000.0,2.0,1.0))
+        self.assertEqual(self.fixture.process_line("APPL:SIN 5"),"\n")
+        self.assertEqual(handler.program_data,(5.0,))
+        self.assertEqual(self.fixture.process_line("APPL:SIN"),"Missing argument\n")
+        self.assertEqual(self.fixture.process_line("APPL:SIN MAX"),"Invalid argument MAX\n")
+        self.assertEqual(self.fixture.process_line("APPL:SIN 1,2,3,4;SIN 2"),"Too many arguments\n\n")
+        self.assertEqual(handler.program_data,(2.0,))
+
+    def test_invalid_types_rejected_when_registered(self):
+        handler = CommandHandler()
+        handler.argument_types = (...,)
+        self.assertRaises(ValueError,self.fixture.register_command_handler,"APPLy",handler)
+        query_handler = QueryHandler()
+        query_handler.query_argument_types = (int,)
+        query_handler.query_required_arguments = 2
+        self.assertRaises(ValueError,self.fixture.register_query_handler,"APPLy",query_handler)
+        self.assertEqual(self.fixture.process_line("APPL 1"),"Invalid command\n")
+
+    def test_typed_overlapped_command(self):
+        handler = ApplyHandler()
+        self.fixture.register_command_handler("APPLy:SINusoid",handler,overlapped=True)
+        self.assertEqual(self.fixture.process_line("APPL:SIN 1,2;*WAI"),"\n\n")
+        self.assertEqual(handler.program_data,(1.0,2.0))
+
+    def test_typed_query(self):
+        self.fixture.register_query_handler("LIST",ListQueryHandler())
+        self.assertEqual(self.fixture.process_line("LIST? 1,2,#H10"),"2,4,32\n")
+        self.assertEqual(self.fixture.process_line("LIST?"),"\n")
+        self.assertEqual(self.fixture.process_line("LIST? 1.5"),"Invalid argument 1.5\n")
+        self.assertEqual(self.fixture.process_line("LIST? 3","client"),"6\n")
+
+    def test_untyped_query_ignores_arguments(self):
+        handler = Mock()
+        handler.query.return_value = "1"
+        self.fixture.register_query_handler("MEASure",handler)
+        self.assertEqual(self.fixture.process_line("MEAS? 1,2"),"1\n")
+        handler.query.assert_called_with("MEAS")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+
+from context import CommandInterpreter
+from context import AsyncCommandHandler
+from context import AsyncQueryHandler
+from context import QueryHandler
+
+class SlowQueryHandler(AsyncQueryHandler):
+    def __init__(self,value,delay,calls):
+        self.value = value
+        self.delay = delay
+        self.calls = calls
+
+    async def query(self,program_header,call_context=None):
+        self.calls.append("start "+program_header)
+        await asyncio.sleep(self.delay)
+        self.calls.append("end "+program_header)
+        return self.value
+
+class RecordingCommandHandler(AsyncCommandHandler):
+    def __init__(self,calls):
+        self.calls = calls
+
+    async def set(self,program_header,program_data,call_context=None):
+        await asyncio.sleep(0)
+        self.calls.append((program_header,program_data,call_context))
+        return "Ok"
+
+class ValueQueryHandler(QueryHandler):
+    def __init__(self,value):
+        self.value = value
+
+    def query(self,program_header,call_context=None):
+        return self.value
+
+class AsyncHandlerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_async_query(self):
+        calls = []
+        fixture = CommandInterpreter()
+        fixture.register_query_handler("VOLT",SlowQueryHandler("12.4",0,calls))
+        self.assertEqual(await fixture.process_line_async("VOLT?"),"12.4\n")
+
+    async def test_async_command(self):
+        calls = []
+        fixture = CommandInterpreter()
+        fixture.register_command_handler("SOURce:VOLTage",RecordingCommandHandler(calls))
+        self.assertEqual(await fixture.process_line_async("SOUR:VOLT 5.4e-3","ctx"),"Ok\n")
+        self.assertEqual(calls,[("SOUR:VOLT",5.4e-3,"ctx")])
+
+    async def test_order_kept(self):
+        calls = []
+        fixture = CommandInterpreter()
+        fixture.register_query_handler("SOURce:VOLTage",SlowQueryHandler("1",0.02,calls))
+        fixture.register_query_handler("SOURce:CURRent",SlowQueryHandler("2",0,calls))
+        self.assertEqual(await fixture.process_line_async("SOUR:VOLT?;CURR?"),"1\n2\n")
+        self.assertEqual(calls,["start SOUR:VOLT","end SOUR:VOLT","start SOUR:CURR","end SOUR:CURR"])
+
+    async def test_mixed_sync_and_async(self):
+        calls = []
+        fixture = CommandInterpreter("TestOrg","TestModel")
+        fixture.register_query_handler("SOURce:VOLTage",SlowQueryHandler("1",0,calls))
+        fixture.register_query_handler("SOURce:CURRent",ValueQueryHandler("2"))
+        self.assertEqual(await fixture.process_line_async("SOUR:VOLT?;CURR?"),"1\n2\n")
+        self.assertEqual(await fixture.process_line_async("*IDN?"),"TestOrg,TestModel,0,0\n")
+
+    async def test_lines_run_concurrently(self):
+        calls = []
+        fixture = CommandInterpreter()
+        fixture.register_query_handler("SLOW",SlowQueryHandler("1",0.05,calls))
+        fixture.register_query_handler("FAST",SlowQueryHandler("2",0,calls))
+        slow = asyncio.ensure_future(fixture.process_line_async("SLOW?"))
+        await asyncio.sleep(0)
+        self.assertEqual(await fixture.process_line_async("FAST?"),"2\n")
+        self.assertFalse(slow.done())
+        self.assertEqual(await slow,"1\n")
+
+    async def test_syntax_error(self):
+        fixture = CommandInterpreter()
+        self.assertEqual((await fixture.process_line_async("This is crap"))[0:19],"No terminal matches")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+from unittest.mock import Mock
+
+from context import BlockScanner
+from context import BlockDataError
+from context import CommandInterpreter
+
+class BlockScannerTest(unittest.TestCase):
+
+    def test_no_blocks(self):
+        self.assertEqual(BlockScanner().extract("SOUR:VOLT #h12"),("SOUR:VOLT #h12",[]))
+
+    def test_definite_length(self):
+        text,blocks = BlockScanner().extract(b"DATA #15a;b\nc,1")
+        self.assertEqual(text,"DATA #0#,1")
+        self.assertEqual(bytes(blocks[0]),b"a;b\nc")
+
+    def test_indefinite_length(self):
+        text,blocks = BlockScanner().extract(b"DATA 1,#0abc\n\x00'\n")
+        self.assertEqual(text,"DATA 1,#0#\n")
+        self.assertEqual(bytes(blocks[0]),b"abc\n\x00'")
+
+    def test_multiple_blocks(self):
+        text,blocks = BlockScanner().extract(b"A #12ab;B #210abcdefghij,#0x")
+        self.assertEqual(text,"A #0#;B #1#,#2#")
+        self.assertEqual(list(map(bytes,blocks)),[b"ab",b"abcdefghij",b"x"])
+
+    def test_ignores_strings(self):
+        text,blocks = BlockScanner().extract(b"A '#12ab', \"#0\",#11x")
+        self.assertEqual(text,"A '#12ab', \"#0\",#0#")
+        self.assertEqual(list(map(bytes,blocks)),[b"x"])
+
+    def test_str(self):
+        self.assertEqual(BlockScanner().extract("A #13abc"),("A #0#",["abc"]))
+
+    def test_zero_copy(self):
+        data = bytearray(b"DATA #14abcd")
+        text,blocks = BlockScanner().extract(data)
+        self.assertIs(blocks[0].obj,data)
+
+    def test_invalid_length(self):
+        with self.assertRaises(BlockDataError):
+            BlockScanner().extract(b"DATA #3ab")
+
+    def test_truncated(self):
+        with self.assertRaises(BlockDataError):
+            BlockScanner().extract(b"DATA #19abc")
+
+class BlockProgramDataTest(unittest.TestCase):
+
+    def _create_fixture(self,**kwargs):
+        self.mock_handler = Mock()
+        self.mock_handler.set.return_value = "Ok"
+        fixture = CommandInterpreter(**kwargs)
+        fixture.register_command_handler("DATA",self.mock_handler)
+        return fixture
+
+    def test_bytes_block(self):
+        fixture = self._create_fixture()
+        data = b"DATA #16\x00\x01;\n\xff2\n"
+        self.assertEqual(fixture.process_line(data),"Ok\n")
+        arg = self.mock_handler.set.call_args[0][1]
+        self.assertIsInstance(arg,memoryview)
+        self.assertIs(arg.obj,data)
+        self.assertEqual(bytes(arg),b"\x00\x01;\n\xff2")
+
+    def test_indefinite_block_lark(self):
+        fixture = self._create_fixture(fast_path=False,parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        self.assertEqual(fixture.process_line(b"  DATA   #0abc\n"),"Ok\n")
+        self.assertEqual(bytes(self.mock_handler.set.call_args[0][1]),b"abc")
+
+    def test_str_block(self):
+        fixture = self._create_fixture()
+        self.assertEqual(fixture.process_line("DATA #13abc"),"Ok\n")
+        self.mock_handler.set.assert_called_with("DATA","abc")
+
+    def test_bytes_without_block(self):
+        fixture = self._create_fixture()
+        self.assertEqual(fixture.process_line(b"DATA 12.4"),"Ok\n")
+        self.mock_handler.set.assert_called_with("DATA",12.4)
+        self.assertEqual(fixture.process_line(b"   "),"\n")
+
+    def test_invalid_block(self):
+        fixture = self._create_fixture()
+        self.assertEqual(fixture.process_line(b"DATA #19abc"),"Block at position 5 is truncated\n")
+        self.mock_handler.set.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
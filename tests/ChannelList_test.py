@@ -0,0 +1,101 @@
+import unittest
+
+from unittest.mock import Mock
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import ChannelList
+from context import ChannelListException
+
+class RouteHandler(CommandHandler):
+    argument_types = (ChannelList,)
+
+    def set(self,program_header,program_data):
+        self.channels = program_data[0]
+        return ""
+
+class ChannelListTest(unittest.TestCase):
+
+    def test_parse(self):
+        channels = ChannelList.from_string("(@101:164,201:264)")
+        self.assertEqual(channels.get_ranges(),[(101,164),(201,264)])
+        self.assertEqual(channels.get_dimensions(),1)
+        self.assertEqual(ChannelList.from_string("( @ 1 : 3 , 5 )").get_ranges(),[(1,3),(5,5)])
+        self.assertEqual(len(ChannelList.from_string("(@)")),0)
+
+    def test_invalid(self):
+        for text in ["(@1:)","(@:2)","(@1:2:3)","(@1,,2)","(@1,2!3)","(@1!2:3)","(1)","(@a)"]:
+            with self.subTest(text=text):
+                with self.assertRaises(ChannelListException):
+                    ChannelList.from_string(text)
+
+    def test_one_dimension(self):
+        channels = ChannelList.from_string("(@1:4,20,7:5)")
+        self.assertEqual(list(channels),[1,2,3,4,20,7,6,5])
+        self.assertEqual(len(channels),8)
+        self.assertIn(3,channels)
+        self.assertIn(6,channels)
+        self.assertIn("20",channels)
+        self.assertNotIn(10,channels)
+        self.assertNotIn((1,1),channels)
+        self.assertEqual(str(channels),"(@1:4,20,7:5)")
+
+    def test_multiple_dimensions(self):
+        channels = ChannelList.from_string("(@1!1:2!2,3!5)")
+        self.assertEqual(channels.get_dimensions(),2)
+        self.assertEqual(list(channels),[(1,1),(1,2),(2,1),(2,2),(3,5)])
+        self.assertEqual(len(channels),5)
+        self.assertIn((2,1),channels)
+        self.assertIn("3!5",channels)
+        self.assertNotIn((3,1),channels)
+        self.assertNotIn(1,channels)
+        self.assertEqual(str(channels),"(@1!1:2!2,3!5)")
+
+    def test_large_list_is_not_expanded(self):
+        channels = ChannelList.from_string("(@1:100000000,200000000)")
+        self.assertEqual(len(channels),100000001)
+        self.assertIn(99999999,channels)
+        self.assertEqual(len(channels.get_ranges()),2)
+        channels = ChannelList.from_string("(@1!1!1:1000!1000!1000)")
+        self.assertEqual(len(channels),1000000000)
+        self.assertIn((500,1,1000),channels)
+        self.assertEqual(next(iter(channels)),(1,1,1))
+
+    def test_equality(self):
+        self.assertEqual(ChannelList.from_string("(@1:3)"),ChannelList([(1,3)]))
+        self.assertNotEqual(ChannelList.from_string("(@1:3)"),ChannelList([(3,1)]))
+        self.assertEqual(hash(ChannelList([(1,3)])),hash(ChannelList([(1,3)])))
+
+class ChannelListArgumentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fixture = CommandInterpreter()
+
+    def test_untyped_handler(self):
+        handler = Mock()
+        handler.set.return_value = ""
+        self.fixture.register_command_handler("ROUTe:CLOSe",handler)
+        self.assertEqual(self.fixture.process_line("ROUT:CLOS (@101:164,201:264)"),"\n")
+        handler.set.assert_called_with("ROUT:CLOS",ChannelList([(101,164),(201,264)]))
+        self.assertEqual(self.fixture.process_line("ROUT:CLOS (@1:)"),"Invalid channel list\n")
+
+    def test_typed_handler(self):
+        handler = RouteHandler()
+        self.fixture.register_command_handler("ROUTe:CLOSe",handler)
+        self.assertEqual(self.fixture.process_line("ROUT:CLOS (@1!1:2!2)"),"\n")
+        self.assertEqual(len(handler.channels),4)
+        self.assertEqual(self.fixture.process_line("ROUT:CLOS 5"),"Invalid argument 5\n")
+
+    def test_parser_modes(self):
+        for parser_mode in CommandInterpreter.PARSER_MODES:
+            for fast_path in (True,False):
+                with self.subTest(parser_mode=parser_mode,fast_path=fast_path):
+                    fixture = CommandInterpreter(parser_mode=parser_mode,fast_path=fast_path)
+                    handler = RouteHandler()
+                    fixture.register_command_handler("ROUTe:CLOSe",handler)
+                    self.assertEqual(fixture.process_line("ROUT:CLOS ( @ 1:3 , 5 );CLOS (@7)"),"\n\n")
+                    self.assertEqual(list(handler.channels),[7])
+                    self.assertNotEqual(fixture.process_line("ROUT:CLOS (@1:3"),"\n")
+
+if __name__ == '__main__':
+    unittest.main()
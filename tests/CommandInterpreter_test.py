@@ -7,29 +7,34 @@ from unittest.mock import mock_open, Mock, MagicMock
 
 class CommandInterpreterTest(unittest.TestCase):
 
+    PARSER_MODE = CommandInterpreter.PARSER_MODE_EARLEY
+
+    def _create_fixture(self,*args):
+        return CommandInterpreter(*args,parser_mode=self.PARSER_MODE)
+
     def test_idn_defaults(self):
-        fixture = CommandInterpreter("TestOrg","TestModel")
+        fixture = self._create_fixture("TestOrg","TestModel")
         self.assertEqual(fixture.process_line("*IDN?"),"TestOrg,TestModel,0,0\n")
 
     def test_idn(self):
-        fixture = CommandInterpreter("TestOrg","TestModel","12.0","1.0")
+        fixture = self._create_fixture("TestOrg","TestModel","12.0","1.0")
         self.assertEqual(fixture.process_line("*IDN?"),"TestOrg,TestModel,12.0,1.0\n")
 
     def test_no_query_handler(self):
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         self.assertEqual(fixture.process_line("something?"),"Invalid query\n")
 
     def test_syntax_error(self):
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         self.assertEqual(fixture.process_line("This is crap")[0:19],"No terminal matches")
 
     def test_empty(self):
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         self.assertEqual(fixture.process_line("\t\t\t  "),"\n")
 
     def test_user_query_handler(self):
         mock_handler = Mock()
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         mock_handler.query.return_value = "12.4"
         fixture.register_query_handler("VOLT",mock_handler)
         self.assertEqual(fixture.process_line("VOLT?"),"12.4\n")
@@ -38,7 +43,7 @@ class CommandInterpreterTest(unittest.TestCase):
     def test_user_query_handler_with_call_context(self):
         mock_handler = Mock()
         mock_call_context = "Something"
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         mock_handler.query.return_value = "12.4"
         fixture.register_query_handler("VOLT",mock_handler)
         self.assertEqual(fixture.process_line("VOLT?",mock_call_context),"12.4\n")
@@ -46,7 +51,7 @@ class CommandInterpreterTest(unittest.TestCase):
 
     def test_compound_user_query_handler(self):
         mock_handler = Mock()
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         mock_handler.query.return_value = "12.4"
         fixture.register_query_handler("VOLT:MEASURE",mock_handler)
         self.assertEqual(fixture.process_line("VOLT:MEASURE?"),"12.4\n")
@@ -82,7 +87,7 @@ class CommandInterpreterTest(unittest.TestCase):
     def test_user_set_handler_with_context(self):
         mock_handler = Mock()
         mock_call_context = "sdfsdf"
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         mock_handler.set.return_value = "Ok"
         fixture.register_command_handler("SOMFUNC",mock_handler)
         self.assertEqual(fixture.process_line("SOMFUNC 12.4",mock_call_context),"Ok\n")
@@ -90,24 +95,25 @@ class CommandInterpreterTest(unittest.TestCase):
 
     def _test_user_set_handler(self,string_value,expected_value):
         mock_handler = Mock()
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         mock_handler.set.return_value = "Ok"
         fixture.register_command_handler("SOMFUNC",mock_handler)
         self.assertEqual(fixture.process_line("SOMFUNC "+string_value),"Ok\n")
         mock_handler.set.assert_called_with("SOMFUNC",expected_value)
 
-    # def test_user_set_handler_with_suffix(self):
-    #     mock_handler = Mock()
-    #     fixture = CommandInterpreter()
-    #     mock_handler.set.return_value = "Ok"
-    #     fixture.register_command_handler("SOMFUNC",mock_handler)
-    #     self.assertEqual(fixture.process_line("SOMFUNC 12.4MHz"),"Ok\n")
-    #     mock_handler.set.assert_called_with("SOMFUNC",12.4)
+    def test_user_set_handler_with_suffix(self):
+        mock_handler = Mock()
+        fixture = self._create_fixture()
+        mock_handler.set.return_value = "Ok"
+        fixture.register_command_handler("SOMFUNC",mock_handler)
+        self.assertEqual(fixture.process_line("SOMFUNC 12.4MHz"),"Ok\n")
+        mock_handler.set.assert_called_with("SOMFUNC",12.4e6)
+        self.assertEqual(mock_handler.set.call_args[0][1].unit,"HZ")
 
     def test_multiple_commands(self):
         mock_handler1 = Mock()
         mock_handler2 = Mock()
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         mock_handler1.set.return_value = "Ok"
         mock_handler2.set.return_value = "Ok"
         fixture.register_command_handler("SOMFUNC",mock_handler1)
@@ -119,7 +125,7 @@ class CommandInterpreterTest(unittest.TestCase):
     def test_multiple_queries_with_context(self):
         mock_handler1 = Mock()
         mock_handler2 = Mock()
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         mock_handler1.query.return_value = "10.0"
         mock_handler2.query.return_value = "12.0"
         fixture.register_query_handler("SOURCE:VOLTAGE",mock_handler1)
@@ -131,7 +137,7 @@ class CommandInterpreterTest(unittest.TestCase):
     def test_multiple_commands_with_context(self):
         mock_handler1 = Mock()
         mock_handler2 = Mock()
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         mock_handler1.set.return_value = "Ok"
         mock_handler2.set.return_value = "Ok"
         fixture.register_command_handler("SOURCE:VOLTAGE",mock_handler1)
@@ -140,10 +146,26 @@ class CommandInterpreterTest(unittest.TestCase):
         mock_handler1.set.assert_called_with("SOURCE:VOLTAGE",12.4)
         mock_handler2.set.assert_called_with("SOURCE:CURRENT",10.0)
 
+    def test_common_query_after_compound(self):
+        mock_handler = Mock()
+        fixture = self._create_fixture("TestOrg","TestModel")
+        mock_handler.query.return_value = "12.4"
+        fixture.register_query_handler("SOURce:VOLTage",mock_handler)
+        self.assertEqual(fixture.process_line("SOUR:VOLT?; *IDN?"),"12.4\nTestOrg,TestModel,0,0\n")
+
+    def test_frozen(self):
+        mock_handler = Mock()
+        fixture = self._create_fixture()
+        mock_handler.query.return_value = "12.4"
+        fixture.register_query_handler("SOURce:VOLTage",mock_handler)
+        fixture.freeze()
+        self.assertEqual(fixture.process_line("SOUR:VOLT?"),"12.4\n")
+        mock_handler.query.assert_called_with("SOUR:VOLT")
+
     def test_multiple_commands_with_context_override(self):
         mock_handler1 = Mock()
         mock_handler2 = Mock()
-        fixture = CommandInterpreter()
+        fixture = self._create_fixture()
         mock_handler1.set.return_value = "Ok"
         mock_handler2.set.return_value = "Ok"
         fixture.register_command_handler("SOURCE:VOLTAGE",mock_handler1)
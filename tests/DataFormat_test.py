@@ -0,0 +1,116 @@
+import unittest
+
+import numpy
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+from context import DataFormat
+from context import DataFormatException
+
+class ArrayHandler(QueryHandler):
+    def __init__(self,values):
+        self.values = values
+    def query(self,program_header):
+        return self.values
+
+class DataFormatTest(unittest.TestCase):
+
+    def test_ascii(self):
+        self.assertEqual(DataFormat().encode(numpy.array([1,2,3])),"1,2,3")
+        self.assertEqual(DataFormat().encode(numpy.array([1.5,-2.0])),"1.5,-2.0")
+
+    def test_real(self):
+        values = numpy.array([1.5,-2.0,3.25])
+        for length,byte_order,dtype in [(32,'NORM','>f4'),(64,'NORM','>f8'),(32,'SWAP','<f4'),(64,'SWAPPED','<f8')]:
+            header,data = DataFormat('REAL',length,byte_order).encode(values)
+            expected = values.astype(dtype).tobytes()
+            self.assertEqual(header,("#"+str(len(str(len(expected))))+str(len(expected))).encode())
+            self.assertEqual(bytes(data),expected)
+
+    def test_integer(self):
+        values = numpy.array([1.4,-2.6,300])
+        for length,byte_order,dtype in [(16,'NORM','>i2'),(32,'NORM','>i4'),(16,'SWAP','<i2'),(32,'SWAP','<i4')]:
+            header,data = DataFormat('INTeger',length,byte_order).encode(values)
+            self.assertEqual(numpy.frombuffer(data,dtype).tolist(),[1,-3,300])
+
+    def test_integer_out_of_range(self):
+        data_format = DataFormat('INT',16)
+        for values in [numpy.array([40000]),numpy.array([40000.0]),numpy.array([-32769]),numpy.array([numpy.nan]),
+                numpy.array([1,2**40],dtype=numpy.uint64)]:
+            with self.subTest(values=values):
+                self.assertRaises(DataFormatException,data_format.encode,values)
+                self.assertRaises(DataFormatException,data_format.encode_segments,[values])
+        header,data = data_format.encode(numpy.array([32767.4,-32768]))
+        self.assertEqual(numpy.frombuffer(data,'>i2').tolist(),[32767,-32768])
+        header,data = DataFormat('INT',32).encode(numpy.array([40000]))
+        self.assertEqual(numpy.frombuffer(data,'>i4').tolist(),[40000])
+
+    def test_bytes(self):
+        self.assertEqual(DataFormat().encode(b"abc"),[b"#13",memoryview(b"abc")])
+        header,data = DataFormat().encode(bytes(12345))
+        self.assertEqual(header,b"#512345")
+
+    def test_segments(self):
+        values = numpy.arange(5,dtype='<f4')
+        segments = [values[3:],values[:2]]
+        self.assertEqual(DataFormat().encode_segments(segments),"3.0,4.0,0.0,1.0")
+        self.assertEqual(DataFormat().encode_segments([]),"")
+        parts = DataFormat('REAL',32,'SWAP').encode_segments(segments)
+        self.assertEqual(parts[0],b"#216")
+        self.assertEqual(b"".join(map(bytes,parts[1:])),values[[3,4,0,1]].tobytes())
+        # Already in the right format so not copied
+        self.assertTrue(numpy.shares_memory(numpy.frombuffer(parts[1],numpy.uint8),values))
+        parts = DataFormat('INT',16).encode_segments(segments)
+        self.assertEqual(numpy.frombuffer(b"".join(map(bytes,parts[1:])),'>i2').tolist(),[3,4,0,1])
+
+    def test_invalid(self):
+        self.assertRaises(DataFormatException,DataFormat,'REAL',16)
+        self.assertRaises(DataFormatException,DataFormat,'FOO')
+        self.assertRaises(DataFormatException,DataFormat().set_byte_order,'SW')
+
+    def test_format_commands(self):
+        ci = CommandInterpreter()
+        ci.get_data_format()
+        self.assertEqual(ci.process_line("FORM:DATA?"),"ASC\n")
+        self.assertEqual(ci.process_line("FORM REAL;FORM:DATA?;FORM:BORD?"),"\nREAL,32\nNORM\n")
+        self.assertEqual(ci.process_line("FORM:BORD SWAPped;:FORM:BORD?"),"\nSWAP\n")
+        self.assertEqual(ci.process_line("FORM:DATA INTeger;DATA?"),"\nINT,16\n")
+        self.assertEqual(ci.process_line("FORM:DATA BIN"),"Invalid value BIN\n")
+        self.assertEqual(ci.process_line("FORM REAL,64;FORM?"),"\nREAL,64\n")
+        self.assertEqual(ci.process_line("FORM INT,64"),"Invalid length 64 for format INT\n")
+        self.assertEqual(ci.process_line("FORM REAL,32,1"),"Too many arguments\n")
+
+    def test_out_of_range_is_execution_error(self):
+        ci = CommandInterpreter(error_queue_size=4)
+        ci.get_data_format().set_format('INT',16)
+        ci.register_query_handler("VALue",ArrayHandler(numpy.array([40000])))
+        self.assertEqual(ci.process_line("VAL?;:SYST:ERR?"),'\n-200,"Execution error"\n')
+
+    def test_non_array_results(self):
+        ci = CommandInterpreter()
+        ci.get_data_format().set_format('REAL',32)
+        ci.register_command_handler("NOTHing",CommandHandler())
+        ci.register_query_handler("VALue",ArrayHandler(1.5))
+        self.assertEqual(ci.process_line("NOTH 1"),"\n")
+        self.assertEqual(ci.process_line("VAL?"),"1.5\n")
+        self.assertTrue(DataFormat.is_array(numpy.zeros(2)))
+        self.assertTrue(DataFormat.is_array(bytearray(2)))
+        self.assertFalse(DataFormat.is_array(None))
+        self.assertFalse(DataFormat.is_array(1.5))
+
+    def test_block_response(self):
+        ci = CommandInterpreter()
+        values = numpy.arange(4,dtype=numpy.float64)
+        ci.register_query_handler("TRACe:DATA",ArrayHandler(values))
+        self.assertEqual(ci.process_line("TRAC:DATA?"),"0.0,1.0,2.0,3.0\n")
+
+        ci.get_data_format().set_format('REAL',64)
+        response = ci.process_line("*IDN?;TRAC:DATA?;TRAC:DATA?")
+        self.assertIsInstance(response,list)
+        self.assertEqual(b"".join(response),
+            ci.process_line("*IDN?").encode()+b"#232"+values.astype('>f8').tobytes()+b"\n#232"+values.astype('>f8').tobytes()+b"\n")
+        self.assertTrue(any(isinstance(part,memoryview) for part in response))
+
+if __name__ == '__main__':
+    unittest.main()
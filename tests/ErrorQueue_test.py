@@ -0,0 +1,232 @@
+import threading
+import unittest
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+from context import IncrementalParser
+from context import ErrorQueue
+from context import TraceBuffer
+from context import TraceHandler
+
+class ErrorQueueTest(unittest.TestCase):
+
+    def test_empty(self):
+        queue = ErrorQueue(4)
+        self.assertEqual(queue.pop(),(0,"No error"))
+        self.assertEqual(queue.pop_response(),'0,"No error"')
+        self.assertEqual(queue.get_count(),0)
+
+    def test_oldest_first(self):
+        queue = ErrorQueue(4)
+        queue.push(ErrorQueue.UNDEFINED_HEADER)
+        queue.push(ErrorQueue.SYNTAX_ERROR)
+        self.assertEqual(queue.get_count(),2)
+        self.assertEqual(queue.pop_response(),'-113,"Undefined header"')
+        self.assertEqual(queue.pop_response(),'-102,"Syntax error"')
+        self.assertEqual(queue.pop_response(),'0,"No error"')
+
+    def test_overflow_replaces_most_recent(self):
+        queue = ErrorQueue(3)
+        self.assertTrue(queue.push(-101))
+        self.assertTrue(queue.push(-102))
+        self.assertTrue(queue.push(-103))
+        self.assertFalse(queue.push(-104))
+        self.assertFalse(queue.push(-108))
+        self.assertEqual(queue.get_count(),3)
+        self.assertEqual([queue.pop()[0] for _ in range(4)],[-101,-102,-350,0])
+        self.assertEqual(queue.get_reported(),5)
+        self.assertEqual(queue.get_discarded(),2)
+
+    def test_room_after_overflow(self):
+        queue = ErrorQueue(2)
+        for code in [-101,-102,-103]:
+            queue.push(code)
+        queue.pop()
+        queue.push(-104)
+        # Wraps around the end of the buffer
+        self.assertEqual([queue.pop()[0] for _ in range(3)],[-350,-104,0])
+
+    def test_messages(self):
+        queue = ErrorQueue(4)
+        queue.push(-114)
+        queue.push(-221)
+        queue.push(201,'Lid "open"')
+        queue.push(202)
+        self.assertEqual(queue.pop_response(),'-114,"Command error"')
+        self.assertEqual(queue.pop_response(),'-221,"Execution error"')
+        self.assertEqual(queue.pop_response(),'201,"Lid ""open"""')
+        self.assertEqual(queue.pop_response(),'202,"Device-specific error"')
+
+    def test_event_status_bits(self):
+        self.assertEqual(ErrorQueue.get_event_status_bit(-113),ErrorQueue.COMMAND_ERROR_BIT)
+        self.assertEqual(ErrorQueue.get_event_status_bit(-224),ErrorQueue.EXECUTION_ERROR_BIT)
+        self.assertEqual(ErrorQueue.get_event_status_bit(-350),ErrorQueue.DEVICE_ERROR_BIT)
+        self.assertEqual(ErrorQueue.get_event_status_bit(-410),ErrorQueue.QUERY_ERROR_BIT)
+        self.assertEqual(ErrorQueue.get_event_status_bit(201),ErrorQueue.DEVICE_ERROR_BIT)
+
+    def test_clear(self):
+        queue = ErrorQueue(2)
+        queue.push(-101)
+        queue.clear()
+        self.assertEqual(queue.get_count(),0)
+        self.assertEqual(queue.pop()[0],0)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            ErrorQueue(0)
+
+    def test_thread_safe(self):
+        queue = ErrorQueue(1000,thread_safe=True)
+        def push():
+            for _ in range(200):
+                queue.push(-102)
+        threads = [threading.Thread(target=push) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(queue.get_count(),800)
+
+    def test_thread_safe_keyword_arguments(self):
+        queue = ErrorQueue(thread_safe=True)
+        queue.push(201,message="Interlock open")
+        self.assertEqual(queue.pop(),(201,"Interlock open"))
+
+class ValueHandler(QueryHandler,CommandHandler):
+    argument_types = (float,)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self,program_header,program_data):
+        self.value = program_data[0]
+        return ""
+
+    def query(self,program_header):
+        return str(self.value)
+
+class QueuedErrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fixture = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,error_queue_size=4)
+        self.handler = ValueHandler()
+        self.fixture.register_command_handler("SOURce:VOLTage",self.handler)
+        self.fixture.register_query_handler("SOURce:VOLTage",self.handler)
+
+    def errors(self):
+        errors = []
+        while True:
+            response = self.fixture.process_line("SYST:ERR?")
+            if response == '0,"No error"\n':
+                return errors
+            errors.append(response[:-1])
+
+    def test_undefined_header(self):
+        self.assertEqual(self.fixture.process_line("SOUR:CURR 1"),"\n")
+        self.assertEqual(self.fixture.process_line("SOUR:CURR?"),"\n")
+        self.assertEqual(self.fixture.process_line("SYST:ERR:COUN?"),"2\n")
+        self.assertEqual(self.errors(),['-113,"Undefined header"','-113,"Undefined header"'])
+        self.assertEqual(self.fixture.process_line("SYSTem:ERRor:COUNt?"),"0\n")
+
+    def test_syntax_error(self):
+        self.assertEqual(self.fixture.process_line("SOUR:VOLT 1,,2"),"\n")
+        self.assertEqual(self.fixture.process_line("\x01\x02\xff"),"\n")
+        self.assertEqual(self.errors(),['-102,"Syntax error"','-101,"Invalid character"'])
+
+    def test_invalid_character_in_string_is_parsed(self):
+        self.fixture.process_line("SOUR:VOLT 'caf\xe9',,")
+        self.assertEqual(self.errors(),['-102,"Syntax error"'])
+
+    def test_block_data_error(self):
+        self.fixture.process_line("SOUR:VOLT #210abc")
+        self.assertEqual(self.errors(),['-160,"Block data error"'])
+
+    def test_argument_errors(self):
+        for line in ["SOUR:VOLT","SOUR:VOLT 1,2","SOUR:VOLT 1XYZ","SOUR:VOLT ABC"]:
+            self.assertEqual(self.fixture.process_line(line),"\n")
+        self.assertEqual([error.split(",")[0] for error in self.errors()],["-109","-108","-131","-104"])
+
+    def test_other_units_still_run(self):
+        self.assertEqual(self.fixture.process_line("SOUR:VOLT 2;CURR?;VOLT?"),"\n\n2.0\n")
+        self.assertEqual(self.errors(),['-113,"Undefined header"'])
+
+    def test_overflow(self):
+        for _ in range(10):
+            self.fixture.process_line("NOPE")
+        self.assertEqual(self.fixture.process_line("SYST:ERR:COUN?"),"4\n")
+        self.assertEqual(self.errors()[-1],'-350,"Queue overflow"')
+
+    def test_cls_clears_queue(self):
+        self.fixture.process_line("NOPE")
+        self.assertEqual(self.fixture.process_line("*CLS;SYST:ERR:COUN?"),"\n0\n")
+
+    def test_cls_clears_event_status(self):
+        self.fixture.register_command_handler("SOURce:SWEep",self.handler,overlapped=True)
+        try:
+            self.assertEqual(self.fixture.process_line("NOPE;*ESR?"),"\n32\n")
+            self.fixture.process_line("NOPE;SOUR:VOLT ABC")
+            self.assertEqual(self.fixture.process_line("*CLS;*ESR?;SYST:ERR?"),'\n0\n0,"No error"\n')
+        finally:
+            self.fixture.get_pending_operations().shutdown()
+
+    def test_reported_each_time_from_plan_cache(self):
+        fixture = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,error_queue_size=4,plan_cache_size=16)
+        metrics = fixture.enable_metrics()
+        for _ in range(3):
+            self.assertEqual(fixture.process_line("This is crap"),"\n")
+        self.assertEqual(fixture.get_error_queue().get_count(),3)
+        self.assertEqual(metrics.get_parse_errors(),3)
+
+    def test_bad_lines_keep_good_plans(self):
+        fixture = CommandInterpreter(error_queue_size=4,plan_cache_size=16)
+        fixture.register_query_handler("SOURce:VOLTage",self.handler)
+        fixture.process_line("SOUR:VOLT?")
+        for i in range(100):
+            fixture.process_line("SOUR:VOLT 1,,"+str(i))
+        cache = fixture.get_plan_cache()
+        cache.reset_stats()
+        fixture.process_line("SOUR:VOLT?")
+        self.assertEqual(cache.get_hits(),1)
+
+    def test_incremental_parser(self):
+        parser = IncrementalParser(self.fixture)
+        self.assertEqual(parser.feed(b"SOUR:VOLT 1,,2;VOLT?\n"),"\n")
+        self.assertEqual(self.errors(),['-102,"Syntax error"'])
+
+    def test_empty_unit(self):
+        parser = IncrementalParser(self.fixture)
+        self.assertEqual(parser.feed(b";*IDN?\n"),"\n")
+        self.assertEqual(self.errors(),['-102,"Syntax error"'])
+
+    def test_data_format_errors(self):
+        self.fixture.get_data_format()
+        self.assertEqual(self.fixture.process_line("FORM REAL,8;:FORM:BORD UP"),"\n\n")
+        self.assertEqual(self.errors(),['-224,"Invalid length 8 for format REAL"','-224,"Invalid value UP"'])
+        self.assertEqual(self.fixture.process_line("FORM?"),"ASC\n")
+
+    def test_handler_errors_set_event_status(self):
+        self.fixture.register_command_handler("SOURce:SWEep",self.handler,overlapped=True)
+        try:
+            self.fixture.get_data_format()
+            self.assertEqual(self.fixture.process_line("FORM REAL,8;*ESR?"),"\n16\n")
+        finally:
+            self.fixture.get_pending_operations().shutdown()
+
+    def test_trace_size_error(self):
+        TraceHandler(TraceBuffer(16)).register(self.fixture)
+        self.assertEqual(self.fixture.process_line("TRAC:POIN 0"),"\n")
+        self.assertEqual(self.errors(),['-224,"Invalid trace size 0"'])
+
+    def test_handler_errors(self):
+        self.fixture.get_error_queue().push(201,"Interlock open")
+        self.assertEqual(self.errors(),['201,"Interlock open"'])
+
+    def test_messages_without_queue(self):
+        fixture = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        self.assertIsNone(fixture.get_error_queue())
+        self.assertEqual(fixture.process_line("NOPE"),"Invalid command\n")
+        self.assertTrue(fixture.process_line("This is crap").startswith("Unexpected"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import random
+import unittest
+
+from lark.exceptions import UnexpectedInput
+
+from context import CommandInterpreter
+from context import FastParser
+from context import ProgramMessageUnit
+
+class FastParserTest(unittest.TestCase):
+
+    def test_simple_query(self):
+        self.assertEqual(FastParser().parse("MEAS:CURR?"),[ProgramMessageUnit(True,"MEAS:CURR?",[])])
+
+    def test_common_query(self):
+        self.assertEqual(FastParser().parse("*IDN?"),[ProgramMessageUnit(True,"*IDN?",[])])
+
+    def test_command_with_decimal(self):
+        self.assertEqual(FastParser().parse("SOUR:VOLT 5.4e-3"),
+            [ProgramMessageUnit(False,"SOUR:VOLT",[('DECIMAL_NUMERIC_PROGRAM_DATA','5.4e-3',None)])])
+
+    def test_decimal_with_suffix(self):
+        self.assertEqual(FastParser().parse("FREQ 10.0 MHz"),
+            [ProgramMessageUnit(False,"FREQ",[('DECIMAL_NUMERIC_PROGRAM_DATA','10.0','MHz')])])
+
+    def test_multiple_units_and_data(self):
+        self.assertEqual(FastParser().parse(" :OUTP ON ; VOLT #hFF,'a''b' ;*RST"),[
+            ProgramMessageUnit(False,":OUTP",[('PROGRAM_MNEMONIC','ON',None)]),
+            ProgramMessageUnit(False,"VOLT",[('NON_DECIMAL_NUMERIC_DATA','#hFF',None),('STRING_PROGRAM_DATA',"'a''b'",None)]),
+            ProgramMessageUnit(False,"*RST",[])])
+
+    def test_falls_back(self):
+        fixture = FastParser()
+        for line in ["This is crap","VOLT 1;","VOLT#h12","VOLT 'abc","VOLT 1,","VOLT:","VOLT 1 2"]:
+            with self.subTest(line=line):
+                self.assertIsNone(fixture.parse(line))
+
+#
+# Generates random (mostly valid) lines and checks the fast path gives exactly
+# the same result as Lark
+#
+class FastParserFuzzTest(unittest.TestCase):
+
+    ITERATIONS = 3000
+    MNEMONICS = ["VOLT","volt","VOLTage","SOUR","MEAS","CURR","A","x1","OUTP_2","ON"]
+    JUNK = [" ","\t","\n",";",",",":","?","*","#","'","\"","/",".","-","+","e","E","1","H","q","b","(","@","!",")"]
+
+    def setUp(self):
+        self.random = random.Random(1234)
+
+    def test_same_units_as_lark(self):
+        fast = FastParser()
+        for parser_mode in CommandInterpreter.PARSER_MODES:
+            lark_interpreter = CommandInterpreter(parser_mode=parser_mode,fast_path=False)
+            iterations = self.ITERATIONS if parser_mode == CommandInterpreter.PARSER_MODE_LALR else self.ITERATIONS//10
+            for _ in range(iterations):
+                line = self._random_line()
+                try:
+                    expected = lark_interpreter._to_units(lark_interpreter.parser.parse(line))
+                except UnexpectedInput:
+                    expected = None
+                actual = fast.parse(line)
+                if actual is not None:
+                    self.assertEqual(actual,expected,"Line "+repr(line)+" parser "+parser_mode)
+
+    def test_same_results_as_lark(self):
+        fast = self._create_fixture(True)
+        slow = self._create_fixture(False)
+        for _ in range(self.ITERATIONS):
+            line = self._random_line()
+            self.assertEqual(fast.process_line(line),slow.process_line(line),"Line "+repr(line))
+
+    def test_fast_path_used(self):
+        accepted = 0
+        fast = FastParser()
+        for _ in range(self.ITERATIONS):
+            if fast.parse(self._random_valid_line()) is not None:
+                accepted += 1
+        self.assertGreater(accepted,self.ITERATIONS*0.9)
+
+    def _create_fixture(self,fast_path):
+        fixture = CommandInterpreter("TestOrg","TestModel",parser_mode=CommandInterpreter.PARSER_MODE_LALR,fast_path=fast_path)
+        for name in ["VOLTage","SOURce:VOLTage","SOURce:CURRent","MEASure:CURRent","A","OUTP_2"]:
+            fixture.register_command_handler(name,EchoHandler())
+            fixture.register_query_handler(name,EchoHandler())
+        return fixture
+
+    def _random_line(self):
+        line = self._random_valid_line()
+        if self.random.random() < 0.3:
+            line = self._mutate(line)
+        return line
+
+    def _random_valid_line(self):
+        units = [self._random_unit() for _ in range(self.random.randint(1,3))]
+        return (self._ws() + ";").join(map(lambda unit: unit + self._ws(),units))
+
+    def _random_unit(self):
+        header = self._random_header()
+        if self.random.random() < 0.3:
+            return self._ws() + header
+        data = [self._random_data() for _ in range(self.random.randint(1,3))]
+        return self._ws() + header + self.random.choice([" ","\t","  "]) + (self._ws() + "," + self._ws()).join(data)
+
+    def _random_header(self):
+        choice = self.random.random()
+        if choice < 0.2:
+            header = "*" + self.random.choice(["IDN","RST","CLS","OPC"])
+        else:
+            parts = [self.random.choice(self.MNEMONICS) for _ in range(self.random.randint(1,3))]
+            header = ":".join(parts)
+            if self.random.random() < 0.2:
+                header = ":" + header
+        if self.random.random() < 0.4:
+            header += "?"
+        return header
+
+    def _random_data(self):
+        choice = self.random.randint(0,6)
+        if choice == 0:
+            return self.random.choice(["ON","OFF","MAX","min","Bus_1"])
+        elif choice == 1:
+            return self.random.choice(["#h1234abcd","#HFF","#b1010","#B0","#q777","#Q01"])
+        elif choice == 2:
+            return self.random.choice(["'hello'","'it''s'","\"x\"","\"a\"\"b\"","''","\"; ,\""])
+        elif choice == 3:
+            return self.random.choice(["(@1:16,20)","(@101:164,201:264)","( @ 1 ! 2 : 3!4 )","(@)","(@1:)"])
+        else:
+            number = self.random.choice(["1","-5","+2.5",".5","5.","12.4e-5","1.0 E 3","1E+3","-0.0e 2"])
+            if self.random.random() < 0.4:
+                number += self.random.choice(["","  "," \t"]) + self.random.choice(["MHz","V","mV/s","/s","A.V","S-1","E"])
+            return number
+
+    def _ws(self):
+        return self.random.choice(["",""," ","\t"," \n"])
+
+    def _mutate(self,line):
+        chars = list(line)
+        for _ in range(self.random.randint(1,3)):
+            position = self.random.randint(0,len(chars))
+            operation = self.random.randint(0,2)
+            if operation == 0:
+                chars.insert(position,self.random.choice(self.JUNK))
+            elif position < len(chars):
+                if operation == 1:
+                    del chars[position]
+                else:
+                    chars[position] = self.random.choice(self.JUNK)
+        return "".join(chars)
+
+class EchoHandler:
+    def set(self,program_header,program_data):
+        return program_header+"="+repr(program_data)
+
+    def query(self,program_header):
+        return program_header
+
+if __name__ == '__main__':
+    unittest.main()
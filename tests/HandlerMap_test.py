@@ -38,6 +38,58 @@ class HandlerMapTest(unittest.TestCase):
         self.assertEqual(fixture.find_handler("VOLT:SOU"),self.TEST_HANDLER)
         self.assertEqual(fixture.find_handler("volt:sou"),self.TEST_HANDLER)
 
+    def test_common_commands(self):
+        fixture = HandlerMap()
+        fixture.register_handler("*IDN",self.TEST_HANDLER)
+        fixture.register_handler("*OPC",self.TEST_HANDLER2)
+        self.assertEqual(fixture.find_handler("*idn"),self.TEST_HANDLER)
+        self.assertEqual(fixture.find_handler("*OPC"),self.TEST_HANDLER2)
+        self.assertIsNone(fixture.find_handler(""))
+
+    def test_frozen(self):
+        fixture = HandlerMap()
+        fixture.register_handler("VOLTage:SOUrce",self.TEST_HANDLER)
+        fixture.register_handler("VOLTage",self.TEST_HANDLER2)
+        fixture.freeze()
+        self.assertTrue(fixture.is_frozen())
+        self.assertEqual(fixture.find_handler("VOLTAGE:SOURCE"),self.TEST_HANDLER)
+        self.assertEqual(fixture.find_handler("volt:sou"),self.TEST_HANDLER)
+        self.assertEqual(fixture.find_handler("volt"),self.TEST_HANDLER2)
+        self.assertEqual(fixture.find_handler("voltage"),self.TEST_HANDLER2)
+        self.assertIsNone(fixture.find_handler("VOLT:SOURCE"))
+        self.assertIsNone(fixture.find_handler("SOURCE"))
+
+    def test_frozen_matches_tree(self):
+        fixture = HandlerMap()
+        fixture.register_handler("SOURce:VOLTage:LEVel",self.TEST_HANDLER)
+        fixture.register_handler("SOURce:CURRent",self.TEST_HANDLER2)
+        fixture.register_handler("volt",self.TEST_HANDLER2)
+        names = ["SOURCE:VOLTAGE:LEVEL","SOUR:VOLT:LEV","sour:curr","SOURCE:CURRENT","SOURCE","SOUR:VOLT","SOURCE:VOLT:LEV","VOLT","",":SOUR:CURR"]
+        expected = list(map(fixture.find_handler,names))
+        fixture.freeze()
+        self.assertEqual(list(map(fixture.find_handler,names)),expected)
+
+    def test_long_name(self):
+        fixture = HandlerMap()
+        fixture.register_handler("SOURce:VOLTage:LEVel",self.TEST_HANDLER)
+        fixture.register_handler("*RST",self.TEST_HANDLER2)
+        for name in ["SOUR:VOLT","sour:voltage","SOURce:VOLTage"]:
+            self.assertEqual(fixture.get_long_name(name),"SOURCE:VOLTAGE")
+        self.assertEqual(fixture.get_long_name("SOUR"),"SOURCE")
+        self.assertEqual(fixture.get_long_name("SOUR:CURRent"),"SOURCE:CURRENT")
+        self.assertEqual(fixture.get_long_name("*rst"),"*RST")
+
+    def test_register_after_freeze(self):
+        fixture = HandlerMap()
+        fixture.register_handler("VOLTage",self.TEST_HANDLER)
+        fixture.freeze()
+        fixture.register_handler("CURRent",self.TEST_HANDLER2)
+        self.assertFalse(fixture.is_frozen())
+        self.assertEqual(fixture.find_handler("CURR"),self.TEST_HANDLER2)
+        fixture.freeze()
+        self.assertEqual(fixture.find_handler("CURR"),self.TEST_HANDLER2)
+        self.assertEqual(fixture.find_handler("VOLT"),self.TEST_HANDLER)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from context import CommandInterpreter
+from context import IncrementalParser
+
+class EchoHandler:
+    def set(self,program_header,program_data):
+        if isinstance(program_data,memoryview):
+            program_data = bytes(program_data)
+        return program_header+"="+repr(program_data)
+    def query(self,program_header):
+        return program_header
+
+class IncrementalParserTest(unittest.TestCase):
+
+    LINES = [
+        b"*IDN?",
+        b"SOURCE:VOLTAGE 12.4",
+        b"SOURCE:VOLTAGE?; CURRENT?",
+        b"SOURCE:VOLTAGE 12.4; CURRENT 10.0;:OUTPUT:ENABLE 1;*IDN?;CURRENT?",
+        b"SOMFUNC 'a;b''\nc';SOMFUNC \"x\"\"\";SOMFUNC #h1F",
+        b"SOMFUNC #15a;\n'\";SOURCE:CURRENT #0x;y",
+        b"SOMFUNC #210abcdefghij;SOMFUNC 1.0 E 3",
+        b"  ",
+        b"",
+    ]
+
+    def setUp(self):
+        self.interpreter = CommandInterpreter("TestOrg","TestModel")
+        for key in ["SOMFUNC","SOURCE:VOLTage","SOURCE:CURRent","OUTPut:ENABle"]:
+            self.interpreter.register_command_handler(key,EchoHandler())
+            self.interpreter.register_query_handler(key,EchoHandler())
+
+    def _feed(self,chunks):
+        parser = IncrementalParser(self.interpreter)
+        responses = [parser.feed(chunk) for chunk in chunks]
+        responses.append(parser.close())
+        return "".join(responses)
+
+    def test_every_split(self):
+        for line in self.LINES:
+            expected = self.interpreter.process_line(line)
+            data = line + b"\n"
+            with self.subTest(line=line):
+                self.assertEqual(self._feed([data]),expected)
+                self.assertEqual(self._feed([data[i:i+1] for i in range(len(data))]),expected)
+                for first in range(len(data)+1):
+                    for second in range(first,len(data)+1):
+                        chunks = [data[:first],data[first:second],data[second:]]
+                        self.assertEqual(self._feed(chunks),expected)
+
+    def test_many_messages(self):
+        data = b"\n".join(self.LINES) + b"\n"
+        expected = "".join(self.interpreter.process_line(line) for line in self.LINES)
+        for size in range(1,len(data)+1):
+            with self.subTest(size=size):
+                self.assertEqual(self._feed([data[i:i+size] for i in range(0,len(data),size)]),expected)
+
+    def test_runs_units_as_they_arrive(self):
+        parser = IncrementalParser(self.interpreter)
+        self.assertEqual(parser.feed(b"SOURCE:VOLT"),"")
+        self.assertEqual(parser.feed(b"AGE 1;CURR"),"SOURCE:VOLTAGE=1.0\n")
+        self.assertEqual(parser.feed(b"ENT 2"),"")
+        self.assertEqual(parser.feed(b"\r\n"),"SOURCE:CURRENT=2.0\n")
+
+    def test_close_runs_incomplete_unit(self):
+        parser = IncrementalParser(self.interpreter)
+        self.assertEqual(parser.feed(b"*IDN?;SOMFUNC 1"),"TestOrg,TestModel,0,0\n")
+        self.assertEqual(parser.close(),"SOMFUNC=1.0\n")
+        self.assertEqual(parser.close(),"")
+
+    def test_error_discards_rest_of_message(self):
+        parser = IncrementalParser(self.interpreter)
+        response = parser.feed(b"SOMFUNC 1;SOMFUNC 1,,;SOMFUNC 2\nSOMFUNC 3\n")
+        self.assertTrue(response.startswith("SOMFUNC=1.0\n"))
+        self.assertNotIn("SOMFUNC=2.0",response)
+        self.assertTrue(response.endswith("SOMFUNC=3.0\n"))
+        self.assertEqual(parser.feed(b";*IDN?\n*IDN?;\n"),IncrementalParser.EMPTY_UNIT_ERROR+"TestOrg,TestModel,0,0\n"+IncrementalParser.EMPTY_UNIT_ERROR)
+
+    def test_truncated_block(self):
+        parser = IncrementalParser(self.interpreter)
+        self.assertEqual(parser.feed(b"SOMFUNC #15ab"),"")
+        self.assertTrue(parser.close().startswith("Block at position"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import unittest
+
+from unittest.mock import Mock
+
+from context import CommandInterpreter
+from context import InterpreterMetrics
+from context import LatencyHistogram
+
+class LatencyHistogramTest(unittest.TestCase):
+
+    def test_record(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.get_quantile_seconds(0.5))
+        for elapsed_ns in [500,1500,1500,3000000]:
+            histogram.record(elapsed_ns)
+        self.assertEqual(histogram.get_count(),4)
+        self.assertAlmostEqual(histogram.get_total_seconds(),0.0030035)
+        self.assertEqual(histogram.get_quantile_seconds(0.5),2048e-9)
+        self.assertEqual(histogram.get_quantile_seconds(1.0),(1 << 22) / 1e9)
+        buckets = histogram.get_buckets()
+        self.assertEqual(buckets[0],(1024e-9,1))
+        self.assertEqual(buckets[1],(2048e-9,3))
+        self.assertEqual(buckets[-2],((1 << 34) / 1e9,4))
+        self.assertEqual(buckets[-1],(float('inf'),4))
+
+class InterpreterMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fixture = CommandInterpreter()
+        self.handler = Mock()
+        self.handler.set.return_value = ""
+        self.handler.query.return_value = "1"
+        self.fixture.register_command_handler("SOURce:VOLTage",self.handler)
+        self.fixture.register_query_handler("SOURce:VOLTage",self.handler)
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(self.fixture.get_metrics())
+        self.fixture.process_line("SOUR:VOLT 1")
+
+    def test_stages(self):
+        metrics = self.fixture.enable_metrics()
+        self.assertIs(self.fixture.enable_metrics(),metrics)
+        self.fixture.process_line("SOUR:VOLT 1;VOLT?")
+        self.fixture.process_line("SOURCE:VOLTAGE?")
+        self.assertEqual(metrics.get_stage(InterpreterMetrics.PARSE).get_count(),2)
+        self.assertEqual(metrics.get_stage(InterpreterMetrics.LOOKUP).get_count(),3)
+        self.assertEqual(metrics.get_stage(InterpreterMetrics.CONVERSION).get_count(),1)
+        self.assertEqual(metrics.get_stage(InterpreterMetrics.HANDLER).get_count(),3)
+        self.assertEqual(metrics.get_header("SOURce:VOLTage?").get_count(),2)
+        self.assertEqual(metrics.get_header("SOURce:VOLTage").get_count(),1)
+
+    def test_errors(self):
+        metrics = self.fixture.enable_metrics()
+        self.fixture.process_line("SOUR:VOLT 1,,")
+        self.fixture.process_line("")
+        self.fixture.process_line("NOTHING 1;NOTHING?;NOTHING?")
+        self.assertEqual(metrics.get_parse_errors(),1)
+        self.assertEqual(metrics.get_invalid_commands(),1)
+        self.assertEqual(metrics.get_invalid_queries(),2)
+        metrics.reset()
+        self.assertEqual(metrics.get_invalid_queries(),0)
+
+    def test_disable(self):
+        self.fixture.enable_metrics()
+        self.fixture.disable_metrics()
+        self.assertIsNone(self.fixture.get_metrics())
+        self.assertEqual(self.fixture.process_line("SOUR:VOLT?"),"1\n")
+
+    def test_export(self):
+        metrics = self.fixture.enable_metrics()
+        list(self.fixture.process_lines(["SOUR:VOLT?","BAD?"]))
+        snapshot = json.loads(metrics.to_json())
+        self.assertEqual(snapshot['stages']['handler']['count'],1)
+        self.assertEqual(snapshot['invalid_queries'],1)
+        self.assertIn("SOURce:VOLTage?",snapshot['headers'])
+        text = metrics.to_prometheus()
+        self.assertIn('scpi_handler_duration_seconds_count{header="SOURce:VOLTage?"} 1\n',text)
+        self.assertIn('scpi_stage_duration_seconds_bucket{stage="parse",le="+Inf"} 2\n',text)
+        self.assertIn('scpi_invalid_queries_total 1\n',text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from context import MessageFramer
+from context import FramingError
+
+class MessageFramerTest(unittest.TestCase):
+
+    MESSAGES = [
+        b"*IDN?",
+        b"SOURCE:VOLTAGE?; CURRENT?",
+        b"SOMFUNC 'a;b''\nc';SOMFUNC \"x\n\"\"\"",
+        b"DATA #15a\n\r\nb",
+        b"DATA #210abcdefghi\r;*IDN?",
+        b"DATA #0x;y",
+        b"SOMFUNC #h1F",
+        b"",
+    ]
+
+    def test_every_split(self):
+        stream = b"\n".join(self.MESSAGES) + b"\n"
+        for split in range(len(stream) + 1):
+            with self.subTest(split=split):
+                framer = MessageFramer()
+                messages = framer.feed(stream[:split]) + framer.feed(stream[split:])
+                self.assertEqual(messages,self.MESSAGES)
+
+    def test_byte_at_a_time(self):
+        stream = b"\n".join(self.MESSAGES) + b"\n"
+        framer = MessageFramer()
+        messages = []
+        for i in range(len(stream)):
+            messages += framer.feed(stream[i:i+1])
+        self.assertEqual(messages,self.MESSAGES)
+
+    def test_carriage_return(self):
+        framer = MessageFramer()
+        self.assertEqual(framer.feed(b"*IDN?\r\nDATA #13ab\r\n"),[b"*IDN?",b"DATA #13ab\r"])
+
+    def test_incomplete_message_kept(self):
+        framer = MessageFramer()
+        self.assertEqual(framer.feed(b"DATA #15ab"),[])
+        self.assertEqual(framer.feed(b"\ncd\n*IDN?"),[b"DATA #15ab\ncd"])
+        self.assertEqual(framer.feed(b"\n"),[b"*IDN?"])
+
+    def test_line_too_long(self):
+        framer = MessageFramer(max_line_length=16)
+        with self.assertRaises(FramingError):
+            framer.feed(b"*IDN?" * 4)
+        framer = MessageFramer(max_line_length=16)
+        with self.assertRaises(FramingError):
+            framer.feed(b"*IDN?" * 4 + b"\n")
+
+    def test_block_data_not_counted(self):
+        framer = MessageFramer(max_line_length=16)
+        block = bytes(range(256)) * 4
+        self.assertEqual(framer.feed(b"DATA #41024" + block + b"\n"),[b"DATA #41024" + block])
+
+    def test_block_too_long(self):
+        framer = MessageFramer(max_block_length=1000)
+        with self.assertRaises(FramingError):
+            framer.feed(b"DATA #41024")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from context import CommandInterpreter
+from context import ParserCache
+
+class ParserCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        ParserCache.clear()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        ParserCache.clear()
+        shutil.rmtree(self.cache_dir)
+
+    def test_shared_between_interpreters(self):
+        first = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        second = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        self.assertIs(first.parser,second.parser)
+
+    def test_not_shared_between_modes(self):
+        lalr = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        earley = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_EARLEY)
+        self.assertIsNot(lalr.parser,earley.parser)
+
+    def test_key_depends_on_grammar(self):
+        self.assertNotEqual(
+            ParserCache.cache_key(CommandInterpreter.SCPI_GRAMMAR,"lalr"),
+            ParserCache.cache_key(CommandInterpreter.SCPI_GRAMMAR+" ","lalr"))
+
+    def test_saved_to_cache_dir(self):
+        CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,cache_dir=self.cache_dir)
+        cache_file = ParserCache.cache_file(CommandInterpreter.SCPI_GRAMMAR,"lalr",self.cache_dir)
+        self.assertTrue(os.path.exists(cache_file))
+
+    def test_loaded_from_cache_dir(self):
+        CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,cache_dir=self.cache_dir)
+        ParserCache.clear()
+        fixture = CommandInterpreter("TestOrg","TestModel",parser_mode=CommandInterpreter.PARSER_MODE_LALR,cache_dir=self.cache_dir)
+        self.assertEqual(fixture.process_line("*IDN?"),"TestOrg,TestModel,0,0\n")
+
+    def test_earley_not_saved(self):
+        fixture = CommandInterpreter("TestOrg","TestModel",cache_dir=self.cache_dir)
+        self.assertEqual(os.listdir(self.cache_dir),[])
+        self.assertEqual(fixture.process_line("*IDN?"),"TestOrg,TestModel,0,0\n")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from lark.exceptions import UnexpectedInput
+
+from context import CommandInterpreter
+from context import SAMPLE_LINES
+from context import create_echo_fixture
+
+import CommandInterpreter_test
+
+#
+# Re-runs all of the CommandInterpreter tests using the LALR parser
+#
+class CommandInterpreterLALRTest(CommandInterpreter_test.CommandInterpreterTest):
+
+    PARSER_MODE = CommandInterpreter.PARSER_MODE_LALR
+
+    def test_syntax_error(self):
+        fixture = self._create_fixture()
+        self.assertEqual(fixture.process_line("This is crap")[0:16],"Unexpected token")
+
+class ParserModeTest(unittest.TestCase):
+
+    LINES = SAMPLE_LINES
+
+    #
+    # There must be white space between the header and its data
+    #
+    MISSING_SEPARATOR_LINES = [
+        "VOLT#H12",
+        "VOLT'abc'",
+        "VOLT?5",
+        "SOUR:VOLT5.4",
+    ]
+
+    def test_same_parse_tree(self):
+        earley = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_EARLEY)
+        lalr = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        for line in self.LINES:
+            with self.subTest(line=line):
+                self.assertEqual(self._parse(earley,line),self._parse(lalr,line))
+
+    def test_same_results(self):
+        earley = self._create_fixture(CommandInterpreter.PARSER_MODE_EARLEY)
+        lalr = self._create_fixture(CommandInterpreter.PARSER_MODE_LALR)
+        for line in self.LINES:
+            with self.subTest(line=line):
+                if self._parse(earley,line) is not None:
+                    self.assertEqual(earley.process_line(line),lalr.process_line(line))
+
+    def test_missing_separator(self):
+        for parser_mode in (CommandInterpreter.PARSER_MODE_EARLEY,CommandInterpreter.PARSER_MODE_LALR):
+            fixture = CommandInterpreter(parser_mode=parser_mode)
+            for line in self.MISSING_SEPARATOR_LINES:
+                with self.subTest(parser_mode=parser_mode,line=line):
+                    self.assertIsNone(self._parse(fixture,line))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            CommandInterpreter(parser_mode="cyk")
+
+    def _create_fixture(self,parser_mode):
+        return create_echo_fixture(parser_mode)
+
+    def _parse(self,fixture,line):
+        try:
+            return fixture.parser.parse(line)
+        except UnexpectedInput:
+            return None
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import random
+import threading
+import time
+import unittest
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import AsyncCommandHandler
+
+class BlockingHandler(CommandHandler):
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.values = []
+
+    def set(self,program_header,program_data):
+        self.started.set()
+        self.release.wait(5)
+        self.values.append(program_data)
+        return "Ok"
+
+class SlowValueHandler(CommandHandler):
+    def __init__(self):
+        self.value = None
+
+    def set(self,program_header,program_data):
+        time.sleep(random.uniform(0,0.005))
+        self.value = program_data
+        return ""
+
+class AsyncValueHandler(AsyncCommandHandler):
+    def __init__(self):
+        self.value = None
+
+    async def set(self,program_header,program_data):
+        await asyncio.sleep(0.01)
+        self.value = program_data
+        return ""
+
+class PendingOperationsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fixture = CommandInterpreter("TestOrg","TestModel")
+        self.handler = BlockingHandler()
+        self.fixture.register_command_handler("SOURce:SWEep",self.handler,overlapped=True)
+
+    def tearDown(self):
+        self.handler.release.set()
+        self.fixture.get_pending_operations().shutdown()
+
+    def test_returns_straight_away(self):
+        self.assertEqual(self.fixture.process_line("SOUR:SWE 1"),"\n")
+        self.assertTrue(self.handler.started.wait(5))
+        self.assertEqual(self.handler.values,[])
+        self.assertFalse(self.fixture.get_pending_operations().is_complete())
+
+    def test_wai(self):
+        self.fixture.process_line("SOUR:SWE 1")
+        self.handler.release.set()
+        self.assertEqual(self.fixture.process_line("*WAI"),"\n")
+        self.assertEqual(self.handler.values,[1.0])
+        self.assertTrue(self.fixture.get_pending_operations().is_complete())
+
+    def test_opc_query_waits(self):
+        self.handler.release.set()
+        self.assertEqual(self.fixture.process_line("SOUR:SWE 1;*OPC?"),"\n1\n")
+        self.assertEqual(self.handler.values,[1.0])
+
+    def test_opc_sets_event_status(self):
+        self.fixture.process_line("SOUR:SWE 1;*OPC")
+        self.assertEqual(self.fixture.process_line("*ESR?"),"0\n")
+        self.handler.release.set()
+        self.fixture.process_line("*WAI")
+        self.assertEqual(self.fixture.process_line("*ESR?"),"1\n")
+        self.assertEqual(self.fixture.process_line("*ESR?"),"0\n")
+
+    def test_opc_with_nothing_pending(self):
+        self.fixture.get_pending_operations()
+        self.assertEqual(self.fixture.process_line("*OPC;*ESR?"),"\n1\n")
+
+    def test_cls(self):
+        self.assertEqual(self.fixture.process_line("*OPC;*CLS;*ESR?"),"\n\n0\n")
+
+    def test_idn_still_works(self):
+        self.assertEqual(self.fixture.process_line("*IDN?"),"TestOrg,TestModel,0,0\n")
+
+    def test_same_handler_in_order(self):
+        handler = SlowValueHandler()
+        self.fixture.register_command_handler("SOURce:VOLTage",handler,overlapped=True)
+        for _ in range(20):
+            self.assertEqual(self.fixture.process_line("SOUR:VOLT 1;VOLT 2;*WAI"),"\n\n\n")
+            self.assertEqual(handler.value,2.0)
+
+    def test_async_handler(self):
+        handler = AsyncValueHandler()
+        self.fixture.register_command_handler("SOURce:VOLTage",handler,overlapped=True)
+        self.assertEqual(self.fixture.process_line("SOUR:VOLT 3;*OPC?"),"\n1\n")
+        self.assertEqual(handler.value,3.0)
+
+    def test_existing_handlers_kept(self):
+        fixture = CommandInterpreter()
+        opc_handler = CommandHandler()
+        fixture.register_command_handler("*OPC",opc_handler)
+        fixture.register_command_handler("SWEep",BlockingHandler(),overlapped=True)
+        self.assertIs(fixture.command_handlers.find_handler("*OPC"),opc_handler)
+        fixture.get_pending_operations().shutdown(wait=False)
+
+class PendingOperationsAsyncTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_opc_query_async(self):
+        fixture = CommandInterpreter()
+        handler = BlockingHandler()
+        fixture.register_command_handler("SWEep",handler,overlapped=True)
+        fixture.process_line("SWE 2")
+        handler.release.set()
+        self.assertEqual(await fixture.process_line_async("*OPC?"),"1\n")
+        self.assertEqual(handler.values,[2.0])
+        fixture.get_pending_operations().shutdown()
+
+    async def test_opc_query_in_running_loop(self):
+        fixture = CommandInterpreter()
+        handler = BlockingHandler()
+        fixture.register_command_handler("SWEep",handler,overlapped=True)
+        fixture.process_line("SWE 3")
+        handler.release.set()
+        self.assertEqual(fixture.process_line("*WAI;*OPC?"),"\n1\n")
+        self.assertEqual(handler.values,[3.0])
+        fixture.get_pending_operations().shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from unittest.mock import Mock
+
+from context import CommandInterpreter
+from context import PlanCache
+
+import CommandInterpreter_test
+
+#
+# Re-runs all of the CommandInterpreter tests with the plan cache turned on
+#
+class CommandInterpreterPlanCacheTest(CommandInterpreter_test.CommandInterpreterTest):
+
+    def _create_fixture(self,*args):
+        return CommandInterpreter(*args,parser_mode=self.PARSER_MODE,plan_cache_size=16)
+
+class PlanCacheTest(unittest.TestCase):
+
+    def test_lru(self):
+        cache = PlanCache(2)
+        cache.put("A",(1,))
+        cache.put("B",(2,))
+        self.assertEqual(cache.get("A"),(1,))
+        cache.put("C",(3,))
+        self.assertIsNone(cache.get("B"))
+        self.assertEqual(cache.get("A"),(1,))
+        self.assertEqual(cache.get("C"),(3,))
+        self.assertEqual(cache.get_size(),2)
+        self.assertEqual((cache.get_hits(),cache.get_misses()),(3,1))
+        cache.reset_stats()
+        self.assertEqual((cache.get_hits(),cache.get_misses()),(0,0))
+
+    def test_invalid_size(self):
+        self.assertRaises(ValueError,PlanCache,0)
+
+    def test_thread_safe_keyword_arguments(self):
+        cache = PlanCache(2,thread_safe=True)
+        cache.put("A",(1,),generation=cache.get_generation())
+        self.assertEqual(cache.get(line="A"),(1,))
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(CommandInterpreter().get_plan_cache())
+
+    def test_repeated_line_is_not_parsed(self):
+        fixture = CommandInterpreter(plan_cache_size=4)
+        handler = Mock()
+        handler.set.return_value = "Ok"
+        fixture.register_command_handler("SOURce:VOLTage",handler)
+        fixture.register_command_handler("SOURce:CURRent",handler)
+        line = "SOUR:VOLT 1.5;CURR #h10"
+        self.assertEqual(fixture.process_line(line),"Ok\nOk\n")
+        fixture.parser = None
+        fixture.fast_parser = None
+        self.assertEqual(fixture.process_line(line),"Ok\nOk\n")
+        handler.set.assert_called_with("SOUR:CURR",16)
+        self.assertEqual(handler.set.call_count,4)
+        cache = fixture.get_plan_cache()
+        self.assertEqual((cache.get_hits(),cache.get_misses()),(1,1))
+
+    def test_register_clears_cache(self):
+        fixture = CommandInterpreter(plan_cache_size=4)
+        self.assertEqual(fixture.process_line("MEAS?"),"Invalid query\n")
+        handler = Mock()
+        handler.query.return_value = "1.0"
+        fixture.register_query_handler("MEASure",handler)
+        self.assertEqual(fixture.get_plan_cache().get_size(),0)
+        self.assertEqual(fixture.process_line("MEAS?"),"1.0\n")
+
+    def test_bytes_and_errors_not_cached(self):
+        fixture = CommandInterpreter(plan_cache_size=4)
+        fixture.register_command_handler("DATA",Mock())
+        fixture.process_line(b"DATA #13abc")
+        fixture.process_line("DATA 1,,")
+        fixture.process_line("")
+        self.assertEqual(fixture.get_plan_cache().get_size(),0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from unittest.mock import Mock
+
+from context import CommandInterpreter
+from context import AsyncQueryHandler
+from context import SAMPLE_LINES
+from context import create_echo_fixture
+
+class AsyncValueHandler(AsyncQueryHandler):
+    async def query(self,program_header,call_context=None):
+        return "async"
+
+class ProcessLinesTest(unittest.TestCase):
+
+    def _create_fixture(self):
+        return create_echo_fixture(CommandInterpreter.PARSER_MODE_LALR)
+
+    def test_same_as_process_line(self):
+        lines = SAMPLE_LINES * 2 + ["", "*IDN?", "SOMFUNC #13a;b", b"*IDN?;SOMFUNC 1,2"]
+        fixture = self._create_fixture()
+        expected = [fixture.process_line(line) for line in lines]
+        self.assertEqual(list(fixture.process_lines(lines)),expected)
+        self.assertEqual(list(fixture.process_lines(lines,preparse=True)),expected)
+        self.assertEqual(list(fixture.process_lines(iter(lines))),expected)
+
+    def test_errors_are_isolated(self):
+        fixture = self._create_fixture()
+        responses = list(fixture.process_lines(["SOMFUNC 1","This is crap","NOTHING 1","SOMFUNC 2"]))
+        self.assertEqual(responses[0],"SOMFUNC=1.0\n")
+        self.assertTrue(responses[1].startswith("Unexpected"))
+        self.assertEqual(responses[2:],["Invalid command\n","SOMFUNC=2.0\n"])
+
+    def test_call_context(self):
+        fixture = CommandInterpreter()
+        handler = Mock()
+        handler.query.return_value = "1"
+        fixture.register_query_handler("MEASure",handler)
+        fixture.register_query_handler("ASYNc",AsyncValueHandler())
+        self.assertEqual(list(fixture.process_lines(["MEAS?;ASYN?","MEAS?"],"client")),["1\nasync\n","1\n"])
+        handler.query.assert_called_with("MEAS","client")
+
+    def test_lazy(self):
+        fixture = CommandInterpreter()
+        handler = Mock()
+        handler.query.return_value = "1"
+        fixture.register_query_handler("MEASure",handler)
+        responses = fixture.process_lines(["MEAS?","MEAS?"])
+        self.assertEqual(handler.query.call_count,0)
+        next(responses)
+        self.assertEqual(handler.query.call_count,1)
+
+    def test_preparse_parses_each_line_once(self):
+        fixture = CommandInterpreter()
+        fixture._parse = Mock(wraps=fixture._parse)
+        self.assertEqual(list(fixture.process_lines(["*IDN?"] * 10 + ["A?"],preparse=True))[-1],"Invalid query\n")
+        self.assertEqual(fixture._parse.call_count,2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,272 @@
+import asyncio
+import threading
+import unittest
+
+from unittest.mock import patch
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+from context import AsyncQueryHandler
+from context import AsyncCommandHandler
+from context import ResponseCache
+
+#
+# Counts the reads so the tests can tell when the cache was used
+#
+class ReadbackHandler(QueryHandler,CommandHandler):
+    cache_responses = True
+
+    def __init__(self,value="1.5"):
+        self.value = value
+        self.reads = 0
+
+    def set(self,program_header,program_data):
+        self.value = str(program_data)
+        return ""
+
+    def query(self,program_header,call_context=None):
+        self.reads += 1
+        return self.value
+
+class ExpiringHandler(ReadbackHandler):
+    cache_ttl = 10
+
+class ListHandler(ReadbackHandler):
+    query_argument_types = (int,)
+
+    def query(self,program_header,program_data,call_context=None):
+        self.reads += 1
+        return ",".join([self.value] * program_data[0])
+
+class AsyncReadbackHandler(AsyncQueryHandler):
+    cache_responses = True
+
+    def __init__(self):
+        self.reads = 0
+
+    async def query(self,program_header,call_context=None):
+        self.reads += 1
+        return "2.5"
+
+class ResetHandler(CommandHandler):
+    def set(self,program_header,program_data):
+        return ""
+
+class OutputHandler(CommandHandler):
+    invalidated_queries = ("MEASure",)
+
+    def set(self,program_header,program_data):
+        return ""
+
+#
+# Holds the new value back until released, like slow hardware
+#
+class SlowReadbackHandler(ReadbackHandler):
+    def __init__(self,value="0"):
+        super().__init__(value)
+        self.release = threading.Event()
+
+    def set(self,program_header,program_data):
+        self.release.wait(5)
+        return super().set(program_header,program_data)
+
+#
+# An async command that waits to be released before it sets the value
+#
+class AsyncSettingHandler(AsyncCommandHandler):
+    def __init__(self,readback):
+        self.readback = readback
+        self.release = asyncio.Event()
+
+    async def set(self,program_header,program_data):
+        await self.release.wait()
+        return self.readback.set(program_header,program_data)
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_get_put(self):
+        fixture = ResponseCache()
+        self.assertIsNone(fixture.get("SOUR:VOLT",()))
+        fixture.put("SOUR:VOLT",(),"1.5")
+        self.assertEqual(fixture.get("SOUR:VOLT",()),"1.5")
+        self.assertIsNone(fixture.get("SOUR:VOLT",(1,)))
+        self.assertEqual((fixture.get_hits(),fixture.get_misses(),fixture.get_size()),(1,2,1))
+
+    def test_invalidate_subtree(self):
+        fixture = ResponseCache()
+        for header in ["SOUR","SOUR:VOLT","SOUR:VOLT:PROT","SOUR:VOLTX","SOUR:CURR"]:
+            fixture.put(header,(),header)
+        fixture.invalidate("SOUR:VOLT")
+        self.assertEqual(sorted(fixture.responses),["SOUR","SOUR:CURR","SOUR:VOLTX"])
+        self.assertEqual(fixture.get_invalidations(),2)
+        fixture.invalidate()
+        self.assertEqual(fixture.get_size(),0)
+
+    def test_ttl(self):
+        fixture = ResponseCache()
+        with patch('time.monotonic',return_value=100.0):
+            fixture.put("MEAS:VOLT",(),"1",ttl=5)
+            self.assertEqual(fixture.get("MEAS:VOLT",()),"1")
+        with patch('time.monotonic',return_value=105.0):
+            self.assertIsNone(fixture.get("MEAS:VOLT",()))
+        self.assertEqual(fixture.get_expirations(),1)
+        self.assertEqual(fixture.get_size(),0)
+
+    def test_put_from_old_generation_dropped(self):
+        fixture = ResponseCache()
+        generation = fixture.get_generation()
+        fixture.invalidate("A")
+        fixture.put("A",(),"stale",generation=generation)
+        self.assertIsNone(fixture.get("A",()))
+        fixture.put("A",(),"a",generation=fixture.get_generation())
+        self.assertEqual(fixture.get("A",()),"a")
+
+    def test_max_size(self):
+        fixture = ResponseCache(max_size=2)
+        fixture.put("A",(),"a")
+        fixture.put("B",(),"b")
+        fixture.put("C",(),"c")
+        self.assertEqual(sorted(fixture.responses),["B","C"])
+        self.assertEqual(fixture.get_size(),2)
+        with self.assertRaises(ValueError):
+            ResponseCache(0)
+
+class InterpreterResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fixture = CommandInterpreter()
+        self.voltage = ReadbackHandler()
+        self.protection = ReadbackHandler("30")
+        self.current = ReadbackHandler("0.1")
+        for key,handler in [("SOURce:VOLTage",self.voltage),("SOURce:VOLTage:PROTection",self.protection),
+                ("SOURce:CURRent",self.current)]:
+            self.fixture.register_command_handler(key,handler)
+            self.fixture.register_query_handler(key,handler)
+
+    def test_repeated_query_is_cached(self):
+        self.assertEqual(self.fixture.process_line("SOUR:VOLT?;VOLT?"),"1.5\n1.5\n")
+        self.assertEqual(self.fixture.process_line("SOURCE:VOLTAGE?"),"1.5\n")
+        self.assertEqual(self.voltage.reads,1)
+        cache = self.fixture.get_response_cache()
+        self.assertEqual((cache.get_hits(),cache.get_misses()),(2,1))
+
+    def test_set_invalidates_subtree(self):
+        self.fixture.process_line("SOUR:VOLT?;VOLT:PROT?;:SOUR:CURR?")
+        self.assertEqual(self.fixture.process_line("SOUR:VOLT 2;VOLT?;VOLT:PROT?;:SOUR:CURR?"),"\n2.0\n30\n0.1\n")
+        self.assertEqual((self.voltage.reads,self.protection.reads,self.current.reads),(2,2,1))
+        self.fixture.process_line("SOUR:VOLT:PROT 20")
+        self.assertEqual(self.fixture.process_line("SOUR:VOLT?;VOLT:PROT?"),"2.0\n20.0\n")
+        self.assertEqual((self.voltage.reads,self.protection.reads),(2,3))
+
+    def test_common_command_invalidates_all(self):
+        self.fixture.register_command_handler("*RST",ResetHandler())
+        self.fixture.register_command_handler("*CUSTom",type("NoInvalidation",(CommandHandler,),{'invalidated_queries':()})())
+        self.fixture.process_line("SOUR:VOLT?;CURR?")
+        self.fixture.process_line("*CUST")
+        self.assertEqual(self.fixture.get_response_cache().get_size(),2)
+        self.fixture.process_line("*RST")
+        self.assertEqual(self.fixture.get_response_cache().get_size(),0)
+
+    def test_invalidated_queries(self):
+        measure = ReadbackHandler()
+        self.fixture.register_query_handler("MEASure:VOLTage",measure)
+        self.fixture.register_command_handler("OUTPut",OutputHandler())
+        self.fixture.process_line("MEAS:VOLT?;:SOUR:VOLT?")
+        self.fixture.process_line("OUTP ON")
+        self.fixture.process_line("MEAS:VOLT?;:SOUR:VOLT?")
+        self.assertEqual((measure.reads,self.voltage.reads),(2,1))
+
+    def test_different_spellings(self):
+        fixture = CommandInterpreter()
+        handler = ReadbackHandler()
+        fixture.register_command_handler("SOURce:VOLTage",handler)
+        fixture.register_query_handler("SOURCE:VOLTAGE",handler)
+        fixture.process_line("SOURCE:VOLTAGE?")
+        self.assertEqual(fixture.process_line("SOUR:VOLT 2;:SOURCE:VOLTAGE?"),"\n2.0\n")
+        self.assertEqual(handler.reads,2)
+        handler.value = "3"
+        fixture.invalidate_responses("SOUR:VOLT")
+        self.assertEqual(fixture.process_line("SOURCE:VOLTAGE?"),"3\n")
+
+    def test_explicit_invalidation(self):
+        self.fixture.process_line("SOUR:VOLT?;CURR?")
+        self.voltage.value = "3"
+        self.fixture.invalidate_responses("SOURce:VOLTage")
+        self.assertEqual(self.fixture.process_line("SOUR:VOLT?;CURR?"),"3\n0.1\n")
+        self.assertEqual(self.current.reads,1)
+        self.fixture.invalidate_responses()
+        self.fixture.process_line("SOUR:CURR?")
+        self.assertEqual(self.current.reads,2)
+
+    def test_registering_drops_responses(self):
+        self.fixture.process_line("SOUR:VOLT?;CURR?")
+        self.voltage.value = "9"
+        self.fixture.register_query_handler("SOURce:VOLTage",self.voltage)
+        self.assertEqual(self.fixture.process_line("SOUR:VOLT?;CURR?"),"9\n0.1\n")
+        self.assertEqual(self.current.reads,1)
+
+    def test_ttl(self):
+        handler = ExpiringHandler()
+        self.fixture.register_query_handler("MEASure:VOLTage",handler)
+        with patch('time.monotonic',return_value=100.0):
+            self.fixture.process_line("MEAS:VOLT?")
+            self.fixture.process_line("MEAS:VOLT?")
+        with patch('time.monotonic',return_value=111.0):
+            self.fixture.process_line("MEAS:VOLT?")
+        self.assertEqual(handler.reads,2)
+
+    def test_arguments_and_call_context(self):
+        handler = ListHandler("7")
+        self.fixture.register_query_handler("LIST",handler)
+        self.assertEqual(self.fixture.process_line("LIST? 2;LIST? 2;LIST? 3"),"7,7\n7,7\n7,7,7\n")
+        self.assertEqual(handler.reads,2)
+        self.fixture.process_line("LIST? 2",call_context="client 1")
+        self.fixture.process_line("LIST? 2",call_context="client 1")
+        self.assertEqual(handler.reads,3)
+
+    def test_async_handler(self):
+        handler = AsyncReadbackHandler()
+        self.fixture.register_query_handler("MEASure:VOLTage",handler)
+        async def run():
+            return [await self.fixture.process_line_async("MEAS:VOLT?") for _ in range(3)]
+        self.assertEqual(asyncio.run(run()),["2.5\n"] * 3)
+        self.assertEqual(handler.reads,1)
+
+    def test_overlapped_command_invalidates_when_done(self):
+        fixture = CommandInterpreter()
+        handler = SlowReadbackHandler()
+        fixture.register_command_handler("VOLTage",handler,overlapped=True)
+        fixture.register_query_handler("VOLTage",handler)
+        try:
+            self.assertTrue(fixture.get_response_cache().is_thread_safe())
+            self.assertEqual(fixture.process_line("VOLT 5;VOLT?"),"\n0\n")
+            handler.release.set()
+            self.assertEqual(fixture.process_line("*OPC?;VOLT?"),"1\n5.0\n")
+            self.assertEqual(fixture.process_line("VOLT?"),"5.0\n")
+        finally:
+            handler.release.set()
+            fixture.get_pending_operations().shutdown()
+
+    def test_async_command_invalidates_when_done(self):
+        fixture = CommandInterpreter()
+        readback = ReadbackHandler("1")
+        setter = AsyncSettingHandler(readback)
+        fixture.register_command_handler("SOURce:VOLTage",setter)
+        fixture.register_query_handler("SOURce:VOLTage",readback)
+        async def run():
+            command = asyncio.ensure_future(fixture.process_line_async("SOUR:VOLT 5"))
+            await asyncio.sleep(0)
+            before = await fixture.process_line_async("SOUR:VOLT?")
+            setter.release.set()
+            await command
+            return (before,await fixture.process_line_async("SOUR:VOLT?"))
+        self.assertEqual(asyncio.run(run()),("1\n","5.0\n"))
+
+    def test_not_enabled_by_default(self):
+        fixture = CommandInterpreter()
+        self.assertIsNone(fixture.get_response_cache())
+        fixture.invalidate_responses()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import asyncio
+import unittest
+
+from unittest.mock import Mock
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import AsyncQueryHandler
+from context import SCPIServer
+
+class WaitingQueryHandler(AsyncQueryHandler):
+    def __init__(self):
+        self.event = asyncio.Event()
+
+    async def query(self,program_header,call_context=None):
+        await self.event.wait()
+        return "done"
+
+class DataHandler(CommandHandler):
+    argument_types = (bytes,)
+
+    def __init__(self):
+        self.data = None
+
+    def set(self,program_header,program_data,call_context=None):
+        self.data = program_data[0]
+        return ""
+
+class FailingHandler(CommandHandler):
+    def set(self,program_header,program_data,call_context=None):
+        raise RuntimeError("Hardware fault")
+
+class SCPIServerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.interpreter = CommandInterpreter("TestOrg","TestModel")
+        self.servers = []
+
+    async def asyncTearDown(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+
+    async def _start(self,**kwargs):
+        server = SCPIServer(self.interpreter,host='127.0.0.1',port=0,**kwargs)
+        await server.start()
+        self.servers.append(server)
+        return server
+
+    async def _connect(self,server):
+        return await asyncio.open_connection('127.0.0.1',server.port)
+
+    async def test_query(self):
+        server = await self._start()
+        reader,writer = await self._connect(server)
+        writer.write(b"*IDN?\n")
+        self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+        writer.close()
+
+    async def test_crlf_and_multiple_lines(self):
+        server = await self._start()
+        reader,writer = await self._connect(server)
+        writer.write(b"*IDN?\r\n*IDN?; *IDN?\n")
+        self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+        self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+        self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+        writer.close()
+
+    async def test_binary_block(self):
+        handler = DataHandler()
+        self.interpreter.register_command_handler("DATA",handler)
+        server = await self._start()
+        reader,writer = await self._connect(server)
+        writer.write(b"DATA #14\xff\x00\x80A\r\n*IDN?\n")
+        self.assertEqual(await reader.readline(),b"\n")
+        self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+        self.assertEqual(handler.data,b"\xff\x00\x80A")
+        writer.close()
+
+    async def test_handler_exception(self):
+        self.interpreter.register_command_handler("FAIL",FailingHandler())
+        server = await self._start()
+        reader,writer = await self._connect(server)
+        with self.assertLogs(SCPIServer.__module__,'ERROR'):
+            writer.write(b"FAIL\n*IDN?\n")
+            self.assertEqual(await reader.readline(),b"Execution error\n")
+        self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+        writer.close()
+
+    async def test_handler_exception_after_response(self):
+        self.interpreter.register_command_handler("FAIL",FailingHandler())
+        server = await self._start()
+        reader,writer = await self._connect(server)
+        with self.assertLogs(SCPIServer.__module__,'ERROR'):
+            writer.write(b"*IDN?;FAIL\n")
+            self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+            self.assertEqual(await reader.readline(),b"Execution error\n")
+        writer.close()
+
+    async def test_handler_exception_queued(self):
+        self.interpreter = CommandInterpreter("TestOrg","TestModel",error_queue_size=10)
+        self.interpreter.register_command_handler("FAIL",FailingHandler())
+        server = await self._start()
+        reader,writer = await self._connect(server)
+        with self.assertLogs(SCPIServer.__module__,'ERROR'):
+            writer.write(b"FAIL\nSYST:ERR?\n")
+            self.assertEqual(await reader.readline(),b"\n")
+        self.assertEqual(await reader.readline(),b'-200,"Execution error"\n')
+        writer.close()
+
+    async def test_block_with_newline(self):
+        handler = DataHandler()
+        self.interpreter.register_command_handler("DATA",handler)
+        server = await self._start()
+        reader,writer = await self._connect(server)
+        writer.write(b"DATA #14a\nbc\n*IDN?\n")
+        self.assertEqual(await reader.readline(),b"\n")
+        self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+        self.assertEqual(handler.data,b"a\nbc")
+        writer.close()
+
+    async def test_large_block(self):
+        handler = DataHandler()
+        self.interpreter.register_command_handler("DATA",handler)
+        server = await self._start()
+        reader,writer = await self._connect(server)
+        data = bytes(range(256)) * 800
+        writer.write(b"DATA #6" + str(len(data)).encode('ascii') + data + b"\n*IDN?\n")
+        self.assertEqual(await reader.readline(),b"\n")
+        self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+        self.assertEqual(handler.data,data)
+        writer.close()
+
+    async def test_block_too_long(self):
+        server = await self._start(max_block_length=1000)
+        reader,writer = await self._connect(server)
+        writer.write(b"DATA #41024")
+        self.assertEqual(await asyncio.wait_for(reader.read(),5),b"")
+        writer.close()
+
+    async def test_call_context_per_connection(self):
+        mock_handler = Mock()
+        mock_handler.query.side_effect = lambda name,call_context: call_context
+        self.interpreter.register_query_handler("WHO",mock_handler)
+        contexts = iter(["first","second"])
+        server = await self._start(call_context_factory=lambda peer: next(contexts))
+        reader1,writer1 = await self._connect(server)
+        writer1.write(b"WHO?\n")
+        self.assertEqual(await reader1.readline(),b"first\n")
+        reader2,writer2 = await self._connect(server)
+        writer2.write(b"WHO?\n")
+        self.assertEqual(await reader2.readline(),b"second\n")
+        writer1.write(b"WHO?\n")
+        self.assertEqual(await reader1.readline(),b"first\n")
+        writer1.close()
+        writer2.close()
+
+    async def test_many_clients(self):
+        server = await self._start()
+        async def client():
+            reader,writer = await self._connect(server)
+            for _ in range(10):
+                writer.write(b"*IDN?\n")
+                self.assertEqual(await reader.readline(),b"TestOrg,TestModel,0,0\n")
+            writer.close()
+        await asyncio.gather(*[client() for _ in range(50)])
+
+    async def test_async_handler_does_not_block(self):
+        waiting_handler = WaitingQueryHandler()
+        self.interpreter.register_query_handler("WAIT",waiting_handler)
+        server = await self._start()
+        reader1,writer1 = await self._connect(server)
+        writer1.write(b"WAIT?\n")
+        reader2,writer2 = await self._connect(server)
+        writer2.write(b"*IDN?\n")
+        self.assertEqual(await reader2.readline(),b"TestOrg,TestModel,0,0\n")
+        waiting_handler.event.set()
+        self.assertEqual(await reader1.readline(),b"done\n")
+        writer1.close()
+        writer2.close()
+
+    async def test_line_too_long(self):
+        server = await self._start(max_line_length=16)
+        reader,writer = await self._connect(server)
+        writer.write(b"*IDN?" * 10 + b"\n")
+        self.assertEqual(await reader.read(),b"")
+        writer.close()
+
+    async def test_idle_timeout(self):
+        server = await self._start(idle_timeout=0.05)
+        reader,writer = await self._connect(server)
+        self.assertEqual(await asyncio.wait_for(reader.read(),5),b"")
+        writer.close()
+
+    async def test_max_connections(self):
+        server = await self._start(max_connections=1)
+        reader1,writer1 = await self._connect(server)
+        writer1.write(b"*IDN?\n")
+        self.assertEqual(await reader1.readline(),b"TestOrg,TestModel,0,0\n")
+        reader2,writer2 = await self._connect(server)
+        self.assertEqual(await asyncio.wait_for(reader2.read(),5),b"")
+        self.assertEqual(server.get_connection_count(),1)
+        writer1.close()
+        writer2.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+from context import SCPIServer
+
+class RecordingHandler(QueryHandler,CommandHandler):
+    def __init__(self,log):
+        self.log = log
+    def query(self,program_header):
+        self.log.append(program_header)
+        return program_header
+    def set(self,program_header,program_data):
+        self.log.append(program_header)
+        return ""
+
+class ChunkHandler(QueryHandler):
+    def __init__(self,chunks):
+        self.chunks = chunks
+    def query(self,program_header):
+        return iter(self.chunks)
+
+class AsyncChunkHandler(QueryHandler):
+    def __init__(self,chunks):
+        self.chunks = chunks
+    def query(self,program_header):
+        async def chunks():
+            for chunk in self.chunks:
+                await asyncio.sleep(0)
+                yield chunk
+        return chunks()
+
+class StreamingResponseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.log = []
+        self.ci = CommandInterpreter("TestOrg","TestModel")
+        self.ci.register_query_handler("FIRst",RecordingHandler(self.log))
+        self.ci.register_query_handler("SECond",RecordingHandler(self.log))
+
+    def test_yields_each_unit_as_it_runs(self):
+        chunks = self.ci.iter_process_line("FIRst?;SECond?")
+        self.assertEqual(next(chunks),"FIRst")
+        self.assertEqual(self.log,["FIRst"])
+        self.assertEqual(list(chunks),["\n","SECond","\n"])
+        self.assertEqual(self.log,["FIRst","SECond"])
+
+    def test_chunked_handler(self):
+        self.ci.register_query_handler("BIG",ChunkHandler(["1",",2",",3"]))
+        self.assertEqual(list(self.ci.iter_process_line("BIG?;*IDN?")),["1",",2",",3","\n","TestOrg,TestModel,0,0","\n"])
+        self.assertEqual(self.ci.process_line("BIG?;BIG?"),"1,2,3\n1,2,3\n")
+
+    def test_binary_chunks(self):
+        self.ci.register_query_handler("BIG",ChunkHandler([b"#0",memoryview(b"abc")]))
+        response = self.ci.process_line("FIR?;BIG?")
+        self.assertEqual(b"".join(response),b"FIR\n#0abc\n")
+
+    def test_async_chunked_handler(self):
+        self.ci.register_query_handler("BIG",AsyncChunkHandler(["a","b"]))
+        self.assertEqual(self.ci.process_line("BIG?"),"ab\n")
+        self.assertEqual(asyncio.run(self.ci.process_line_async("BIG?;FIR?")),"ab\nFIR\n")
+
+    def test_errors(self):
+        self.assertEqual(list(self.ci.iter_process_line("")),["\n"])
+        self.assertEqual(len(list(self.ci.iter_process_line("FIR?;;"))),1)
+
+class StreamingServerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_large_chunked_response(self):
+        ci = CommandInterpreter()
+        ci.register_query_handler("BIG",ChunkHandler([b"x" * 1000] * 1000))
+        server = SCPIServer(ci,host='127.0.0.1',port=0,write_buffer_size=4096)
+        await server.start()
+        reader,writer = await asyncio.open_connection('127.0.0.1',server.port)
+        writer.write(b"BIG?\n")
+        self.assertEqual(await reader.readexactly(1000001),b"x" * 1000000 + b"\n")
+        writer.close()
+        server.close()
+        await server.wait_closed()
+
+if __name__ == '__main__':
+    unittest.main()
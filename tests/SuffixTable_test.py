@@ -0,0 +1,171 @@
+import pickle
+import unittest
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import ArgumentConverter
+from context import ArgumentException
+from context import SuffixTable
+from context import Quantity
+from context import Unit
+
+class RecordingHandler(CommandHandler):
+    def __init__(self,argument_types=None):
+        self.argument_types = argument_types
+        self.program_data = None
+
+    def set(self,program_header,program_data):
+        self.program_data = program_data
+        return ""
+
+class SuffixTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fixture = SuffixTable()
+
+    def test_multipliers(self):
+        cases = [
+            ("V",1.0,"V"),
+            ("EXV",1e18,"V"),
+            ("PEV",1e15,"V"),
+            ("TV",1e12,"V"),
+            ("GV",1e9,"V"),
+            ("MAV",1e6,"V"),
+            ("KV",1e3,"V"),
+            ("MV",1e-3,"V"),
+            ("UV",1e-6,"V"),
+            ("NV",1e-9,"V"),
+            ("PV",1e-12,"V"),
+            ("FV",1e-15,"V"),
+            ("AV",1e-18,"V"),
+        ]
+        for suffix,expected,unit in cases:
+            with self.subTest(suffix=suffix):
+                quantity = self.fixture.scale(1.0,suffix)
+                self.assertEqual(quantity,expected)
+                self.assertEqual(quantity.unit,unit)
+
+    def test_ambiguous_suffixes(self):
+        cases = [
+            ("MA",1.5e-3,"A"),
+            ("MAA",1.5e6,"A"),
+            ("A",1.5,"A"),
+            ("F",1.5,"F"),
+            ("UF",1.5e-6,"F"),
+            ("MHZ",1.5e6,"HZ"),
+            ("MAHZ",1.5e6,"HZ"),
+            ("MOHM",1.5e6,"OHM"),
+            ("KOHM",1.5e3,"OHM"),
+            ("K",1.5,"K"),
+        ]
+        for suffix,expected,unit in cases:
+            with self.subTest(suffix=suffix):
+                quantity = self.fixture.scale(1.5,suffix)
+                self.assertEqual(quantity,expected)
+                self.assertEqual(quantity.unit,unit)
+
+    def test_case_insensitive(self):
+        for suffix in ["mV","mv","Mv"]:
+            with self.subTest(suffix=suffix):
+                self.assertEqual(self.fixture.lookup(suffix),(1,1000,"V"))
+        self.assertEqual(self.fixture.lookup("MHz"),(1000000,1,"HZ"))
+
+    def test_scaling_matches_exponent(self):
+        self.assertEqual(self.fixture.scale(1.5,"MV"),1.5E-3)
+        self.assertEqual(self.fixture.scale(0.3,"UA"),0.3E-6)
+
+    def test_compound_suffixes(self):
+        self.assertEqual(self.fixture.lookup("V/S"),(1,1,"V/S"))
+        self.assertEqual(self.fixture.lookup("/S"),(1,1,"/S"))
+        self.assertEqual(self.fixture.lookup("KV/MS"),(1000000,1,"V/S"))
+        self.assertEqual(self.fixture.lookup("KV/KS"),(1,1,"V/S"))
+        self.assertEqual(self.fixture.lookup("V.S-1"),(1,1,"V.S-1"))
+        self.assertEqual(self.fixture.lookup("KHZ2"),(1000000,1,"HZ2"))
+
+    def test_invalid_suffixes(self):
+        for suffix in ["XYZ","V/","V//S","KV.","MAX",".V"]:
+            with self.subTest(suffix=suffix):
+                self.assertIsNone(self.fixture.lookup(suffix))
+                self.assertIsNone(self.fixture.scale(1.0,suffix))
+
+    def test_add_unit(self):
+        self.assertIsNone(self.fixture.lookup("DIV"))
+        self.fixture.add_unit("div")
+        self.assertEqual(self.fixture.lookup("MDIV"),(1,1000,"DIV"))
+        self.assertIn("DIV",self.fixture.get_units())
+
+    def test_quantity(self):
+        quantity = Quantity(1.5,"V")
+        self.assertEqual(quantity * 2,3.0)
+        self.assertEqual(repr(quantity),"Quantity(1.5,'V')")
+        copy = pickle.loads(pickle.dumps(quantity))
+        self.assertEqual((copy,copy.unit),(1.5,"V"))
+
+class SuffixConversionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.converter = ArgumentConverter()
+        self.fixture = CommandInterpreter()
+
+    def _decimal(self,value,suffix=None):
+        return (ArgumentConverter.DECIMAL,value,suffix)
+
+    def test_untyped_handler_gets_scaled_value(self):
+        handler = RecordingHandler()
+        self.fixture.register_command_handler("FREQuency",handler)
+        for line in ["FREQ 10.0MHz","FREQ 10 MHZ","FREQ 10E3 KHZ"]:
+            with self.subTest(line=line):
+                self.assertEqual(self.fixture.process_line(line),"\n")
+                self.assertEqual(handler.program_data,10e6)
+                self.assertEqual(handler.program_data.unit,"HZ")
+        self.fixture.process_line("FREQ 10")
+        self.assertNotIsInstance(handler.program_data,Quantity)
+
+    def test_invalid_suffix(self):
+        handler = RecordingHandler()
+        self.fixture.register_command_handler("FREQuency",handler)
+        self.assertEqual(self.fixture.process_line("FREQ 10 XYZ"),"Invalid suffix XYZ\n")
+        self.assertIsNone(handler.program_data)
+
+    def test_unit_type(self):
+        handler = RecordingHandler((Unit("HZ"),))
+        self.fixture.register_command_handler("FREQuency",handler)
+        self.assertEqual(self.fixture.process_line("FREQ 10 KHZ"),"\n")
+        self.assertEqual(handler.program_data,(10e3,))
+        self.assertEqual(self.fixture.process_line("FREQ 10"),"\n")
+        self.assertEqual(handler.program_data[0].unit,"HZ")
+        self.assertEqual(self.fixture.process_line("FREQ 10 V"),"Invalid argument 10V\n")
+        self.assertEqual(self.fixture.process_line("FREQ MAX"),"Invalid argument MAX\n")
+
+    def test_register_unit(self):
+        handler = RecordingHandler()
+        self.fixture.register_command_handler("SCALe",handler)
+        self.assertEqual(self.fixture.process_line("SCAL 2 MDIV"),"Invalid suffix MDIV\n")
+        self.fixture.register_unit("DIV")
+        self.assertEqual(self.fixture.process_line("SCAL 2 MDIV"),"\n")
+        self.assertEqual((handler.program_data,handler.program_data.unit),(2e-3,"DIV"))
+
+    def test_convert_floats(self):
+        program_data = [self._decimal("1","MV"),self._decimal("2"),self._decimal("3","KHZ"),self._decimal("4","MV")]
+        values = self.converter.convert_floats(program_data)
+        self.assertEqual(values,(1e-3,2.0,3e3,4e-3))
+        self.assertEqual([getattr(value,'unit',None) for value in values],["V",None,"HZ","V"])
+        self.assertEqual(values,tuple(self.converter.convert_to(arg,float) for arg in program_data))
+
+    def test_convert_floats_falls_back(self):
+        program_data = [self._decimal("1.0 E 3"),(ArgumentConverter.NON_DECIMAL,"#H10",None)]
+        self.assertEqual(self.converter.convert_floats(program_data),(1000.0,16.0))
+        with self.assertRaises(ArgumentException):
+            self.converter.convert_floats([self._decimal("1"),(ArgumentConverter.CHARACTER,"MAX",None)])
+        with self.assertRaises(ArgumentException):
+            self.converter.convert_floats([self._decimal("1","XYZ")])
+
+    def test_repeated_float_arguments(self):
+        handler = RecordingHandler((str,float,...))
+        self.fixture.register_command_handler("LIST",handler)
+        self.assertEqual(self.fixture.process_line("LIST V,1 MV,2 MV,3 MV"),"\n")
+        self.assertEqual(handler.program_data,("V",1e-3,2e-3,3e-3))
+        self.assertEqual(self.fixture.process_line("LIST V,1 MV,2 XYZ"),"Invalid suffix XYZ\n")
+
+if __name__ == '__main__':
+    unittest.main()
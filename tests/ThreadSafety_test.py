@@ -0,0 +1,204 @@
+import asyncio
+import os
+import pickle
+import threading
+import unittest
+
+from context import CommandInterpreter
+from context import CommandHandler
+from context import QueryHandler
+from context import HandlerMap
+from context import PlanCache
+from context import InterpreterSpec
+from context import ShardedInterpreter
+
+#
+# Remembers the last value set. Each shard process has its own copy.
+#
+class ValueHandler(QueryHandler,CommandHandler):
+    def __init__(self):
+        self.value = "0"
+
+    def set(self,program_header,program_data,call_context=None):
+        self.value = str(float(program_data))
+        return ""
+
+    def query(self,program_header,call_context=None):
+        return self.value
+
+class PidHandler(QueryHandler):
+    def query(self,program_header,call_context=None):
+        return str(os.getpid())
+
+class ContextHandler(QueryHandler):
+    def query(self,program_header,call_context=None):
+        return repr(call_context)
+
+class FailingHandler(CommandHandler):
+    def set(self,program_header,program_data,call_context=None):
+        raise KeyError("broken")
+
+class BinaryHandler(QueryHandler):
+    def query(self,program_header,call_context=None):
+        return memoryview(b"#13abc")
+
+def make_spec():
+    spec = InterpreterSpec(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+    spec.register_command_handler("VALue",ValueHandler())
+    spec.register_query_handler("VALue",spec.get_registrations()[0][2])
+    spec.register_query_handler("PID",PidHandler())
+    spec.register_query_handler("CONText",ContextHandler())
+    spec.register_command_handler("FAIL",FailingHandler())
+    spec.register_query_handler("BINary",BinaryHandler())
+    spec.register_unit("DIV")
+    return spec
+
+class ThreadSafeHandlerMapTest(unittest.TestCase):
+
+    def test_snapshot(self):
+        fixture = HandlerMap(thread_safe=True)
+        self.assertTrue(fixture.is_frozen())
+        self.assertTrue(fixture.is_thread_safe())
+        fixture.register_handler("SOURce:VOLTage",1)
+        snapshot = fixture.frozen_map
+        fixture.register_handler("SOURce:CURRent",2)
+        self.assertIsNot(fixture.frozen_map,snapshot)
+        self.assertNotIn("SOUR:CURR",snapshot)
+        self.assertEqual(fixture.find_handler("sour:volt"),1)
+        self.assertEqual(fixture.find_handler("SOURCE:CURRENT"),2)
+        self.assertEqual(fixture.find_key("SOUR:CURR"),"SOURce:CURRent")
+        self.assertIsNone(fixture.find_handler("SOURCE"))
+
+    def test_matches_unsafe_map(self):
+        safe = HandlerMap(thread_safe=True)
+        unsafe = HandlerMap()
+        for name in ["SOURce:VOLTage:LEVel","SOURce:CURRent","volt","*IDN","SOURce"]:
+            safe.register_handler(name,name+" handler")
+            unsafe.register_handler(name,name+" handler")
+        unsafe.freeze()
+        self.assertEqual(safe.frozen_map,unsafe.frozen_map)
+        self.assertEqual(safe.frozen_keys,unsafe.frozen_keys)
+
+class PlanCacheGenerationTest(unittest.TestCase):
+
+    def test_stale_plan_is_dropped(self):
+        for thread_safe in (False,True):
+            with self.subTest(thread_safe=thread_safe):
+                fixture = PlanCache(4,thread_safe)
+                generation = fixture.get_generation()
+                fixture.clear()
+                fixture.put("A",("plan",),generation)
+                self.assertIsNone(fixture.get("A"))
+                fixture.put("A",("plan",),fixture.get_generation())
+                self.assertEqual(fixture.get("A"),("plan",))
+
+class ThreadSafeInterpreterTest(unittest.TestCase):
+
+    THREADS = 8
+    LINES = 300
+
+    def test_concurrent_lines_and_registrations(self):
+        fixture = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR,plan_cache_size=16,thread_safe=True)
+        self.assertTrue(fixture.is_thread_safe())
+        fixture.register_query_handler("PID",PidHandler())
+        errors = []
+        start = threading.Barrier(self.THREADS + 1)
+
+        def run_lines():
+            start.wait()
+            try:
+                for index in range(self.LINES):
+                    response = fixture.process_line("PID?;SET%s:VAL?" % chr(65 + index % 20))
+                    pid,value = response.split("\n")[:2]
+                    if pid != str(os.getpid()) or value not in ("0","Invalid query"):
+                        errors.append(response)
+            except Exception as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=run_lines) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        for index in range(20):
+            fixture.register_query_handler("SET%s:VALue" % chr(65 + index),ValueHandler())
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors,[])
+        self.assertEqual(fixture.process_line("SETT:VAL?"),"0\n")
+
+    def test_lazy_default_handlers(self):
+        fixture = CommandInterpreter(thread_safe=True)
+        formats = []
+        threads = [threading.Thread(target=lambda: formats.append(fixture.get_data_format())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(map(id,formats))),1)
+        self.assertEqual(fixture.process_line("FORM?"),"ASC\n")
+
+class InterpreterSpecTest(unittest.TestCase):
+
+    def test_build(self):
+        spec = pickle.loads(pickle.dumps(make_spec()))
+        interpreter = spec.build()
+        self.assertEqual(interpreter.process_line("VAL 2 MDIV;VAL?"),"\n0.002\n")
+        self.assertTrue(interpreter.command_handlers.is_frozen())
+
+class ShardedInterpreterTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fixture = ShardedInterpreter(make_spec(),processes=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fixture.close()
+
+    def test_shards(self):
+        self.assertEqual(self.fixture.get_shard_count(),2)
+        self.assertEqual(self.fixture.get_shard(3),1)
+        self.assertEqual(self.fixture.get_shard(None),0)
+        self.assertEqual(self.fixture.get_shard(("127.0.0.1",5000)),self.fixture.get_shard(("127.0.0.1",5000)))
+        pids = { self.fixture.process_line("PID?",shard) for shard in range(2) }
+        self.assertEqual(len(pids),2)
+        self.assertNotIn(str(os.getpid())+"\n",pids)
+
+    def test_state_stays_with_shard(self):
+        self.fixture.process_line("VAL 10",10)
+        self.fixture.process_line("VAL 11",11)
+        self.assertEqual(self.fixture.process_line("VAL?",10),"10.0\n")
+        self.assertEqual(self.fixture.process_line("VAL?",11),"11.0\n")
+
+    def test_call_context_is_passed_on(self):
+        self.assertEqual(self.fixture.process_line("CONT?",("host",1)),"('host', 1)\n")
+
+    def test_process_lines(self):
+        self.assertEqual(self.fixture.process_lines(["VAL 4","VAL?",b"VAL?",""],4),["\n","4.0\n","4.0\n","\n"])
+
+    def test_process_sharded(self):
+        lines = { channel:["VAL %d" % channel,"VAL?"] for channel in range(100,108) }
+        responses = self.fixture.process_sharded(lines)
+        self.assertEqual(responses,{ channel:["\n","%d.0\n" % channel] for channel in range(100,108) })
+
+    def test_binary_response(self):
+        self.assertEqual(self.fixture.process_line("BIN?"),[b"#16",b"#13abc",b"\n"])
+
+    def test_errors(self):
+        with self.assertRaises(KeyError):
+            self.fixture.process_line("FAIL")
+        self.assertEqual(self.fixture.process_line("PID?;NOPE?").split("\n")[1],"Invalid query")
+
+    def test_async(self):
+        async def run():
+            return [chunk async for chunk in self.fixture.aiter_process_line("VAL 3;VAL?",3)]
+        self.assertEqual("".join(asyncio.run(run())),"\n3.0\n")
+
+    def test_unpicklable_spec(self):
+        spec = InterpreterSpec()
+        spec.register_query_handler("BAD",lambda: None)
+        with self.assertRaises(Exception):
+            ShardedInterpreter(spec,processes=1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from context import CommandInterpreter
+from context import TraceBuffer
+from context import TraceHandler
+
+def write_samples(path,count):
+    trace = TraceBuffer(dtype=numpy.float32,path=path)
+    trace.append(numpy.arange(count,dtype=numpy.float32))
+    trace.close()
+
+class TraceBufferTest(unittest.TestCase):
+
+    def values(self,segments):
+        return numpy.concatenate(segments).tolist() if segments else []
+
+    def test_read_since_position(self):
+        trace = TraceBuffer(8)
+        trace.append([1,2,3])
+        segments,position = trace.read(0)
+        self.assertEqual(self.values(segments),[1,2,3])
+        self.assertEqual(position,3)
+        trace.append([4,5])
+        segments,position = trace.read(position)
+        self.assertEqual(self.values(segments),[4,5])
+        self.assertEqual(trace.read(position),([],5))
+
+    def test_wrapped_read_is_two_views(self):
+        trace = TraceBuffer(8)
+        trace.append(numpy.arange(6))
+        segments,position = trace.read(0)
+        trace.append(numpy.arange(6,11))
+        segments,position = trace.read(position)
+        self.assertEqual(len(segments),2)
+        self.assertEqual(self.values(segments),[6,7,8,9,10])
+        for segment in segments:
+            self.assertTrue(numpy.shares_memory(segment,trace.samples))
+
+    def test_max_count(self):
+        trace = TraceBuffer(8)
+        trace.append(numpy.arange(5))
+        segments,position = trace.read(0,2)
+        self.assertEqual((self.values(segments),position),([0,1],2))
+        self.assertEqual(trace.get_available(position),3)
+
+    def test_overrun_loses_oldest(self):
+        trace = TraceBuffer(4)
+        trace.append(numpy.arange(10))
+        segments,position = trace.read(0)
+        self.assertEqual(self.values(segments),[6,7,8,9])
+        self.assertEqual(position,10)
+        self.assertEqual(trace.get_lost(),6)
+
+    def test_clear(self):
+        trace = TraceBuffer(8)
+        trace.append([1,2])
+        trace.clear()
+        self.assertEqual(trace.get_available(0),0)
+        trace.append([3])
+        self.assertEqual(self.values(trace.read(0)[0]),[3])
+        self.assertEqual(trace.get_lost(),0)
+
+    def test_resize(self):
+        trace = TraceBuffer(8)
+        trace.append([1,2,3])
+        trace.resize(16)
+        self.assertEqual(trace.get_size(),16)
+        trace.append([4])
+        self.assertEqual(self.values(trace.read(3)[0]),[4])
+        with self.assertRaises(ValueError):
+            trace.resize(0)
+
+    def test_mapped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory,"trace")
+            reader = TraceBuffer(16,numpy.float32,path=path)
+            writer = TraceBuffer(dtype=numpy.float32,path=path)
+            self.assertEqual(writer.get_size(),16)
+            writer.append([1.5,2.5])
+            self.assertEqual(self.values(reader.read(0)[0]),[1.5,2.5])
+            with self.assertRaises(ValueError):
+                reader.resize(32)
+            with self.assertRaises(ValueError):
+                TraceBuffer(dtype=numpy.float64,path=path)
+
+    def test_mapped_other_process(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory,"trace")
+            trace = TraceBuffer(1000,numpy.float32,path=path)
+            process = multiprocessing.get_context().Process(target=write_samples,args=(path,1500))
+            process.start()
+            process.join(30)
+            self.assertEqual(process.exitcode,0)
+            self.assertEqual(trace.get_written(),1500)
+            self.assertEqual(self.values(trace.read(500)[0]),list(range(500,1500)))
+
+class TraceHandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fixture = CommandInterpreter(parser_mode=CommandInterpreter.PARSER_MODE_LALR)
+        self.trace = TraceBuffer(8)
+        TraceHandler(self.trace).register(self.fixture)
+
+    def test_ascii_fetch_is_incremental(self):
+        self.trace.append([1,2,3])
+        self.assertEqual(self.fixture.process_line("DATA:POIN?"),"3\n")
+        self.assertEqual(self.fixture.process_line("TRAC:DATA?"),"1.0,2.0,3.0\n")
+        self.assertEqual(self.fixture.process_line("DATA:POIN?"),"0\n")
+        self.assertEqual(self.fixture.process_line("FETC?"),"\n")
+        self.trace.append([4])
+        self.assertEqual(self.fixture.process_line("TRACe?"),"4.0\n")
+
+    def test_max_count(self):
+        self.trace.append([1,2,3])
+        self.assertEqual(self.fixture.process_line("FETC? 2;FETC? 2"),"1.0,2.0\n3.0\n")
+
+    def test_clients_read_independently(self):
+        self.trace.append([1,2])
+        self.assertEqual(self.fixture.process_line("FETC?",call_context="a"),"1.0,2.0\n")
+        self.assertEqual(self.fixture.process_line("FETC?",call_context="b"),"1.0,2.0\n")
+        self.assertEqual(self.fixture.process_line("FETC?",call_context="a"),"\n")
+
+    def test_binary_is_not_copied(self):
+        self.fixture.process_line("FORM REAL,32;:FORM:BORD SWAP")
+        self.trace.append(numpy.arange(6))
+        self.fixture.process_line("FETC?")
+        self.trace.append(numpy.arange(6,11))
+        response = self.fixture.process_line("FETC?")
+        self.assertEqual(bytes(response[0]),b"#220")
+        self.assertEqual(len(response),4)
+        for view in response[1:3]:
+            self.assertTrue(numpy.shares_memory(numpy.frombuffer(view,numpy.uint8),self.trace.samples))
+        self.assertEqual(numpy.frombuffer(b"".join(map(bytes,response[1:3])),"<f4").tolist(),[6,7,8,9,10])
+
+    def test_binary_normal_byte_order(self):
+        self.fixture.process_line("FORM REAL,32")
+        self.trace.append([1.5])
+        response = self.fixture.process_line("FETC?")
+        self.assertEqual(b"".join(map(bytes,response)),b"#14"+numpy.array([1.5],">f4").tobytes()+b"\n")
+
+    def test_empty_binary(self):
+        self.fixture.process_line("FORM REAL,32")
+        self.assertEqual(b"".join(map(bytes,self.fixture.process_line("FETC?"))),b"#10\n")
+
+    def test_integer_out_of_range(self):
+        self.fixture.process_line("FORM INT,16")
+        self.trace.append([1,40000])
+        self.assertEqual(self.fixture.process_line("FETC?"),"Value out of range for format INT,16\n")
+        self.fixture.process_line("FORM INT,32")
+        response = self.fixture.process_line("FETC?")
+        self.assertEqual(numpy.frombuffer(b"".join(map(bytes,response[1:-1])),">i4").tolist(),[1,40000])
+
+    def test_clear_and_size(self):
+        self.trace.append([1,2])
+        self.assertEqual(self.fixture.process_line("TRAC:CLE;:DATA:POIN?"),"\n0\n")
+        self.assertEqual(self.fixture.process_line("TRAC:POIN 32;POIN?"),"\n32\n")
+        self.assertEqual(self.fixture.process_line("TRAC:POIN 0"),"Invalid trace size 0\n")
+
+if __name__ == '__main__':
+    unittest.main()
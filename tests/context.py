@@ -5,5 +5,97 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../s
 
 from CommandInterpreter import CommandInterpreter
 from CommandHandler import CommandHandler
+from CommandHandler import AsyncCommandHandler
 from QueryHandler import QueryHandler
-from HandlerMap import HandlerMap
\ No newline at end of file
+from QueryHandler import AsyncQueryHandler
+from HandlerMap import HandlerMap
+from FastParser import FastParser
+from ProgramMessageUnit import ProgramMessageUnit
+from ParserCache import ParserCache
+from SCPIServer import SCPIServer
+from PendingOperations import PendingOperations
+from BlockScanner import BlockScanner
+from BlockScanner import BlockDataError
+from DataFormat import DataFormat
+from DataFormat import DataFormatException
+from PlanCache import PlanCache
+from IncrementalParser import IncrementalParser
+from MessageFramer import MessageFramer
+from MessageFramer import FramingError
+from InterpreterMetrics import InterpreterMetrics
+from InterpreterMetrics import LatencyHistogram
+from ArgumentConverter import ArgumentConverter
+from ArgumentConverter import ArgumentException
+from SuffixTable import SuffixTable
+from SuffixTable import Quantity
+from SuffixTable import Unit
+from ChannelList import ChannelList
+from ChannelList import ChannelListException
+from InterpreterSpec import InterpreterSpec
+from ShardedInterpreter import ShardedInterpreter
+from ResponseCache import ResponseCache
+from ResponseCache import CachedQueryHandler
+from ErrorQueue import ErrorQueue
+from TraceBuffer import TraceBuffer
+from TraceBuffer import TraceHandler
+
+#
+# Shared fixtures. An interpreter with handlers that echo the header and data
+# back, and lines that exercise most of the grammar (including errors).
+#
+class EchoHandler:
+    def set(self,program_header,program_data):
+        return program_header+"="+repr(program_data)
+
+    def query(self,program_header):
+        return program_header
+
+SAMPLE_LINES = [
+    "*IDN?",
+    "something?",
+    "VOLT?",
+    "VOLT:MEASURE?",
+    "SOMFUNC #h1234abcd",
+    "SOMFUNC #H1234ABCD",
+    "SOMFUNC 12.4",
+    "SOMFUNC -12.4e-5",
+    "SOMFUNC 1.0 E 3",
+    "SOMFUNC -5",
+    "SOMFUNC #b11001111",
+    "SOMFUNC #q01234",
+    "SOMFUNC \'hello\'",
+    "SOMFUNC \'hello \'\'Dolly\'\'\'",
+    "SOMFUNC \"hello\"",
+    "SOMFUNC \"hello \"\"Dolly\"\"\"",
+    "SOMFUNC 12.4MHz",
+    "SOMFUNC 12.4 V/s",
+    "SOMFUNC ON",
+    "SOMFUNC 1,2,3",
+    "SOMFUNC 12.4; SOMEOTHERFUNC 10.0",
+    "SOURCE:VOLTAGE?; CURRENT?",
+    "SOURCE:VOLTAGE 12.4; CURRENT 10.0",
+    "SOURCE:VOLTAGE 12.4;:OUTPUT:ENABLE 1",
+    ":SOURCE:VOLTAGE 12.4",
+    "  *RST ;*CLS\n",
+    "This is crap",
+    "SOMFUNC 12.4;",
+    "SOMFUNC #h",
+    "SOMFUNC \'unterminated",
+    ";",
+    "VOLT#H12",
+    "VOLT'abc'",
+    "VOLT?5",
+    "SOUR:VOLT5.4",
+]
+
+def create_echo_fixture(parser_mode=CommandInterpreter.PARSER_MODE_EARLEY):
+    fixture = CommandInterpreter("TestOrg","TestModel",parser_mode=parser_mode,fast_path=False)
+    fixture.register_command_handler("SOMFUNC",EchoHandler())
+    fixture.register_command_handler("SOMEOTHERFUNC",EchoHandler())
+    fixture.register_command_handler("SOURCE:VOLTage",EchoHandler())
+    fixture.register_command_handler("SOURCE:CURRent",EchoHandler())
+    fixture.register_command_handler("OUTPut:ENABle",EchoHandler())
+    fixture.register_query_handler("SOURCE:VOLTage",EchoHandler())
+    fixture.register_query_handler("SOURCE:CURRent",EchoHandler())
+    fixture.register_query_handler("VOLT:MEASure",EchoHandler())
+    return fixture